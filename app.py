@@ -1,16 +1,49 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
 from flask_mail import Mail, Message
+from passwords import PasswordHasher, HashingPoolBusy, DEFAULT_HASH_METHOD
+from throttle import Throttle, MemoryBackend, SQLiteBackend, parse_rate
+from session_patch import apply_patch, validate_patch, PatchError
+from compression import CompressedText, available_codecs, frame_codec
+from zip_stream import stream_zip
+from export_stream import export_stream, parse_columns, ExportError, FORMATS as EXPORT_FORMATS
+from search_index import InvertedIndex, query_terms, boolean_query
+from session_buffer import SessionBuffer, MemoryStore as SessionMemoryStore, SQLiteStore as SessionSQLiteStore
+from bot_codegen import (generate_bot_code, runtime_options, CodeCache, PreviewCache, BlockConfigError,
+                         GENERATOR_VERSION, GENERATOR_FINGERPRINT, DEFAULT_RUNTIME, RUNTIME_REQUIREMENTS)
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import make_transient_to_detached
 import os
 import json
 from datetime import datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from google.auth import jwt as google_jwt
 from dotenv import load_dotenv
 from functools import wraps
 import secrets
 import urllib.parse
+import base64
+import binascii
+import threading
+import time
+import tempfile
+import sqlite3
+import smtplib
+import random
+import click
+import re
+import gzip
+import hashlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always served
+    brotli = None
 
 # Load environment variables
 load_dotenv()
@@ -45,6 +78,22 @@ GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', 'your-google-client-id')
 GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET', 'your-google-client-secret')
 GOOGLE_REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI', 'http://localhost:5002/google-callback')
 
+# Google endpoints are configurable so a local stand-in server can be used in tests
+GOOGLE_AUTH_URL = os.environ.get('GOOGLE_AUTH_URL', 'https://accounts.google.com/o/oauth2/v2/auth')
+GOOGLE_TOKEN_URL = os.environ.get('GOOGLE_TOKEN_URL', 'https://oauth2.googleapis.com/token')
+GOOGLE_USERINFO_URL = os.environ.get('GOOGLE_USERINFO_URL', 'https://www.googleapis.com/oauth2/v2/userinfo')
+GOOGLE_CERTS_URL = os.environ.get('GOOGLE_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Verify the id_token from the token response locally instead of calling userinfo
+GOOGLE_VERIFY_ID_TOKEN = os.environ.get('GOOGLE_VERIFY_ID_TOKEN', 'False').lower() == 'true'
+
+# Outbound HTTP client for Google (seconds)
+GOOGLE_HTTP_CONNECT_TIMEOUT = float(os.environ.get('GOOGLE_HTTP_CONNECT_TIMEOUT', 3))
+GOOGLE_HTTP_READ_TIMEOUT = float(os.environ.get('GOOGLE_HTTP_READ_TIMEOUT', 10))
+GOOGLE_HTTP_RETRIES = int(os.environ.get('GOOGLE_HTTP_RETRIES', 2))
+GOOGLE_HTTP_POOL_SIZE = int(os.environ.get('GOOGLE_HTTP_POOL_SIZE', 10))
+
 # Email configuration
 app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
 app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
@@ -56,15 +105,135 @@ app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'your-
 
 mail = Mail(app)
 
+# Email outbox configuration
+# EMAIL_OUTBOX_MODE=thread delivers from a background thread in each web worker;
+# EMAIL_OUTBOX_MODE=external leaves delivery to `flask send-emails` run as a separate service
+app.config['EMAIL_OUTBOX_MODE'] = os.environ.get('EMAIL_OUTBOX_MODE', 'thread')
+app.config['EMAIL_OUTBOX_BATCH_SIZE'] = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+app.config['EMAIL_OUTBOX_RETRY_BASE'] = int(os.environ.get('EMAIL_OUTBOX_RETRY_BASE', 30))
+app.config['EMAIL_OUTBOX_POLL_INTERVAL'] = float(os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL', 5))
+app.config['EMAIL_OUTBOX_LEASE'] = int(os.environ.get('EMAIL_OUTBOX_LEASE', 300))
+
+# Password hashing configuration
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+password_hasher = PasswordHasher(
+    method=app.config['PASSWORD_HASH_METHOD'],
+    max_workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT']
+)
+
+# Generated code cache configuration (CODEGEN_CACHE_DIR enables the on-disk tier shared by workers)
+app.config['CODEGEN_CACHE_SIZE'] = int(os.environ.get('CODEGEN_CACHE_SIZE', 512))
+app.config['CODEGEN_CACHE_DIR'] = os.environ.get('CODEGEN_CACHE_DIR', '')
+app.config['CODEGEN_CACHE_DISK_MAX_ENTRIES'] = int(os.environ.get('CODEGEN_CACHE_DISK_MAX_ENTRIES', 10000))
+# Live preview keeps this many editor revisions and compiled blocks per worker
+app.config['CODEGEN_PREVIEW_REVISIONS'] = int(os.environ.get('CODEGEN_PREVIEW_REVISIONS', 256))
+app.config['CODEGEN_PREVIEW_BLOCKS'] = int(os.environ.get('CODEGEN_PREVIEW_BLOCKS', 4096))
+
+# Autosave patches are folded into the session snapshot every N versions, when one patch is this large
+# or when the log would grow past SESSION_PATCH_LOG_LIMIT bytes (patch_log is TEXT, at most 65,535 bytes)
+app.config['SESSION_COMPACT_EVERY'] = int(os.environ.get('SESSION_COMPACT_EVERY', 20))
+app.config['SESSION_PATCH_INLINE_LIMIT'] = int(os.environ.get('SESSION_PATCH_INLINE_LIMIT', 4096))
+app.config['SESSION_PATCH_LOG_LIMIT'] = int(os.environ.get('SESSION_PATCH_LOG_LIMIT', 60000))
+
+# Autosave durability: 'through' commits every autosave; 'behind' buffers the latest session per user
+# and writes batches every SESSION_FLUSH_INTERVAL seconds, at SESSION_FLUSH_THRESHOLD dirty sessions and on shutdown.
+# 'behind' is for a single host: flushes do not check the version stored in the database
+app.config['SESSION_WRITE_MODE'] = os.environ.get('SESSION_WRITE_MODE', 'behind')
+app.config['SESSION_BUFFER_BACKEND'] = os.environ.get('SESSION_BUFFER_BACKEND', 'sqlite')
+app.config['SESSION_BUFFER_PATH'] = os.environ.get(
+    'SESSION_BUFFER_PATH',
+    os.path.join(tempfile.gettempdir(), f'botcreator-{DB_NAME}-sessions.sqlite3')
+)
+app.config['SESSION_BUFFER_SIZE'] = int(os.environ.get('SESSION_BUFFER_SIZE', 10000))
+app.config['SESSION_FLUSH_INTERVAL'] = float(os.environ.get('SESSION_FLUSH_INTERVAL', 2))
+app.config['SESSION_FLUSH_THRESHOLD'] = int(os.environ.get('SESSION_FLUSH_THRESHOLD', 200))
+
+# Codec for bots.config, bots.python_code and bot_sessions.session_data: zlib, zstd (needs zstandard) or none
+app.config['COLUMN_COMPRESSION'] = os.environ.get('COLUMN_COMPRESSION', 'zlib')
+app.config['COLUMN_COMPRESSION_MIN_SIZE'] = int(os.environ.get('COLUMN_COMPRESSION_MIN_SIZE', 256))
+
+# Admin batch mutations: rows locked and updated per transaction, and rows a filter request may touch at once
+app.config['ADMIN_BATCH_CHUNK_SIZE'] = int(os.environ.get('ADMIN_BATCH_CHUNK_SIZE', 500))
+app.config['ADMIN_BATCH_MAX_ROWS'] = int(os.environ.get('ADMIN_BATCH_MAX_ROWS', 10000))
+
+# Admin search: 'fulltext' uses MariaDB FULLTEXT indexes, 'index' an in-process inverted index per worker
+# (refreshed from updated_at at most every SEARCH_REFRESH_INTERVAL seconds), 'auto' picks by database
+app.config['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'auto')
+app.config['SEARCH_MIN_TERM_LENGTH'] = int(os.environ.get('SEARCH_MIN_TERM_LENGTH', 2))
+app.config['SEARCH_REFRESH_INTERVAL'] = float(os.environ.get('SEARCH_REFRESH_INTERVAL', 5))
+
+# Admin exports fetch rows from a server-side cursor this many at a time
+app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+def compressed_text():
+    return CompressedText(app.config['COLUMN_COMPRESSION'], min_size=app.config['COLUMN_COMPRESSION_MIN_SIZE'])
+
+# 'lazy' stores only the config and builds python_code on download with the current generator; 'stored' keeps the script in the row
+app.config['BOT_CODE_STORAGE'] = os.environ.get('BOT_CODE_STORAGE', 'lazy')
+
+codegen_cache = CodeCache(
+    max_entries=app.config['CODEGEN_CACHE_SIZE'],
+    disk_dir=app.config['CODEGEN_CACHE_DIR'] or None,
+    disk_max_entries=app.config['CODEGEN_CACHE_DISK_MAX_ENTRIES']
+)
+preview_cache = PreviewCache(
+    max_revisions=app.config['CODEGEN_PREVIEW_REVISIONS'],
+    max_blocks=app.config['CODEGEN_PREVIEW_BLOCKS']
+)
+
+# Throttling configuration (limits are "requests/seconds")
+app.config['THROTTLE_BACKEND'] = os.environ.get('THROTTLE_BACKEND', 'memory')
+app.config['THROTTLE_SQLITE_PATH'] = os.environ.get(
+    'THROTTLE_SQLITE_PATH',
+    os.path.join(tempfile.gettempdir(), f'botcreator-{DB_NAME}-throttle.sqlite3')
+)
+app.config['THROTTLE_RULES'] = {
+    'login': {
+        'ip': parse_rate(os.environ.get('THROTTLE_LOGIN_IP', '30/300')),
+        'email': parse_rate(os.environ.get('THROTTLE_LOGIN_EMAIL', '10/300'))
+    },
+    'register': {
+        'ip': parse_rate(os.environ.get('THROTTLE_REGISTER_IP', '10/3600'))
+    },
+    'forgot_password': {
+        'ip': parse_rate(os.environ.get('THROTTLE_FORGOT_PASSWORD_IP', '5/3600')),
+        'email': parse_rate(os.environ.get('THROTTLE_FORGOT_PASSWORD_EMAIL', '3/3600'))
+    }
+}
+
+if app.config['THROTTLE_BACKEND'] == 'sqlite':
+    throttle = Throttle(SQLiteBackend(app.config['THROTTLE_SQLITE_PATH']), app.config['THROTTLE_RULES'])
+else:
+    throttle = Throttle(MemoryBackend(), app.config['THROTTLE_RULES'])
+
+# User identity cache configuration
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+app.config['USER_CACHE_INVALIDATION_FILE'] = os.environ.get(
+    'USER_CACHE_INVALIDATION_FILE',
+    os.path.join(tempfile.gettempdir(), f'botcreator-{DB_NAME}-user-cache.log')
+)
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Admin search; other databases fall back to search_index.py
+        db.Index('ft_users_email_name', 'email', 'name', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     name = db.Column(db.String(120), nullable=False)
     google_id = db.Column(db.String(120), unique=True, nullable=True, index=True)
     password_hash = db.Column(db.String(200), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
@@ -77,23 +246,29 @@ class User(UserMixin, db.Model):
     
     @property
     def bot_count(self):
-        return len([bot for bot in self.bots if bot.is_active])
+        return self.active_bot_count or 0
     
     @property
     def last_activity(self):
-        if self.bots:
-            return max(bot.updated_at for bot in self.bots if bot.is_active)
-        return self.created_at
+        return self.last_bot_activity or self.created_at
 
 class Bot(db.Model):
     __tablename__ = 'bots'
+    __table_args__ = (
+        db.Index('ft_bots_name', 'name', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(120), nullable=False, index=True)
     token = db.Column(db.String(200), nullable=True)
-    config = db.Column(db.Text, nullable=False)  # JSON string
-    python_code = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Heavy TEXT columns are deferred so listings never fetch them; undefer the 'blobs' group where needed
+    config = db.deferred(db.Column(compressed_text(), nullable=False), group='blobs')  # JSON string
+    python_code = db.deferred(db.Column(compressed_text(), nullable=True), group='blobs')
+    # Generator that the stored config was last compiled with; NULL python_code means "build on demand"
+    generator_version = db.Column(db.String(16), nullable=True)
+    # JSON runtime settings (target, workers, ...) when they differ from the defaults
+    runtime = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -101,12 +276,33 @@ class Bot(db.Model):
     def __repr__(self):
         return f'<Bot {self.name}>'
 
+# Per-user bot aggregates computed in SQL instead of loading the whole bots relationship.
+# Deferred by default; listings undefer the 'bot_stats' group to fetch them with the page query.
+User.active_bot_count = db.column_property(
+    db.select(db.func.count(Bot.id))
+    .where(Bot.user_id == User.id, Bot.is_active == True)
+    .correlate_except(Bot)
+    .scalar_subquery(),
+    deferred=True,
+    group='bot_stats'
+)
+User.last_bot_activity = db.column_property(
+    db.select(db.func.max(Bot.updated_at))
+    .where(Bot.user_id == User.id, Bot.is_active == True)
+    .correlate_except(Bot)
+    .scalar_subquery(),
+    deferred=True,
+    group='bot_stats'
+)
+
 class BotSession(db.Model):
     __tablename__ = 'bot_sessions'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
-    session_data = db.Column(db.Text, nullable=False)  # JSON string
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, unique=True, index=True)
+    session_data = db.Column(compressed_text(), nullable=False)  # JSON snapshot
+    patch_log = db.Column(db.Text, nullable=True)  # JSON Patch arrays applied on top of the snapshot, one per line
+    version = db.Column(db.Integer, default=1, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
@@ -136,6 +332,152 @@ class PasswordResetToken(db.Model):
     def is_expired(self):
         return datetime.utcnow() > self.expires_at
 
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('idx_outbox_due', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    template = db.Column(db.String(120), nullable=False)
+    context = db.Column(db.Text, nullable=False)  # JSON string
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(64), nullable=True, index=True)
+    claimed_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} to {self.recipient} ({self.status})>'
+
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+    
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<StatCounter {self.name}={self.value}>'
+
+class UserBotCount(db.Model):
+    __tablename__ = 'user_bot_counts'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bot_count = db.Column(db.Integer, default=0, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<UserBotCount {self.user_id}={self.bot_count}>'
+
+# Statistics rollups
+# Counters are bumped inside the same transaction as the write they describe,
+# so admin pages read a handful of primary-key rows instead of scanning tables.
+STAT_ACTIVE_USERS = 'active_users'
+STAT_ACTIVE_BOTS = 'active_bots'
+STAT_SESSIONS = 'sessions'
+STAT_ADMINS = 'admins'
+
+def registrations_day_key(moment):
+    return f"registrations:day:{moment.strftime('%Y-%m-%d')}"
+
+def registrations_month_key(moment):
+    return f"registrations:month:{moment.strftime('%Y-%m')}"
+
+def _increment(model, keys, column, delta):
+    """Atomically add delta to model.column for the row identified by keys, creating it if missing"""
+    table = model.__table__
+    values = dict(keys, **{column: delta})
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect == 'mysql':
+        stmt = mysql.insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update({column: table.c[column] + stmt.inserted[column]})
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + stmt.excluded[column]}
+        )
+    else:
+        raise NotImplementedError(f'Counter upsert is not supported on {dialect}')
+    
+    db.session.execute(stmt)
+
+def bump_stats(deltas):
+    """Apply {counter_name: delta} to the rollup counters in the current transaction"""
+    for name, delta in deltas.items():
+        if delta:
+            _increment(StatCounter, {'name': name}, 'value', delta)
+
+def bump_user_bot_count(user_id, delta):
+    _increment(UserBotCount, {'user_id': user_id}, 'bot_count', delta)
+
+def record_user_created(user):
+    """Rollup bookkeeping for a newly registered user"""
+    created_at = user.created_at or datetime.utcnow()
+    bump_stats({
+        STAT_ACTIVE_USERS: 1 if user.is_active is not False else 0,
+        STAT_ADMINS: 1 if user.is_admin and user.is_active is not False else 0,
+        registrations_day_key(created_at): 1,
+        registrations_month_key(created_at): 1
+    })
+
+def record_bot_created(user_id):
+    bump_stats({STAT_ACTIVE_BOTS: 1})
+    bump_user_bot_count(user_id, 1)
+
+def record_bot_deactivated(user_id):
+    bump_stats({STAT_ACTIVE_BOTS: -1})
+    bump_user_bot_count(user_id, -1)
+
+def get_stats(*names):
+    """Read rollup counters by name; missing counters are zero"""
+    values = dict(db.session.query(StatCounter.name, StatCounter.value).filter(StatCounter.name.in_(names)).all())
+    return {name: values.get(name, 0) for name in names}
+
+def rebuild_stat_rollups():
+    """Recompute every rollup from the source tables in a single transaction"""
+    try:
+        db.session.query(StatCounter).delete()
+        db.session.query(UserBotCount).delete()
+        
+        counters = {
+            STAT_ACTIVE_USERS: db.session.query(db.func.count(User.id)).filter(User.is_active == True).scalar(),
+            STAT_ADMINS: db.session.query(db.func.count(User.id)).filter(User.is_active == True, User.is_admin == True).scalar(),
+            STAT_ACTIVE_BOTS: db.session.query(db.func.count(Bot.id)).filter(Bot.is_active == True).scalar(),
+            STAT_SESSIONS: db.session.query(db.func.count(BotSession.id)).scalar()
+        }
+        
+        registration_days = db.session.query(
+            db.func.date(User.created_at), db.func.count(User.id)
+        ).group_by(db.func.date(User.created_at)).all()
+        for day, count in registration_days:
+            day = str(day)
+            counters[f'registrations:day:{day}'] = count
+            month_key = f'registrations:month:{day[:7]}'
+            counters[month_key] = counters.get(month_key, 0) + count
+        
+        db.session.execute(
+            db.insert(StatCounter.__table__),
+            [{'name': name, 'value': value} for name, value in counters.items()]
+        )
+        db.session.execute(
+            db.insert(UserBotCount.__table__).from_select(
+                ['user_id', 'bot_count'],
+                db.select(Bot.user_id, db.func.count(Bot.id)).where(Bot.is_active == True).group_by(Bot.user_id)
+            )
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return counters
+
 # Admin decorator
 def admin_required(f):
     @wraps(f)
@@ -148,15 +490,480 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Email outbox
+def enqueue_email(recipient, subject, template, **context):
+    """Queue an email in the current transaction; it is rendered and sent by the outbox worker"""
+    message = EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        template=template,
+        context=json.dumps(context)
+    )
+    db.session.add(message)
+    return message
+
+def email_retry_delay(attempts):
+    """Exponential backoff with jitter, capped at one hour"""
+    delay = min(app.config['EMAIL_OUTBOX_RETRY_BASE'] * 2 ** (attempts - 1), 3600)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def claim_due_emails(batch_size):
+    """Lease a batch of due messages to this sender so concurrent senders never share one"""
+    now = datetime.utcnow()
+    unclaimed = db.or_(EmailOutbox.claimed_until == None, EmailOutbox.claimed_until < now)
+    due_ids = [row.id for row in db.session.query(EmailOutbox.id).filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now,
+        unclaimed
+    ).order_by(EmailOutbox.id).limit(batch_size)]
+    if not due_ids:
+        return []
+    
+    token = secrets.token_hex(16)
+    db.session.query(EmailOutbox).filter(
+        EmailOutbox.id.in_(due_ids),
+        EmailOutbox.status == 'pending',
+        unclaimed
+    ).update({
+        'claim_token': token,
+        'claimed_until': now + timedelta(seconds=app.config['EMAIL_OUTBOX_LEASE'])
+    }, synchronize_session=False)
+    db.session.commit()
+    
+    return EmailOutbox.query.filter_by(claim_token=token).order_by(EmailOutbox.id).all()
+
+def schedule_email_retry(outbox_message, error):
+    outbox_message.attempts += 1
+    outbox_message.last_error = str(error)[:1000]
+    outbox_message.claim_token = None
+    outbox_message.claimed_until = None
+    if outbox_message.attempts >= app.config['EMAIL_OUTBOX_MAX_ATTEMPTS']:
+        outbox_message.status = 'failed'
+    else:
+        outbox_message.next_attempt_at = datetime.utcnow() + email_retry_delay(outbox_message.attempts)
+
+def render_email(outbox_message):
+    msg = Message(outbox_message.subject, recipients=[outbox_message.recipient])
+    msg.html = render_template(outbox_message.template, **json.loads(outbox_message.context))
+    return msg
+
+def process_email_outbox(batch_size=None):
+    """Send every due message over a single SMTP connection; returns (sent, retried)"""
+    batch_size = batch_size or app.config['EMAIL_OUTBOX_BATCH_SIZE']
+    batch = claim_due_emails(batch_size)
+    if not batch:
+        return 0, 0
+    
+    sent = retried = 0
+    handled = set()
+    try:
+        with mail.connect() as connection:
+            while batch:
+                handled = set()
+                for outbox_message in batch:
+                    try:
+                        # Rendered first: a broken template (TemplateNotFound is an OSError)
+                        # must not be taken for a dropped connection
+                        msg = render_email(outbox_message)
+                    except Exception as e:
+                        schedule_email_retry(outbox_message, e)
+                        retried += 1
+                        handled.add(outbox_message.id)
+                        continue
+                    try:
+                        connection.send(msg)
+                    except smtplib.SMTPServerDisconnected:
+                        raise
+                    except smtplib.SMTPException as e:
+                        # Rejected by the server (recipient, size...); the connection is still usable
+                        schedule_email_retry(outbox_message, e)
+                        retried += 1
+                    except OSError:
+                        raise
+                    except Exception as e:
+                        schedule_email_retry(outbox_message, e)
+                        retried += 1
+                    else:
+                        outbox_message.status = 'sent'
+                        outbox_message.sent_at = datetime.utcnow()
+                        outbox_message.claim_token = None
+                        outbox_message.claimed_until = None
+                        sent += 1
+                    handled.add(outbox_message.id)
+                db.session.commit()
+                batch = claim_due_emails(batch_size)
+    except (smtplib.SMTPException, OSError) as e:
+        # Connection-level failure: put back whatever this batch did not get through;
+        # messages already sent or rescheduled above keep their state
+        app.logger.warning(f'Email outbox SMTP error: {e}')
+        for outbox_message in batch:
+            if outbox_message.id not in handled:
+                schedule_email_retry(outbox_message, e)
+                retried += 1
+        db.session.commit()
+    
+    return sent, retried
+
+class EmailOutboxWorker:
+    """Background thread draining the outbox; woken right after a request enqueues mail"""
+    
+    def __init__(self, interval):
+        self.interval = interval
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def notify(self):
+        if app.config['EMAIL_OUTBOX_MODE'] != 'thread':
+            return
+        with self._lock:
+            # Threads do not survive fork, so each gunicorn worker starts its own
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                self._thread.start()
+        self._wake.set()
+    
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with app.app_context():
+                try:
+                    process_email_outbox()
+                except Exception as e:
+                    app.logger.error(f'Email outbox worker error: {e}')
+                finally:
+                    db.session.remove()
+
+email_outbox_worker = EmailOutboxWorker(app.config['EMAIL_OUTBOX_POLL_INTERVAL'])
+
+# Google OAuth HTTP client
+def build_http_session(retries, pool_size):
+    """Keep-alive session with a bounded connection pool and bounded retries.
+    
+    Connection failures are retried for every method; 5xx responses only for GET,
+    since replaying the token POST would burn the single-use authorization code.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        backoff_factor=0.2,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    http = requests.Session()
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http
+
+google_http = build_http_session(GOOGLE_HTTP_RETRIES, GOOGLE_HTTP_POOL_SIZE)
+
+def google_request(method, url, **kwargs):
+    kwargs.setdefault('timeout', (GOOGLE_HTTP_CONNECT_TIMEOUT, GOOGLE_HTTP_READ_TIMEOUT))
+    response = google_http.request(method, url, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+_google_certs = {'certs': None, 'expires_at': 0}
+_google_certs_lock = threading.Lock()
+
+def get_google_certs(force_refresh=False):
+    """Google signing certificates keyed by key id, cached for the response's max-age"""
+    with _google_certs_lock:
+        if not force_refresh and _google_certs['certs'] and time.time() < _google_certs['expires_at']:
+            return _google_certs['certs']
+        
+        kwargs = {'timeout': (GOOGLE_HTTP_CONNECT_TIMEOUT, GOOGLE_HTTP_READ_TIMEOUT)}
+        response = google_http.get(GOOGLE_CERTS_URL, **kwargs)
+        response.raise_for_status()
+        max_age = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        _google_certs['certs'] = response.json()
+        _google_certs['expires_at'] = time.time() + (int(max_age.group(1)) if max_age else 3600)
+        return _google_certs['certs']
+
+def verify_google_id_token(id_token):
+    """Verify an id_token against the cached certificates and return userinfo-shaped data"""
+    header_segment = id_token.split('.', 1)[0]
+    header = json.loads(base64.urlsafe_b64decode(header_segment + '=' * (-len(header_segment) % 4)))
+    
+    certs = get_google_certs()
+    if header.get('kid') not in certs:
+        # Google rotated its keys since we cached them
+        certs = get_google_certs(force_refresh=True)
+    
+    claims = google_jwt.decode(id_token, certs=certs, audience=GOOGLE_CLIENT_ID, clock_skew_in_seconds=10)
+    if claims.get('iss') not in GOOGLE_ISSUERS:
+        raise ValueError(f"Invalid id_token issuer: {claims.get('iss')}")
+    
+    return {
+        'id': claims['sub'],
+        'email': claims['email'],
+        'name': claims.get('name', claims['email'])
+    }
+
+# Throttle decorator
+def throttled(scope, template):
+    """Reject POSTs over the scope's rate limits before any DB or hashing work"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'POST':
+                identities = {
+                    'ip': request.remote_addr,
+                    'email': (request.form.get('email') or '').strip().lower()
+                }
+                try:
+                    retry_after = throttle.check(scope, identities)
+                except sqlite3.Error as e:
+                    # Fail open: a broken throttle store must not lock everyone out
+                    app.logger.warning(f'Throttle backend error: {e}')
+                    retry_after = 0
+                
+                if retry_after:
+                    flash(f'Слишком много попыток. Повторите через {retry_after} сек.', 'error')
+                    response = app.make_response((render_template(template), 429))
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Keyset (seek) pagination
+class KeysetPage:
+    """One page of a listing ordered by (created_at, id), newest first"""
+    
+    def __init__(self, items, has_next, has_prev, total=None):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+    
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        return encode_cursor(self.items[-1], 'next')
+    
+    @property
+    def prev_cursor(self):
+        if not self.has_prev or not self.items:
+            return None
+        return encode_cursor(self.items[0], 'prev')
+
+def encode_cursor(item, direction):
+    """Encode the (created_at, id) position of a row into an opaque URL-safe token"""
+    payload = json.dumps([item.created_at.isoformat(), item.id, direction])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor token, returning (created_at, id, direction) or None if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            return None
+        return datetime.fromisoformat(created_at), int(item_id), direction
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+def approximate_row_count(model):
+    """Cheap row estimate from InnoDB table statistics; exact COUNT on other backends"""
+    if db.engine.dialect.name == 'mysql':
+        estimate = db.session.execute(db.text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {'table': model.__tablename__}).scalar()
+        if estimate is not None:
+            return estimate
+    return db.session.query(db.func.count(model.id)).scalar()
+
+def keyset_paginate(query, model, cursor=None, per_page=20, with_total=False):
+    """Paginate query by (created_at, id) without OFFSET, so every page costs one index seek"""
+    position = decode_cursor(cursor) if cursor else None
+    newest_first = (model.created_at.desc(), model.id.desc())
+    
+    if position is None:
+        rows = query.order_by(*newest_first).limit(per_page + 1).all()
+        has_next, has_prev = len(rows) > per_page, False
+        rows = rows[:per_page]
+    else:
+        created_at, item_id, direction = position
+        if direction == 'next':
+            rows = query.filter(db.or_(
+                model.created_at < created_at,
+                db.and_(model.created_at == created_at, model.id < item_id)
+            )).order_by(*newest_first).limit(per_page + 1).all()
+            has_next, has_prev = len(rows) > per_page, True
+            rows = rows[:per_page]
+        else:
+            rows = query.filter(db.or_(
+                model.created_at > created_at,
+                db.and_(model.created_at == created_at, model.id > item_id)
+            )).order_by(model.created_at.asc(), model.id.asc()).limit(per_page + 1).all()
+            has_next, has_prev = True, len(rows) > per_page
+            rows = list(reversed(rows[:per_page]))
+    
+    total = approximate_row_count(model) if with_total else None
+    return KeysetPage(rows, has_next, has_prev, total)
+
+# User identity cache
+class UserIdentityCache:
+    """Bounded LRU+TTL cache of user column snapshots for login_manager.user_loader.
+    
+    Invalidations are appended to a shared log file; every worker checks the file
+    size on lookup and evicts the ids written since its last check, so a change
+    made in one gunicorn worker is seen by the others on their next request.
+    """
+    
+    MAX_LOG_SIZE = 1024 * 1024
+    
+    def __init__(self, max_size, ttl, invalidation_file=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.invalidation_file = invalidation_file or None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._log_offset = self._log_size()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, user_id):
+        self._apply_remote_invalidations()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, user_id, snapshot):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, user_id):
+        """Drop user_id here and signal the other workers to drop it too"""
+        self.invalidate_many([user_id])
+    
+    def invalidate_many(self, user_ids):
+        """Drop several users with a single append to the invalidation log"""
+        if not user_ids:
+            return
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+            self.invalidations += len(user_ids)
+        
+        if not self.invalidation_file:
+            return
+        try:
+            with open(self.invalidation_file, 'a') as log:
+                log.write(''.join(f'{user_id}\n' for user_id in user_ids))
+                if log.tell() > self.MAX_LOG_SIZE:
+                    # Readers notice the shrink and flush everything they hold
+                    log.truncate(0)
+        except OSError as e:
+            app.logger.warning(f'User cache invalidation log unavailable: {e}')
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+    
+    def _log_size(self):
+        if not self.invalidation_file:
+            return 0
+        try:
+            return os.stat(self.invalidation_file).st_size
+        except OSError:
+            return 0
+    
+    def _apply_remote_invalidations(self):
+        if not self.invalidation_file:
+            return
+        size = self._log_size()
+        if size == self._log_offset:
+            return
+        if size < self._log_offset:
+            # Log was truncated; we may have missed entries, so start over
+            self.clear()
+            self._log_offset = size
+            return
+        try:
+            with open(self.invalidation_file, 'rb') as log:
+                log.seek(self._log_offset)
+                chunk = log.read(size - self._log_offset)
+        except OSError:
+            return
+        # Only consume complete lines; a partial write is picked up next time
+        consumed = chunk.rfind(b'\n') + 1
+        self._log_offset += consumed
+        with self._lock:
+            for line in chunk[:consumed].split():
+                self._entries.pop(int(line), None)
+
+user_cache = UserIdentityCache(
+    app.config['USER_CACHE_SIZE'],
+    app.config['USER_CACHE_TTL'],
+    app.config['USER_CACHE_INVALIDATION_FILE']
+)
+
+def user_snapshot(user):
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        # Rebuild the identity from the cached columns and attach it without a SELECT
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.put(user_id, user_snapshot(user))
+    return user
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/register', methods=['GET', 'POST'])
+@throttled('register', 'register.html')
 def register():
     if request.method == 'POST':
         # Get form data instead of JSON
@@ -186,15 +993,20 @@ def register():
             user = User(
                 email=email,
                 name=name,
-                password_hash=generate_password_hash(password)
+                password_hash=password_hasher.hash(password)
             )
             db.session.add(user)
+            record_user_created(user)
             db.session.commit()
             
             login_user(user)
             flash('Регистрация успешна! Добро пожаловать!', 'success')
             return redirect(url_for('dashboard'))
             
+        except HashingPoolBusy:
+            db.session.rollback()
+            flash('Сервер перегружен. Попробуйте еще раз через минуту.', 'error')
+            return render_template('register.html'), 503
         except Exception as e:
             db.session.rollback()
             flash('Ошибка при регистрации. Попробуйте еще раз.', 'error')
@@ -203,6 +1015,7 @@ def register():
     return render_template('register.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@throttled('login', 'login.html')
 def login():
     if request.method == 'POST':
         # Get form data instead of JSON
@@ -214,7 +1027,22 @@ def login():
             return render_template('login.html')
         
         user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            valid = user is not None and password_hasher.verify(user.password_hash, password)
+        except HashingPoolBusy:
+            flash('Сервер перегружен. Попробуйте войти через минуту.', 'error')
+            return render_template('login.html'), 503
+        
+        if valid:
+            # Transparently upgrade hashes made with an older method or cost; a busy pool only skips the upgrade
+            try:
+                if password_hasher.needs_rehash(user.password_hash):
+                    user.password_hash = password_hasher.hash(password)
+                    db.session.commit()
+                    user_cache.invalidate(user.id)
+            except HashingPoolBusy:
+                db.session.rollback()
+            
             login_user(user)
             flash('Вход выполнен успешно!', 'success')
             return redirect(url_for('dashboard'))
@@ -241,7 +1069,7 @@ def google_login():
         'access_type': 'offline'
     }
     
-    google_auth_url = f"https://accounts.google.com/o/oauth2/v2/auth?{urllib.parse.urlencode(params)}"
+    google_auth_url = f"{GOOGLE_AUTH_URL}?{urllib.parse.urlencode(params)}"
     return redirect(google_auth_url)
 
 @app.route('/google-callback')
@@ -261,7 +1089,6 @@ def google_callback():
     
     try:
         # Exchange code for access token
-        token_url = 'https://oauth2.googleapis.com/token'
         token_data = {
             'client_id': GOOGLE_CLIENT_ID,
             'client_secret': GOOGLE_CLIENT_SECRET,
@@ -270,16 +1097,15 @@ def google_callback():
             'redirect_uri': GOOGLE_REDIRECT_URI
         }
         
-        token_response = requests.post(token_url, data=token_data)
-        token_response.raise_for_status()
-        token_info = token_response.json()
+        token_info = google_request('POST', GOOGLE_TOKEN_URL, data=token_data)
         
-        # Get user info using access token
-        user_info_url = 'https://www.googleapis.com/oauth2/v2/userinfo'
-        headers = {'Authorization': f"Bearer {token_info['access_token']}"}
-        user_response = requests.get(user_info_url, headers=headers)
-        user_response.raise_for_status()
-        user_info = user_response.json()
+        if GOOGLE_VERIFY_ID_TOKEN and token_info.get('id_token'):
+            # Identity straight from the signed id_token, no userinfo round trip
+            user_info = verify_google_id_token(token_info['id_token'])
+        else:
+            # Get user info using access token
+            headers = {'Authorization': f"Bearer {token_info['access_token']}"}
+            user_info = google_request('GET', GOOGLE_USERINFO_URL, headers=headers)
         
         # Find or create user
         user = User.query.filter_by(google_id=user_info['id']).first()
@@ -298,8 +1124,10 @@ def google_callback():
                     google_id=user_info['id']
                 )
                 db.session.add(user)
+                record_user_created(user)
         
         db.session.commit()
+        user_cache.invalidate(user.id)
         login_user(user)
         flash('Вход через Google выполнен успешно!', 'success')
         
@@ -330,6 +1158,7 @@ def create_bot():
     return render_template('create_bot.html')
 
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@throttled('forgot_password', 'forgot_password.html')
 def forgot_password():
     """Handle forgot password request"""
     if request.method == 'POST':
@@ -353,19 +1182,17 @@ def forgot_password():
                     expires_at=expires_at
                 )
                 db.session.add(reset_token)
-                db.session.commit()
-                
-                # Send email
-                reset_url = url_for('reset_password', token=token, _external=True)
                 
-                msg = Message(
+                # Queue email; it is rendered and sent outside the request
+                enqueue_email(
+                    user.email,
                     'Восстановление пароля - Bot Creator Platform',
-                    recipients=[user.email]
+                    'emails/reset_password.html',
+                    user={'name': user.name},
+                    reset_url=url_for('reset_password', token=token, _external=True)
                 )
-                msg.html = render_template('emails/reset_password.html', 
-                                         user=user, reset_url=reset_url)
-                
-                mail.send(msg)
+                db.session.commit()
+                email_outbox_worker.notify()
                 
                 flash('Инструкции по восстановлению пароля отправлены на ваш email', 'success')
                 return redirect(url_for('login'))
@@ -409,16 +1236,21 @@ def reset_password(token):
         try:
             # Update password
             user = reset_token.user
-            user.password_hash = generate_password_hash(password)
+            user.password_hash = password_hasher.hash(password)
             
             # Mark token as used
             reset_token.used = True
             
             db.session.commit()
+            user_cache.invalidate(user.id)
             
             flash('Пароль успешно изменен! Теперь вы можете войти с новым паролем.', 'success')
             return redirect(url_for('login'))
             
+        except HashingPoolBusy:
+            db.session.rollback()
+            flash('Сервер перегружен. Попробуйте еще раз через минуту.', 'error')
+            return render_template('reset_password.html', token=token), 503
         except Exception as e:
             db.session.rollback()
             flash('Ошибка при изменении пароля. Попробуйте еще раз.', 'error')
@@ -431,16 +1263,17 @@ def reset_password(token):
 @admin_required
 def admin_dashboard():
     # Get statistics
-    total_users = User.query.filter_by(is_active=True).count()
-    total_bots = Bot.query.filter_by(is_active=True).count()
-    total_sessions = BotSession.query.count()
-    admin_count = User.query.filter_by(is_active=True, is_admin=True).count()
+    stats = get_stats(STAT_ACTIVE_USERS, STAT_ACTIVE_BOTS, STAT_SESSIONS, STAT_ADMINS)
+    total_users = stats[STAT_ACTIVE_USERS]
+    total_bots = stats[STAT_ACTIVE_BOTS]
+    total_sessions = stats[STAT_SESSIONS]
+    admin_count = stats[STAT_ADMINS]
     
     # Recent registrations
     recent_users = User.query.filter_by(is_active=True).order_by(User.created_at.desc()).limit(5).all()
     
     # Recent bots
-    recent_bots = Bot.query.filter_by(is_active=True).order_by(Bot.created_at.desc()).limit(5).all()
+    recent_bots = Bot.query.options(db.joinedload(Bot.user)).filter_by(is_active=True).order_by(Bot.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html', 
                          total_users=total_users,
@@ -454,11 +1287,12 @@ def admin_dashboard():
 @login_required
 @admin_required
 def admin_users():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     
-    users = User.query.paginate(
-        page=page, per_page=per_page, error_out=False
+    users = keyset_paginate(
+        User.query.options(db.undefer_group('bot_stats')), User,
+        cursor=cursor, per_page=per_page, with_total=True
     )
     
     return render_template('admin/users.html', users=users)
@@ -467,7 +1301,7 @@ def admin_users():
 @login_required
 @admin_required
 def admin_user_detail(user_id):
-    user = User.query.get_or_404(user_id)
+    user = User.query.options(db.undefer_group('bot_stats')).filter_by(id=user_id).first_or_404()
     user_bots = Bot.query.filter_by(user_id=user_id, is_active=True).order_by(Bot.created_at.desc()).all()
     return render_template('admin/user_detail.html', user=user, bots=user_bots)
 
@@ -475,12 +1309,10 @@ def admin_user_detail(user_id):
 @login_required
 @admin_required
 def admin_bots():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     
-    bots = Bot.query.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    bots = keyset_paginate(Bot.query.options(db.joinedload(Bot.user)), Bot, cursor=cursor, per_page=per_page, with_total=True)
     
     return render_template('admin/bots.html', bots=bots)
 
@@ -489,9 +1321,20 @@ def admin_bots():
 @admin_required
 def admin_stats():
     # Get statistics
-    total_users = User.query.filter_by(is_active=True).count()
-    total_bots = Bot.query.filter_by(is_active=True).count()
-    total_sessions = BotSession.query.count()
+    now = datetime.utcnow()
+    first_month = now.replace(day=1) - timedelta(days=365)
+    months = []
+    month = first_month.replace(day=1)
+    while month <= now:
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+    
+    month_keys = [registrations_month_key(month) for month in months]
+    stats = get_stats(STAT_ACTIVE_USERS, STAT_ACTIVE_BOTS, STAT_SESSIONS, STAT_ADMINS, *month_keys)
+    total_users = stats[STAT_ACTIVE_USERS]
+    total_bots = stats[STAT_ACTIVE_BOTS]
+    total_sessions = stats[STAT_SESSIONS]
+    admin_count = stats[STAT_ADMINS]
     
     # Recent registrations
     recent_users = User.query.filter_by(is_active=True).order_by(User.created_at.desc()).limit(10).all()
@@ -500,19 +1343,20 @@ def admin_stats():
     top_users = db.session.query(
         User.name,
         User.email,
-        db.func.count(Bot.id).label('bot_count')
-    ).outerjoin(Bot, (User.id == Bot.user_id) & (Bot.is_active == True)).group_by(User.id).order_by(db.func.count(Bot.id).desc()).limit(10).all()
+        UserBotCount.bot_count.label('bot_count')
+    ).join(UserBotCount, UserBotCount.user_id == User.id).order_by(UserBotCount.bot_count.desc()).limit(10).all()
     
     # Monthly registrations
-    monthly_stats = db.session.query(
-        db.func.date_format(User.created_at, '%Y-%m').label('month'),
-        db.func.count(User.id).label('count')
-    ).filter(User.created_at >= datetime.utcnow().replace(day=1) - timedelta(days=365)).group_by(db.func.date_format(User.created_at, '%Y-%m')).order_by('month').all()
+    monthly_stats = [
+        {'month': month.strftime('%Y-%m'), 'count': stats[key]}
+        for month, key in zip(months, month_keys) if stats[key]
+    ]
     
     return render_template('admin/stats.html', 
                          total_users=total_users,
                          total_bots=total_bots,
                          total_sessions=total_sessions,
+                         admin_count=admin_count,
                          recent_users=recent_users,
                          top_users=top_users,
                          monthly_stats=monthly_stats)
@@ -527,7 +1371,10 @@ def admin_toggle_user_status(user_id):
         return jsonify({'error': 'Нельзя деактивировать свой аккаунт администратора'}), 400
     
     user.is_active = not user.is_active
+    delta = 1 if user.is_active else -1
+    bump_stats({STAT_ACTIVE_USERS: delta, STAT_ADMINS: delta if user.is_admin else 0})
     db.session.commit()
+    user_cache.invalidate(user.id)
     
     return jsonify({
         'success': True,
@@ -545,7 +1392,10 @@ def admin_toggle_admin_status(user_id):
         return jsonify({'error': 'Нельзя изменить права администратора для своего аккаунта'}), 400
     
     user.is_admin = not user.is_admin
+    if user.is_active:
+        bump_stats({STAT_ADMINS: 1 if user.is_admin else -1})
     db.session.commit()
+    user_cache.invalidate(user.id)
     
     return jsonify({
         'success': True,
@@ -563,60 +1413,679 @@ def admin_delete_user(user_id):
         return jsonify({'error': 'Нельзя удалить свой аккаунт администратора'}), 400
     
     # Soft delete - mark as inactive
+    if user.is_active:
+        bump_stats({STAT_ACTIVE_USERS: -1, STAT_ADMINS: -1 if user.is_admin else 0})
     user.is_active = False
     db.session.commit()
+    user_cache.invalidate(user.id)
     
     return jsonify({'success': True, 'message': 'Пользователь удален'})
 
+@app.route('/api/admin/cache-stats')
+@login_required
+@admin_required
+def admin_cache_stats():
+    return jsonify({
+        'user_identity': user_cache.stats(),
+        'password_hashing': password_hasher.stats(),
+        'generated_code': codegen_cache.stats(),
+        'code_preview': preview_cache.stats(),
+        'session_buffer': dict(session_buffer.stats(), mode=app.config['SESSION_WRITE_MODE']),
+        'search': dict(
+            {kind: index.stats() for kind, index in search_indexes.items()} if search_backend() == 'index' else {},
+            backend=search_backend()
+        )
+    })
+
+# Admin batch mutations
+USER_BATCH_ACTIONS = {
+    'activate': {'is_active': True},
+    'deactivate': {'is_active': False},
+    'delete': {'is_active': False},  # soft delete, as in admin_delete_user
+    'grant_admin': {'is_admin': True},
+    'revoke_admin': {'is_admin': False}
+}
+BOT_BATCH_ACTIONS = {
+    'activate': {'is_active': True},
+    'deactivate': {'is_active': False},
+    'delete': {'is_active': False}
+}
+SELF_PROTECTION_ERRORS = {
+    'deactivate': 'Нельзя деактивировать свой аккаунт администратора',
+    'delete': 'Нельзя удалить свой аккаунт администратора',
+    'revoke_admin': 'Нельзя изменить права администратора для своего аккаунта'
+}
+
+def batch_conditions(model, spec):
+    """WHERE clauses for a batch filter such as {"is_active": true, "email_contains": "spam"}"""
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError('Фильтр должен быть непустым объектом')
+    conditions = []
+    for key, value in spec.items():
+        column = key[:-len('_contains')] if key.endswith('_contains') else key
+        if key in ('is_active', 'is_admin') and hasattr(model, key) and isinstance(value, bool):
+            conditions.append(getattr(model, key) == value)
+        elif key.endswith('_contains') and column in ('email', 'name') and hasattr(model, column) \
+                and isinstance(value, str) and value:
+            conditions.append(getattr(model, column).contains(value, autoescape=True))
+        elif key in ('created_after', 'created_before'):
+            try:
+                moment = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'Некорректная дата в фильтре {key}')
+            conditions.append(model.created_at >= moment if key == 'created_after' else model.created_at < moment)
+        elif key == 'user_id' and model is Bot and isinstance(value, (int, list)):
+            user_ids = value if isinstance(value, list) else [value]
+            if not user_ids or not all(type(user_id) is int for user_id in user_ids):
+                raise ValueError('Фильтр user_id должен быть числом или списком чисел')
+            conditions.append(Bot.user_id.in_(user_ids))
+        else:
+            raise ValueError(f'Неизвестный фильтр: {key}')
+    return conditions
+
+def batch_target_chunks(model, ids, conditions, after, progress):
+    """Target ids chunk by chunk: the given ids, or up to ADMIN_BATCH_MAX_ROWS ids matching conditions.
+    
+    Filter matches are walked by id, so rows the batch itself changes do not shift later chunks;
+    progress['last_id'] records where to resume.
+    """
+    size = app.config['ADMIN_BATCH_CHUNK_SIZE']
+    if ids is not None:
+        for start in range(0, len(ids), size):
+            yield ids[start:start + size]
+        return
+    remaining = app.config['ADMIN_BATCH_MAX_ROWS']
+    while remaining > 0:
+        chunk = db.session.execute(
+            db.select(model.id).where(*conditions, model.id > after).order_by(model.id).limit(min(size, remaining))
+        ).scalars().all()
+        if not chunk:
+            return
+        yield chunk
+        after = progress['last_id'] = chunk[-1]
+        remaining -= len(chunk)
+
+def batch_update_users(chunk, action, actor_id):
+    """Apply a user action to one chunk in one transaction; returns {id: (status, error)}"""
+    values = USER_BATCH_ACTIONS[action]
+    rows = db.session.execute(
+        db.select(User.id, User.is_active, User.is_admin).where(User.id.in_(chunk)).with_for_update()
+    ).all()
+    results, changed = {}, []
+    deltas = {STAT_ACTIVE_USERS: 0, STAT_ADMINS: 0}
+    for user_id, is_active, is_admin in rows:
+        new_active, new_admin = values.get('is_active', is_active), values.get('is_admin', is_admin)
+        if (new_active, new_admin) == (is_active, is_admin):
+            results[user_id] = ('unchanged', None)
+        elif user_id == actor_id:
+            results[user_id] = ('forbidden', SELF_PROTECTION_ERRORS.get(action, 'Нельзя изменить свой аккаунт'))
+        else:
+            changed.append(user_id)
+            results[user_id] = ('updated', None)
+            deltas[STAT_ACTIVE_USERS] += int(new_active) - int(is_active)
+            deltas[STAT_ADMINS] += int(new_active and new_admin) - int(is_active and is_admin)
+    
+    if changed:
+        db.session.execute(
+            db.update(User).where(User.id.in_(changed)).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        bump_stats(deltas)
+    db.session.commit()
+    user_cache.invalidate_many(changed)
+    return results
+
+def batch_update_bots(chunk, action, actor_id):
+    """Apply a bot action to one chunk in one transaction; returns {id: (status, error)}"""
+    is_active = BOT_BATCH_ACTIONS[action]['is_active']
+    rows = db.session.execute(
+        db.select(Bot.id, Bot.user_id, Bot.is_active).where(Bot.id.in_(chunk)).with_for_update()
+    ).all()
+    results, changed, per_user = {}, [], {}
+    for bot_id, user_id, was_active in rows:
+        if was_active == is_active:
+            results[bot_id] = ('unchanged', None)
+            continue
+        changed.append(bot_id)
+        results[bot_id] = ('updated', None)
+        per_user[user_id] = per_user.get(user_id, 0) + (1 if is_active else -1)
+    
+    if changed:
+        db.session.execute(
+            db.update(Bot).where(Bot.id.in_(changed)).values(is_active=is_active)
+            .execution_options(synchronize_session=False)
+        )
+        bump_stats({STAT_ACTIVE_BOTS: sum(per_user.values())})
+        for user_id, delta in per_user.items():
+            bump_user_bot_count(user_id, delta)
+    db.session.commit()
+    return results
+
+def run_admin_batch(model, actions, apply_chunk):
+    """Shared body of the batch endpoints: {"action": ..., "ids": [...]} or {"action": ..., "filter": {...}, "after": id}"""
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in actions:
+        return jsonify({'error': f"Неизвестное действие: {action}. Доступны: {', '.join(actions)}"}), 400
+    if ('ids' in data) == ('filter' in data):
+        return jsonify({'error': 'Укажите либо ids, либо filter'}), 400
+    
+    ids, conditions, after = None, None, data.get('after', 0)
+    try:
+        if 'ids' in data:
+            ids = data['ids']
+            if not isinstance(ids, list) or not ids or not all(type(item_id) is int for item_id in ids):
+                raise ValueError('ids должен быть непустым списком чисел')
+            if len(ids) > app.config['ADMIN_BATCH_MAX_ROWS']:
+                raise ValueError(f"Не больше {app.config['ADMIN_BATCH_MAX_ROWS']} ids за запрос")
+            ids = list(dict.fromkeys(ids))
+        else:
+            conditions = batch_conditions(model, data['filter'])
+            if type(after) is not int:
+                raise ValueError('after должен быть числом')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    results, progress = {}, {'last_id': None}
+    try:
+        for chunk in batch_target_chunks(model, ids, conditions, after, progress):
+            chunk_results = apply_chunk(chunk, action, current_user.id)
+            for item_id in chunk:
+                results[item_id] = chunk_results.get(item_id, ('not_found', None))
+    except Exception as e:
+        # Chunks committed so far stay applied; report them together with the failure
+        db.session.rollback()
+        app.logger.exception('Admin batch %s on %s failed', action, model.__tablename__)
+        failure = str(e)
+    else:
+        failure = None
+    
+    summary = {status: 0 for status in ('updated', 'unchanged', 'forbidden', 'not_found')}
+    for status, _ in results.values():
+        summary[status] += 1
+    response = {
+        'success': failure is None,
+        'action': action,
+        'summary': summary,
+        'results': [
+            dict({'id': item_id, 'status': status}, **({'error': error} if error else {}))
+            for item_id, (status, error) in results.items()
+        ]
+    }
+    if failure:
+        response['error'] = f'Пакет прерван: {failure}'
+    if conditions is not None:
+        last_id = progress['last_id']
+        response['next_after'] = last_id if last_id is not None and db.session.execute(
+            db.select(model.id).where(*conditions, model.id > last_id).limit(1)
+        ).first() else None
+    return jsonify(response), 200 if failure is None else 500
+
+@app.route('/api/admin/batch/users', methods=['POST'])
+@login_required
+@admin_required
+def admin_batch_users():
+    """Activate, deactivate, delete (soft) or change admin rights of many users at once"""
+    return run_admin_batch(User, USER_BATCH_ACTIONS, batch_update_users)
+
+@app.route('/api/admin/batch/bots', methods=['POST'])
+@login_required
+@admin_required
+def admin_batch_bots():
+    """Activate, deactivate or delete (soft) many bots of any users at once"""
+    return run_admin_batch(Bot, BOT_BATCH_ACTIONS, batch_update_bots)
+
+# Admin search
+SEARCH_TARGETS = {
+    'users': (User, ('email', 'name')),
+    'bots': (Bot, ('name',))
+}
+
+class TableSearchIndex:
+    """In-process inverted index of a table's text columns for databases without FULLTEXT.
+    
+    Before a search, rows whose updated_at moved since the last refresh are re-indexed, at most
+    every SEARCH_REFRESH_INTERVAL seconds, so edits made in other workers show up within that delay.
+    """
+    
+    # Rows committed late with an earlier updated_at are still caught by the next refresh
+    OVERLAP = timedelta(seconds=30)
+    
+    def __init__(self, model, columns, refresh_interval):
+        self.model = model
+        self.columns = columns
+        self.refresh_interval = refresh_interval
+        self.index = InvertedIndex()
+        self.synced_at = None
+        self.checked_at = None
+        self.last_refresh_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def refresh(self):
+        if self.checked_at is not None and time.monotonic() - self.checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self.checked_at is not None and time.monotonic() - self.checked_at < self.refresh_interval:
+                return
+            started, clock = datetime.utcnow(), time.perf_counter()
+            statement = db.select(self.model.id, *[getattr(self.model, column) for column in self.columns])
+            if self.synced_at is not None:
+                statement = statement.where(self.model.updated_at >= self.synced_at - self.OVERLAP)
+            rows = db.session.execute(statement.execution_options(yield_per=1000))
+            self.index.add_many((row[0], row[1:]) for row in rows)
+            self.synced_at = started
+            self.checked_at = time.monotonic()
+            self.last_refresh_seconds = time.perf_counter() - clock
+    
+    def search(self, terms, limit, after):
+        self.refresh()
+        return self.index.search(terms, limit, after)
+    
+    def stats(self):
+        return {
+            'documents': len(self.index),
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+            'last_refresh_seconds': round(self.last_refresh_seconds, 3)
+        }
+
+search_indexes = {
+    kind: TableSearchIndex(model, columns, app.config['SEARCH_REFRESH_INTERVAL'])
+    for kind, (model, columns) in SEARCH_TARGETS.items()
+}
+
+def search_backend():
+    if app.config['SEARCH_BACKEND'] == 'auto':
+        return 'fulltext' if db.engine.dialect.name == 'mysql' else 'index'
+    return app.config['SEARCH_BACKEND']
+
+def search_ids(kind, terms, limit, after=None):
+    """([(score, id)], has_more) for rows matching every term as a word prefix, best first"""
+    if search_backend() != 'fulltext':
+        return search_indexes[kind].search(terms, limit, after)
+    
+    model, columns = SEARCH_TARGETS[kind]
+    relevance = mysql.match(*[getattr(model, column) for column in columns], against=boolean_query(terms)).in_boolean_mode()
+    # Rounded so the score in a cursor compares equal to the one MariaDB recomputes for the next page
+    score = db.func.round(relevance, 6)
+    statement = db.select(score, model.id).where(relevance)
+    if after is not None:
+        statement = statement.where(db.or_(score < after[0], db.and_(score == after[0], model.id < after[1])))
+    rows = db.session.execute(statement.order_by(score.desc(), model.id.desc()).limit(limit + 1)).all()
+    return [(float(row[0]), row[1]) for row in rows[:limit]], len(rows) > limit
+
+def encode_search_cursor(score, item_id):
+    return base64.urlsafe_b64encode(json.dumps([score, item_id]).encode()).decode().rstrip('=')
+
+def decode_search_cursor(cursor):
+    """(score, id) of a search cursor, or None if malformed"""
+    try:
+        score, item_id = json.loads(base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode()))
+        return float(score), int(item_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+def search_item(kind, row):
+    if kind == 'users':
+        return {'id': row.id, 'email': row.email, 'name': row.name, 'is_active': row.is_active,
+                'is_admin': row.is_admin, 'url': url_for('admin_user_detail', user_id=row.id)}
+    return {'id': row.id, 'name': row.name, 'is_active': row.is_active, 'user_id': row.user_id,
+            'user_email': row.user.email, 'url': url_for('admin_user_detail', user_id=row.user_id)}
+
+@app.route('/api/admin/search')
+@login_required
+@admin_required
+def admin_search():
+    """Prefix search over users (email, name) or bots (name): ?q=, ?type=users|bots, ?limit=, ?cursor="""
+    kind = request.args.get('type', 'users')
+    if kind not in SEARCH_TARGETS:
+        return jsonify({'error': 'Unknown search type'}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    after = None
+    if request.args.get('cursor'):
+        after = decode_search_cursor(request.args['cursor'])
+        if after is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    terms = query_terms(request.args.get('q', ''), app.config['SEARCH_MIN_TERM_LENGTH'])
+    if not terms:
+        return jsonify({'items': [], 'next_cursor': None})
+    
+    started = time.perf_counter()
+    page, has_more = search_ids(kind, terms, limit, after)
+    model = SEARCH_TARGETS[kind][0]
+    query = Bot.query.options(db.joinedload(Bot.user)) if kind == 'bots' else User.query
+    rows = {row.id: row for row in query.filter(model.id.in_([item_id for _, item_id in page]))} if page else {}
+    
+    return jsonify({
+        # Rows removed since they were indexed are skipped
+        'items': [dict(search_item(kind, rows[item_id]), score=score) for score, item_id in page if item_id in rows],
+        'next_cursor': encode_search_cursor(*page[-1]) if has_more else None,
+        'took_ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+
+# Exportable columns per table and the default selection; password hashes and bot tokens never leave the database
+EXPORT_TABLES = {
+    'users': (User, ('id', 'email', 'name', 'google_id', 'created_at', 'updated_at', 'is_active', 'is_admin'), None),
+    'bots': (
+        Bot,
+        ('id', 'user_id', 'name', 'generator_version', 'runtime', 'created_at', 'updated_at', 'is_active',
+         'config', 'python_code'),
+        ('id', 'user_id', 'name', 'generator_version', 'runtime', 'created_at', 'updated_at', 'is_active')
+    )
+}
+
+@app.route('/api/admin/export/<table>')
+@login_required
+@admin_required
+def admin_export(table):
+    """Stream a whole table as NDJSON or CSV: ?format=ndjson|csv, ?columns=id,email, ?gzip=1"""
+    if table not in EXPORT_TABLES:
+        return jsonify({'error': 'Unknown table'}), 404
+    model, allowed, default = EXPORT_TABLES[table]
+    fmt = request.args.get('format', 'ndjson')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        columns = parse_columns(request.args.get('columns'), allowed, default)
+        if fmt not in EXPORT_FORMATS:
+            raise ExportError(f'Неизвестный формат: {fmt}')
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    statement = db.select(*[getattr(model, column) for column in columns]).order_by(model.id).execution_options(
+        stream_results=True, yield_per=app.config['EXPORT_BATCH_SIZE']
+    )
+    
+    def rows():
+        # Unbuffered cursor: the driver holds one batch at a time, whatever the table size
+        result = db.session.execute(statement)
+        try:
+            yield from result
+        finally:
+            result.close()
+    
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f'{table}.{extension}'
+    if compress:
+        mimetype, filename = 'application/gzip', filename + '.gz'
+    response = app.response_class(stream_with_context(export_stream(columns, rows(), fmt, gzip=compress)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# Editor session autosave
+def fold_session(session_data, patch_log):
+    """Session document: the snapshot with every logged patch applied in order"""
+    doc = json.loads(session_data)
+    for line in (patch_log or '').splitlines():
+        try:
+            doc = apply_patch(doc, json.loads(line))
+        except PatchError as e:
+            # Patches are applied before they are logged; this only skips entries from older logs
+            app.logger.warning('Skipping session patch that does not apply: %s', e)
+    return doc
+
+def session_version(user_id):
+    version = db.session.execute(
+        db.select(BotSession.version).where(BotSession.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+def upsert_sessions(rows, bump_version=True):
+    """Write full session snapshots in one INSERT ... ON DUPLICATE KEY UPDATE.
+
+    With bump_version the stored version is incremented on conflict; otherwise the row's own
+    version is written, as the write-behind buffer already assigned it.
+    """
+    table = BotSession.__table__
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect == 'mysql':
+        stmt = mysql.insert(table).values(rows)
+        new = stmt.inserted
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(table).values(rows)
+        new = stmt.excluded
+    else:
+        raise NotImplementedError(f'Session upsert is not supported on {dialect}')
+    
+    update = {
+        'session_data': new.session_data, 'patch_log': None, 'updated_at': new.updated_at,
+        'version': table.c.version + 1 if bump_version else new.version
+    }
+    if dialect == 'mysql':
+        stmt = stmt.on_duplicate_key_update(update)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id'], set_=update)
+    db.session.execute(stmt)
+
+def insert_new_sessions(rows):
+    """Insert the rows whose user has no session yet, skipping the rest; returns the number inserted.
+
+    The count comes from the INSERT itself, so a concurrent writer of the same sessions cannot
+    make both count them as new.
+    """
+    table = BotSession.__table__
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect == 'mysql':
+        stmt = mysql.insert(table).values(rows).prefix_with('IGNORE')
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(table).values(rows).on_conflict_do_nothing(index_elements=['user_id'])
+    else:
+        raise NotImplementedError(f'Session upsert is not supported on {dialect}')
+    return db.session.execute(stmt).rowcount
+
+def session_row(user_id, session_data, version=1):
+    now = datetime.utcnow()
+    return {'user_id': user_id, 'session_data': session_data, 'patch_log': None,
+            'version': version, 'created_at': now, 'updated_at': now}
+
+def save_session_snapshot(user_id, data):
+    """Replace the whole session in one upsert; returns the new version (1 for a new row)"""
+    upsert_sessions([session_row(user_id, json.dumps(data))])
+    return session_version(user_id)
+
+def append_session_patch(user_id, base_version, ops):
+    """Append a patch if the session is still at base_version; returns the new version, or None on conflict.
+
+    The patch is applied to the folded document first and raises PatchError if it does not apply,
+    so only patches that fold cleanly are logged. The common case is then a single UPDATE that
+    writes only the patch, so write volume follows the size of the edit. Every SESSION_COMPACT_EVERY
+    versions, for a large patch, or when the log would outgrow SESSION_PATCH_LOG_LIMIT bytes the log
+    is folded into the snapshot instead. Both writes are guarded by base_version, the version the
+    patch was checked against.
+    """
+    row = db.session.execute(
+        db.select(BotSession.session_data, BotSession.patch_log)
+        .where(BotSession.user_id == user_id, BotSession.version == base_version)
+    ).first()
+    if row is None:
+        return None
+    doc = apply_patch(fold_session(row.session_data, row.patch_log), ops)
+    
+    encoded = json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+    # Sizes are in bytes: that is what the TEXT column limits, and Cyrillic takes two bytes per letter
+    patch_bytes = len(encoded.encode('utf-8')) + 1
+    log_bytes = len((row.patch_log or '').encode('utf-8'))
+    new_version = base_version + 1
+    if (new_version % app.config['SESSION_COMPACT_EVERY'] == 0
+            or patch_bytes > app.config['SESSION_PATCH_INLINE_LIMIT']
+            or log_bytes + patch_bytes > app.config['SESSION_PATCH_LOG_LIMIT']):
+        values = {'session_data': json.dumps(doc), 'patch_log': None, 'version': new_version}
+    else:
+        values = {'patch_log': db.func.coalesce(BotSession.patch_log, '') + (encoded + '\n'), 'version': new_version}
+    
+    result = db.session.execute(
+        db.update(BotSession)
+        .where(BotSession.user_id == user_id, BotSession.version == base_version)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return new_version if result.rowcount == 1 else None
+
+def load_session_row(user_id):
+    """(JSON, version) of the stored session with its patch log folded in, or None"""
+    row = db.session.execute(
+        db.select(BotSession.session_data, BotSession.patch_log, BotSession.version)
+        .where(BotSession.user_id == user_id)
+    ).first()
+    if row is None:
+        return None
+    return json.dumps(fold_session(row.session_data, row.patch_log)), row.version
+
+def write_buffered_sessions(entries):
+    """SessionBuffer writer: one transaction per batch of (user_id, data, version)"""
+    with app.app_context():
+        user_ids = [user_id for user_id, _, _ in entries]
+        # Users deleted since their last autosave have nothing to write to
+        live = set(db.session.execute(db.select(User.id).where(User.id.in_(user_ids))).scalars())
+        rows = [session_row(user_id, data, version) for user_id, data, version in entries if user_id in live]
+        try:
+            if rows:
+                created = insert_new_sessions(rows)
+                # The upsert rewrites the rows just inserted with the same values
+                if created < len(rows):
+                    upsert_sessions(rows, bump_version=False)
+                bump_stats({STAT_SESSIONS: created})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+if app.config['SESSION_BUFFER_BACKEND'] == 'sqlite':
+    session_store = SessionSQLiteStore(app.config['SESSION_BUFFER_PATH'])
+else:
+    session_store = SessionMemoryStore()
+session_buffer = SessionBuffer(
+    session_store, write_buffered_sessions,
+    interval=app.config['SESSION_FLUSH_INTERVAL'],
+    threshold=app.config['SESSION_FLUSH_THRESHOLD'],
+    max_entries=app.config['SESSION_BUFFER_SIZE']
+)
+
+def buffer_session_save(user_id, data):
+    """Autosave through the write-behind buffer; returns (version, error response or None)"""
+    current = session_buffer.load(user_id, lambda: load_session_row(user_id))
+    doc, version = current if current else ({}, 0)
+    
+    if isinstance(data, dict) and 'patch' in data:
+        try:
+            base_version = int(data.get('version', 0))
+            if base_version != version:
+                return None, (jsonify({'error': 'Сессия изменена в другой вкладке', 'version': version}), 409)
+            doc = apply_patch(doc, data['patch'])
+        except (TypeError, ValueError) as e:
+            return None, (jsonify({'error': f'Некорректный патч: {e}'}), 400)
+    else:
+        doc = data
+    
+    if not session_buffer.save(user_id, doc, version + 1, expected=version):
+        current = session_buffer.load(user_id, lambda: load_session_row(user_id))
+        return None, (jsonify({'error': 'Сессия изменена в другой вкладке', 'version': current[1] if current else 0}), 409)
+    return version + 1, None
+
 @app.route('/api/save-bot-session', methods=['POST'])
 @login_required
 def save_bot_session():
+    """Autosave the editor session.
+
+    {"version": n, "patch": [...]} applies a JSON Patch on top of version n; any other body
+    replaces the whole session. A stale version gets 409 with the current one.
+    """
     data = request.get_json()
     
-    # Save to database instead of session
-    existing_session = BotSession.query.filter_by(user_id=current_user.id).first()
+    if app.config['SESSION_WRITE_MODE'] == 'behind':
+        version, error = buffer_session_save(current_user.id, data)
+        if error:
+            return error
+        return jsonify({'success': True, 'version': version})
     
-    if existing_session:
-        existing_session.session_data = json.dumps(data)
-        existing_session.updated_at = datetime.utcnow()
+    if isinstance(data, dict) and 'patch' in data:
+        try:
+            version = append_session_patch(current_user.id, int(data.get('version', 0)), validate_patch(data['patch']))
+        except (TypeError, ValueError) as e:
+            db.session.rollback()
+            return jsonify({'error': f'Некорректный патч: {e}'}), 400
+        if version is None:
+            db.session.rollback()
+            return jsonify({'error': 'Сессия изменена в другой вкладке', 'version': session_version(current_user.id)}), 409
     else:
-        new_session = BotSession(
-            user_id=current_user.id,
-            session_data=json.dumps(data)
-        )
-        db.session.add(new_session)
+        version = save_session_snapshot(current_user.id, data)
+        if version == 1:
+            bump_stats({STAT_SESSIONS: 1})
     
     db.session.commit()
-    return jsonify({'success': True})
+    return jsonify({'success': True, 'version': version})
 
 @app.route('/api/get-bot-session')
 @login_required
 def get_bot_session():
-    session_record = BotSession.query.filter_by(user_id=current_user.id).first()
-    if session_record:
-        return jsonify(json.loads(session_record.session_data))
-    return jsonify({})
+    if app.config['SESSION_WRITE_MODE'] == 'behind':
+        current = session_buffer.load(current_user.id, lambda: load_session_row(current_user.id))
+    else:
+        row = load_session_row(current_user.id)
+        current = (json.loads(row[0]), row[1]) if row else None
+    
+    doc, version = current if current else ({}, 0)
+    response = jsonify(doc)
+    response.headers['X-Session-Version'] = str(version)
+    return response
+
+def stored_python_code(python_code):
+    """Value written to bots.python_code: nothing in lazy mode, since it can be rebuilt from the config"""
+    return python_code if app.config['BOT_CODE_STORAGE'] == 'stored' else None
+
+def stored_runtime(runtime):
+    """Value written to bots.runtime: NULL for the default polling setup"""
+    return json.dumps(runtime, sort_keys=True) if runtime != DEFAULT_RUNTIME else None
+
+def bot_code_version(bot):
+    """Generator version behind the code a download returns: the saving one for a stored script,
+    the current one for a script built from the config (None for scripts from the old in-browser generator)"""
+    return bot.generator_version if bot.python_code is not None else GENERATOR_VERSION
+
+def bot_python_code(bot):
+    """Stored script if the row has one, otherwise compile it from the config through the code cache"""
+    if bot.python_code is not None:
+        return bot.python_code
+    return codegen_cache.get_or_generate(generate_bot_code, json.loads(bot.config), {
+        'name': bot.name, 'token': bot.token, **runtime_options(json.loads(bot.runtime or '{}'))
+    })
 
 @app.route('/api/save-bot', methods=['POST'])
 @login_required
 def save_bot():
     data = request.get_json()
     
+    # Code is compiled on the server from the block config; clients no longer upload it
+    try:
+        runtime = runtime_options(data)
+        python_code = codegen_cache.get_or_generate(generate_bot_code, data['config'], {
+            'name': data['name'], 'token': data.get('token', ''), **runtime
+        })
+    except BlockConfigError as e:
+        return jsonify({'error': str(e)}), 400
+    
     bot = Bot(
         name=data['name'],
         token=data.get('token', ''),
         config=json.dumps(data['config']),
-        python_code=data['python_code'],
+        python_code=stored_python_code(python_code),
+        generator_version=GENERATOR_VERSION,
+        runtime=stored_runtime(runtime),
         user_id=current_user.id
     )
     
     db.session.add(bot)
+    record_bot_created(current_user.id)
     db.session.commit()
     
     # Clear session data
+    session_buffer.discard(current_user.id)
     session_record = BotSession.query.filter_by(user_id=current_user.id).first()
     if session_record:
         db.session.delete(session_record)
+        bump_stats({STAT_SESSIONS: -1})
         db.session.commit()
     
     return jsonify({'success': True, 'bot_id': bot.id})
@@ -627,11 +2096,35 @@ def generate_python_code():
     data = request.get_json()
     config = data['config']
     
-    # Generate Python code based on bot configuration
-    python_code = generate_bot_code(config)
+    # Generate Python code based on bot configuration; target and concurrency come from the payload
+    try:
+        python_code = codegen_cache.get_or_generate(generate_bot_code, config, {
+            'name': data.get('name'), 'token': data.get('token'), **runtime_options(data)
+        })
+    except BlockConfigError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({'python_code': python_code})
 
+@app.route('/api/preview-python-code', methods=['POST'])
+@login_required
+def preview_python_code():
+    """Incremental preview: recompile only the changed blocks since base_revision"""
+    data = request.get_json()
+    config = data.get('config')
+    blocks = config.get('blocks') if isinstance(config, dict) else config
+    
+    try:
+        preview = preview_cache.update(
+            blocks, base_revision=data.get('base_revision'), changed=data.get('changed'),
+            owner=current_user.id, name=data.get('name') or 'My Bot',
+            token=data.get('token') or 'YOUR_BOT_TOKEN_HERE', **runtime_options(data)
+        )
+    except BlockConfigError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(preview)
+
 @app.route('/api/delete-bot/<int:bot_id>', methods=['DELETE'])
 @login_required
 def delete_bot(bot_id):
@@ -640,171 +2133,117 @@ def delete_bot(bot_id):
         return jsonify({'error': 'Bot not found'}), 404
     
     # Soft delete
+    if bot.is_active:
+        record_bot_deactivated(bot.user_id)
     bot.is_active = False
     db.session.commit()
     
     return jsonify({'success': True})
 
+def bot_validators(bot_ids, updated_at, variant):
+    """Strong ETag and Last-Modified for a download; lazily built code also depends on the generator"""
+    key = f"{variant}:{','.join(map(str, bot_ids))}:{updated_at.isoformat() if updated_at else ''}:{GENERATOR_FINGERPRINT}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32], updated_at
+
+def not_modified(etag, last_modified):
+    """304 response if the request's validators still match, else None"""
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    else:
+        matched = bool(last_modified and request.if_modified_since
+                       and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+    if not matched:
+        return None
+    return with_validators(app.response_class(status=304), etag, last_modified)
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def bot_bundle_files(bot, prefix=''):
+    """(name, data, modified) entries of one bot's bundle: bot.py, requirements.txt and config.json"""
+    runtime = runtime_options(json.loads(bot.runtime or '{}'))
+    return [
+        (f'{prefix}bot.py', bot_python_code(bot), bot.updated_at),
+        (f'{prefix}requirements.txt', ''.join(line + '\n' for line in RUNTIME_REQUIREMENTS[runtime['target']]), bot.updated_at),
+        (f'{prefix}config.json', bot.config, bot.updated_at)
+    ]
+
+def bundle_name(bot):
+    """ASCII-safe directory / file name of a bot bundle, e.g. bot-12-Support_Bot"""
+    slug = secure_filename(bot.name)
+    return f'bot-{bot.id}-{slug}' if slug else f'bot-{bot.id}'
+
+def send_zip(files, filename, etag, last_modified):
+    response = app.response_class(stream_with_context(stream_zip(files)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return with_validators(response, etag, last_modified)
+
 @app.route('/api/download-bot/<int:bot_id>')
 @login_required
 def download_bot(bot_id):
+    """Bot as JSON, or as a ZIP bundle with ?format=zip; supports If-None-Match / If-Modified-Since"""
+    bundle = request.args.get('format') == 'zip'
+    # Validators come from the light columns, so a 304 never loads config or code
     bot = Bot.query.filter_by(id=bot_id, user_id=current_user.id).first()
     if not bot:
         return jsonify({'error': 'Bot not found'}), 404
     
-    return jsonify({
-        'name': bot.name,
-        'python_code': bot.python_code,
-        'config': json.loads(bot.config)
-    })
-
-def generate_bot_code(config):
-    """Generate Python code for the Telegram bot based on configuration"""
+    etag, last_modified = bot_validators([bot.id], bot.updated_at, 'zip' if bundle else 'json')
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
     
-    code = '''import telebot
-from telebot import types
-import os
-import logging
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-# Bot token - replace with your actual token
-TOKEN = 'YOUR_BOT_TOKEN_HERE'
-bot = telebot.TeleBot(TOKEN)
-
-# Bot configuration
-BOT_NAME = "{}"
-BOT_DESCRIPTION = "{}"
-
-# Error handler
-@bot.message_handler(func=lambda message: True)
-def echo_all(message):
-    try:
-        # This will be overridden by specific handlers
-        pass
-    except Exception as e:
-        logger.error(f"Error processing message: {e}")
-        bot.reply_to(message, "Sorry, something went wrong. Please try again later.")
+    bot = Bot.query.options(db.undefer_group('blobs')).filter_by(id=bot_id, user_id=current_user.id).first()
+    code_version = bot_code_version(bot)
+    if bundle:
+        response = send_zip(bot_bundle_files(bot, f'{bundle_name(bot)}/'), f'{bundle_name(bot)}.zip', etag, last_modified)
+    else:
+        response = with_validators(jsonify({
+            'name': bot.name,
+            'python_code': bot_python_code(bot),
+            'config': json.loads(bot.config),
+            'generator_version': code_version,
+            # Built lazily by a newer generator than the one the bot was saved with
+            'regenerated': code_version != bot.generator_version
+        }), etag, last_modified)
+    if code_version:
+        response.headers['X-Generator-Version'] = code_version
+    return response
 
-'''
-    
-    # Add handlers based on configuration
-    if config.get('welcome_message'):
-        code += '''
-@bot.message_handler(commands=['start'])
-def send_welcome(message):
-    """Handle /start command"""
-    try:
-        welcome_text = """{}
-        
-Welcome to {}! I'm here to help you.
-        """.format(BOT_DESCRIPTION, BOT_NAME)
-        
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        markup.add(types.KeyboardButton("Help"), types.KeyboardButton("About"))
-        
-        bot.reply_to(message, welcome_text, reply_markup=markup)
-        logger.info(f"User {message.from_user.id} started the bot")
-    except Exception as e:
-        logger.error(f"Error in welcome handler: {e}")
-        bot.reply_to(message, "Welcome! I'm here to help you.")
-'''
-    
-    if config.get('help_command'):
-        code += '''
-@bot.message_handler(commands=['help'])
-def send_help(message):
-    """Handle /help command"""
-    try:
-        help_text = """Available commands:
-/start - Start the bot
-/help - Show this help message
-/about - About the bot
-        """
-        bot.reply_to(message, help_text)
-        logger.info(f"User {message.from_user.id} requested help")
-    except Exception as e:
-        logger.error(f"Error in help handler: {e}")
-        bot.reply_to(message, "Here's how to use me...")
-'''
-    
-    if config.get('about_command'):
-        code += '''
-@bot.message_handler(commands=['about'])
-def send_about(message):
-    """Handle /about command"""
-    try:
-        about_text = """{}
-        
-This bot was created using Bot Creator Platform.
-        """.format(BOT_DESCRIPTION)
-        bot.reply_to(message, about_text)
-        logger.info(f"User {message.from_user.id} requested about info")
-    except Exception as e:
-        logger.error(f"Error in about handler: {e}")
-        bot.reply_to(message, "I'm a helpful bot created with Bot Creator Platform.")
-'''
-    
-    # Add custom responses
-    if config.get('custom_responses'):
-        for i, response in enumerate(config['custom_responses']):
-            trigger = response.get('trigger', '')
-            reply = response.get('reply', '')
-            if trigger and reply:
-                code += '''
-@bot.message_handler(func=lambda message: "{}" in message.text.lower())
-def custom_response_{}(message):
-    """Custom response to: {}"""
-    try:
-        bot.reply_to(message, "{}")
-        logger.info(f"User {message.from_user.id} triggered custom response: {}")
-    except Exception as e:
-        logger.error(f"Error in custom response handler: {e}")
-        bot.reply_to(message, "{}")
-'''.format(trigger, i, trigger, reply, trigger, reply)
-    
-    # Add echo functionality if enabled
-    if config.get('echo_enabled'):
-        code += '''
-@bot.message_handler(func=lambda message: True)
-def echo_all(message):
-    """Echo all messages"""
-    try:
-        bot.reply_to(message, message.text)
-        logger.info(f"User {message.from_user.id} sent: {message.text}")
-    except Exception as e:
-        logger.error(f"Error in echo handler: {e}")
-        bot.reply_to(message, "Sorry, I couldn't process your message.")
-'''
-    
-    # Add main execution
-    code += '''
-if __name__ == "__main__":
-    logger.info(f"Starting {BOT_NAME}...")
-    print(f"Starting {BOT_NAME}...")
-    print("Bot is running. Press Ctrl+C to stop.")
-    
-    try:
-        bot.polling(none_stop=True, timeout=60)
-    except KeyboardInterrupt:
-        logger.info("Bot stopped by user")
-        print("Bot stopped.")
-    except Exception as e:
-        logger.error(f"Bot stopped due to error: {e}")
-        print(f"Bot stopped due to error: {e}")
-'''
-    
-    return code.format(
-        config.get('name', 'My Bot'),
-        config.get('description', 'A helpful Telegram bot'),
-        config.get('welcome_message', 'Hello!'),
-        config.get('name', 'My Bot')
-    )
+@app.route('/api/download-bots')
+@login_required
+def download_bots():
+    """All of the user's active bots as one streamed ZIP, one directory per bot"""
+    user_id = current_user.id
+    ids = db.session.execute(
+        db.select(Bot.id).where(Bot.user_id == user_id, Bot.is_active == True).order_by(Bot.id)
+    ).scalars().all()
+    if not ids:
+        return jsonify({'error': 'Bot not found'}), 404
+    last_modified = db.session.execute(
+        db.select(db.func.max(Bot.updated_at)).where(Bot.user_id == user_id, Bot.is_active == True)
+    ).scalar()
+    
+    etag, last_modified = bot_validators(ids, last_modified, 'bulk')
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+    
+    def files(batch_size=50):
+        # Bots are loaded a batch at a time and released, so memory stays flat for large exports
+        for start in range(0, len(ids), batch_size):
+            bots = Bot.query.options(db.undefer_group('blobs')).filter(
+                Bot.user_id == user_id, Bot.id.in_(ids[start:start + batch_size])
+            ).order_by(Bot.id).all()
+            for bot in bots:
+                yield from bot_bundle_files(bot, f'{bundle_name(bot)}/')
+            db.session.expunge_all()
+    
+    return send_zip(files(), 'bots.zip', etag, last_modified)
 
 @app.cli.command('init-db')
 def init_db():
@@ -817,10 +2256,11 @@ def init_db():
         admin_user = User(
             email='admin',
             name='Administrator',
-            password_hash=generate_password_hash('password'),
+            password_hash=password_hasher.hash('password'),
             is_admin=True
         )
         db.session.add(admin_user)
+        record_user_created(admin_user)
         db.session.commit()
         print("Default admin user created: admin / password")
     
@@ -840,14 +2280,254 @@ def create_admin():
     admin = User(
         email=email,
         name=name,
-        password_hash=generate_password_hash(password),
+        password_hash=password_hasher.hash(password),
         is_admin=True
     )
     
     db.session.add(admin)
+    record_user_created(admin)
     db.session.commit()
     print(f"Admin user {email} created successfully!")
 
+@app.cli.command('send-emails')
+@click.option('--once', is_flag=True, help='Drain the outbox once and exit.')
+def send_emails(once):
+    """Deliver queued emails from the outbox."""
+    while True:
+        sent, retried = process_email_outbox()
+        if sent or retried:
+            print(f"Emails sent: {sent}, scheduled for retry: {retried}")
+        if once:
+            break
+        db.session.remove()
+        time.sleep(app.config['EMAIL_OUTBOX_POLL_INTERVAL'])
+
+@app.cli.command('backfill-bot-code')
+@click.option('--force', is_flag=True, help='Drop stored code even if it differs from what the current generator produces.')
+@click.option('--batch-size', default=500, show_default=True, help='Rows per transaction.')
+def backfill_bot_code(force, batch_size):
+    """Drop stored python_code that can be rebuilt from the bot config."""
+    columns = [column['name'] for column in db.inspect(db.engine).get_columns('bots')]
+    for name, ddl in (('generator_version', 'VARCHAR(16) NULL'), ('runtime', 'VARCHAR(255) NULL')):
+        if name not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE bots ADD COLUMN {name} {ddl}'))
+            print(f"Added bots.{name} column")
+
+    cleared = kept = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Bot.id, Bot.name, Bot.token, Bot.config, Bot.python_code, Bot.runtime)
+            .where(Bot.id > last_id, Bot.python_code.isnot(None))
+            .order_by(Bot.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        updates = []
+        for row in rows:
+            try:
+                code = generate_bot_code(json.loads(row.config), name=row.name, token=row.token,
+                                         **runtime_options(json.loads(row.runtime or '{}')))
+            except (ValueError, TypeError, KeyError):
+                kept += 1
+                continue
+            # Code that the current generator reproduces byte for byte is pure redundancy
+            if force or code == row.python_code:
+                updates.append({'id': row.id, 'python_code': None, 'generator_version': GENERATOR_VERSION})
+            else:
+                kept += 1
+
+        if updates:
+            db.session.execute(db.update(Bot), updates)
+            db.session.commit()
+            cleared += len(updates)
+
+    print(f"Cleared stored code for {cleared} bot(s), kept {kept} that cannot be reproduced"
+          + ("" if force else " (use --force to regenerate them from config)"))
+
+# Columns stored through CompressedText, as (model, column name, nullable)
+COMPRESSED_COLUMNS = (
+    (Bot, 'config', False),
+    (Bot, 'python_code', True),
+    (BotSession, 'session_data', False)
+)
+
+def check_compressed_columns(dbapi_connection, connection_record):
+    """On the first MariaDB connection, write plain text into compressed columns that are still TEXT.
+
+    Binary frames in a utf8mb4 TEXT column fail with 'Incorrect string value', so until
+    `flask compress-columns` converts a column its values are stored the way they were before.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ('bots', 'bot_sessions')"
+        )
+        types = {(table, name): data_type.lower() for table, name, data_type in cursor.fetchall()}
+    finally:
+        cursor.close()
+    for model, name, _ in COMPRESSED_COLUMNS:
+        data_type = types.get((model.__tablename__, name))
+        column_type = model.__table__.c[name].type
+        column_type.plain = data_type is not None and 'blob' not in data_type
+        if column_type.plain:
+            app.logger.warning(f'{model.__tablename__}.{name} is {data_type.upper()}, storing it uncompressed; '
+                               f'run flask compress-columns')
+
+with app.app_context():
+    if db.engine.dialect.name == 'mysql':
+        db.event.listen(db.engine, 'first_connect', check_compressed_columns)
+
+@app.cli.command('compress-columns')
+@click.option('--batch-size', default=500, show_default=True, help='Rows per transaction.')
+def compress_columns(batch_size):
+    """Convert TEXT columns to MEDIUMBLOB and rewrite rows with the configured codec."""
+    codec = app.config['COLUMN_COMPRESSION']
+    if codec not in available_codecs():
+        raise click.ClickException(f'Codec {codec} is not available (installed: {", ".join(available_codecs())})')
+    
+    if db.engine.dialect.name == 'mysql':
+        for model, name, nullable in COMPRESSED_COLUMNS:
+            table = model.__tablename__
+            column_type = next(column['type'] for column in db.inspect(db.engine).get_columns(table) if column['name'] == name)
+            if 'BLOB' not in str(column_type).upper():
+                # TEXT -> BLOB keeps the stored bytes, so legacy rows stay readable as UTF-8
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        f'ALTER TABLE {table} MODIFY {name} MEDIUMBLOB {"NULL" if nullable else "NOT NULL"}'
+                    ))
+                print(f"Converted {table}.{name} to MEDIUMBLOB")
+            model.__table__.c[name].type.plain = False
+    
+    for model, name, _ in COMPRESSED_COLUMNS:
+        column = model.__table__.c[name]
+        raw = db.type_coerce(column, db.LargeBinary)
+        rewritten = raw_bytes = stored_bytes = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(model.id, raw.label('raw'), column.label('text'))
+                .where(model.id > last_id, column.isnot(None))
+                .order_by(model.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            updates = []
+            for row in rows:
+                raw_bytes += len(row.text.encode('utf-8'))
+                if frame_codec(row.raw) in (codec, 'none'):
+                    stored_bytes += len(row.raw)
+                    continue
+                # Assigning the decoded text makes CompressedText frame it with the current codec
+                updates.append({'id': row.id, name: row.text})
+                stored_bytes += len(compressed_text().process_bind_param(row.text, db.engine.dialect))
+            
+            if updates:
+                db.session.execute(db.update(model), updates)
+                db.session.commit()
+                rewritten += len(updates)
+        
+        ratio = raw_bytes / stored_bytes if stored_bytes else 1.0
+        print(f"{model.__tablename__}.{name}: rewrote {rewritten} row(s), "
+              f"{raw_bytes} bytes of text stored in {stored_bytes} bytes ({ratio:.1f}x)")
+
+@app.cli.command('migrate-bot-sessions')
+def migrate_bot_sessions():
+    """Add version/patch_log columns and make bot_sessions.user_id unique for patch autosave."""
+    inspector = db.inspect(db.engine)
+    columns = [column['name'] for column in inspector.get_columns('bot_sessions')]
+    for name, ddl in (('patch_log', 'TEXT NULL'), ('version', 'INT NOT NULL DEFAULT 1')):
+        if name not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE bot_sessions ADD COLUMN {name} {ddl}'))
+            print(f"Added bot_sessions.{name} column")
+    
+    unique = any(index['unique'] and index['column_names'] == ['user_id'] for index in inspector.get_indexes('bot_sessions'))
+    if not unique:
+        with db.engine.begin() as conn:
+            # Duplicates come from racing first saves, so the newest row per user is kept
+            removed = conn.execute(db.text(
+                "DELETE FROM bot_sessions WHERE id NOT IN ("
+                "SELECT id FROM (SELECT MAX(id) AS id FROM bot_sessions GROUP BY user_id) AS latest)"
+            )).rowcount
+            conn.execute(db.text('CREATE UNIQUE INDEX uq_bot_sessions_user_id ON bot_sessions (user_id)'))
+        print(f"Removed {removed} duplicate session(s), added unique index on bot_sessions.user_id")
+        if removed:
+            rebuild_stat_rollups()
+    
+    print("Bot sessions are ready for patch autosave")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats():
+    """Rebuild statistics rollups from the users, bots and bot_sessions tables."""
+    counters = rebuild_stat_rollups()
+    print(f"Statistics rebuilt: {counters.get(STAT_ACTIVE_USERS, 0)} active users, "
+          f"{counters.get(STAT_ACTIVE_BOTS, 0)} active bots, {counters.get(STAT_SESSIONS, 0)} sessions")
+
+@app.cli.command('create-search-indexes')
+def create_search_indexes():
+    """Add the FULLTEXT indexes used by admin search (MariaDB)."""
+    if db.engine.dialect.name != 'mysql':
+        print("FULLTEXT indexes are MariaDB-only; this database uses the in-process search index")
+        return
+    inspector = db.inspect(db.engine)
+    for table in (User.__table__, Bot.__table__):
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name.startswith('ft_') and index.name not in existing:
+                index.create(db.engine)
+                print(f"Added FULLTEXT index {index.name} on {table.name}")
+    print("Search indexes are ready")
+
+@app.cli.command('search-benchmark')
+@click.option('--type', 'kind', type=click.Choice(list(SEARCH_TARGETS)), default='users', show_default=True)
+@click.option('--queries', default=200, show_default=True, help='Prefix queries to time.')
+def search_benchmark(kind, queries):
+    """Time admin search with prefixes of existing rows against the configured backend."""
+    model, columns = SEARCH_TARGETS[kind]
+    low, high = db.session.execute(db.select(db.func.min(model.id), db.func.max(model.id))).one()
+    if low is None:
+        print(f"No {kind} to search")
+        return
+    
+    rng = random.Random(1)
+    shortest = max(app.config['SEARCH_MIN_TERM_LENGTH'], 2)
+    words = []
+    for _ in range(queries * 5):
+        # Random ids hit the primary key, so sampling stays cheap on large tables
+        text = db.session.execute(
+            db.select(getattr(model, columns[0])).where(model.id >= rng.randint(low, high)).order_by(model.id).limit(1)
+        ).scalar()
+        words.extend(query_terms(text, shortest + 1)[:1])
+        if len(words) >= queries:
+            break
+    if not words:
+        print(f"No words of {shortest + 1}+ characters in {kind}.{columns[0]}")
+        return
+    
+    started = time.perf_counter()
+    search_ids(kind, query_terms(words[0]), 20)
+    print(f"Backend: {search_backend()}, rows: {approximate_row_count(model)}, "
+          f"first query (builds the in-process index): {(time.perf_counter() - started) * 1000:.1f} ms")
+    
+    timings = []
+    for word in words:
+        terms = query_terms(word[:rng.randint(shortest, max(shortest, min(len(word), 6)))], shortest)
+        started = time.perf_counter()
+        search_ids(kind, terms, 20)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"{len(timings)} queries: p50 {timings[len(timings) // 2]:.1f} ms, "
+          f"p95 {timings[min(int(len(timings) * 0.95), len(timings) - 1)]:.1f} ms, max {timings[-1]:.1f} ms")
+
 # API Routes
 @app.route('/api/create-bot', methods=['POST'])
 @login_required
@@ -859,149 +2539,205 @@ def create_bot_api():
     
     try:
         # Generate Python code from config
-        python_code = generate_bot_code(data['config'])
+        runtime = runtime_options(data)
+        python_code = codegen_cache.get_or_generate(generate_bot_code, data['config'], {
+            'name': data['name'], 'token': data.get('token'), **runtime
+        })
         
         bot = Bot(
             name=data['name'],
+            token=data.get('token'),
             config=json.dumps(data['config']),
-            python_code=python_code,
+            python_code=stored_python_code(python_code),
+            generator_version=GENERATOR_VERSION,
+            runtime=stored_runtime(runtime),
             user_id=current_user.id
         )
         
         db.session.add(bot)
+        record_bot_created(current_user.id)
         db.session.commit()
         
         return jsonify({'success': True, 'bot_id': bot.id})
         
+    except BlockConfigError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Precomputed JSON responses
+def precompute_json(payload):
+    """Serialize payload once, with a strong ETag per encoding and gzip/brotli variants"""
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return {
+        'version': digest[:12],
+        'variants': variants,
+        'etags': {encoding: digest if encoding == 'identity' else f'{digest}-{encoding}' for encoding in variants}
+    }
+
+def send_precomputed(precomputed, immutable=False):
+    """Serve a precompute_json() result: 304 on a matching If-None-Match, else the best encoding"""
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in precomputed['variants'] and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    
+    if any(request.if_none_match.contains(etag) for etag in precomputed['etags'].values()):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(precomputed['variants'][encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(precomputed['etags'][encoding])
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Login-only data: browsers may keep it, shared caches may not
+    if immutable:
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Block catalogue for the editor; serialized once at startup, the version changes with its content
+BOT_BLOCKS = {
+    'welcome': {
+        'name': 'Приветствие',
+        'description': 'Отправляет приветственное сообщение при команде /start',
+        'icon': 'fas fa-hand-wave',
+        'color': 'primary',
+        'fields': [
+            {'name': 'message', 'type': 'textarea', 'label': 'Приветственное сообщение', 'required': True}
+        ]
+    },
+    'help': {
+        'name': 'Помощь',
+        'description': 'Показывает список доступных команд',
+        'icon': 'fas fa-question-circle',
+        'color': 'info',
+        'fields': [
+            {'name': 'commands', 'type': 'textarea', 'label': 'Список команд', 'required': True}
+        ]
+    },
+    'about': {
+        'name': 'О боте',
+        'description': 'Показывает информацию о боте',
+        'icon': 'fas fa-info-circle',
+        'color': 'secondary',
+        'fields': [
+            {'name': 'description', 'type': 'textarea', 'label': 'Описание бота', 'required': True}
+        ]
+    },
+    'message': {
+        'name': 'Сообщение',
+        'description': 'Отправляет текстовое сообщение пользователю',
+        'icon': 'fas fa-comment',
+        'color': 'success',
+        'fields': [
+            {'name': 'text', 'type': 'textarea', 'label': 'Текст сообщения', 'required': True}
+        ]
+    },
+    'photo': {
+        'name': 'Фото',
+        'description': 'Отправляет изображение с подписью',
+        'icon': 'fas fa-image',
+        'color': 'success',
+        'fields': [
+            {'name': 'photo_url', 'type': 'url', 'label': 'URL изображения', 'required': True},
+            {'name': 'caption', 'type': 'textarea', 'label': 'Подпись к фото', 'required': False}
+        ]
+    },
+    'document': {
+        'name': 'Документ',
+        'description': 'Отправляет файл пользователю',
+        'icon': 'fas fa-file',
+        'color': 'info',
+        'fields': [
+            {'name': 'document_url', 'type': 'url', 'label': 'URL документа', 'required': True},
+            {'name': 'caption', 'type': 'textarea', 'label': 'Описание документа', 'required': False}
+        ]
+    },
+    'inline_keyboard': {
+        'name': 'Инлайн кнопки',
+        'description': 'Создает интерактивные кнопки под сообщением. Кнопки исчезают после нажатия.',
+        'icon': 'fas fa-keyboard',
+        'color': 'warning',
+        'fields': [
+            {'name': 'text', 'type': 'textarea', 'label': 'Текст сообщения с кнопками', 'required': True},
+            {'name': 'buttons', 'type': 'json', 'label': 'JSON структура кнопок', 'required': True}
+        ]
+    },
+    'reply_keyboard': {
+        'name': 'Клавиатура',
+        'description': 'Создает постоянную клавиатуру для пользователя. Остается видимой до скрытия.',
+        'icon': 'fas fa-keyboard',
+        'color': 'secondary',
+        'fields': [
+            {'name': 'buttons', 'type': 'json', 'label': 'JSON структура кнопок', 'required': True},
+            {'name': 'resize', 'type': 'checkbox', 'label': 'Автоматически изменять размер', 'required': False},
+            {'name': 'one_time', 'type': 'checkbox', 'label': 'Одноразовая клавиатура', 'required': False}
+        ]
+    },
+    'condition': {
+        'name': 'Условие',
+        'description': 'Выполняет действия в зависимости от условия',
+        'icon': 'fas fa-code-branch',
+        'color': 'dark',
+        'fields': [
+            {'name': 'condition', 'type': 'text', 'label': 'Условие (Python код)', 'required': True},
+            {'name': 'true_action', 'type': 'text', 'label': 'Действие если True', 'required': True},
+            {'name': 'false_action', 'type': 'text', 'label': 'Действие если False', 'required': False}
+        ]
+    },
+    'loop': {
+        'name': 'Цикл',
+        'description': 'Повторяет действия заданное количество раз',
+        'icon': 'fas fa-redo',
+        'color': 'info',
+        'fields': [
+            {'name': 'iterations', 'type': 'number', 'label': 'Количество повторений', 'required': True},
+            {'name': 'action', 'type': 'text', 'label': 'Действие для повторения', 'required': True}
+        ]
+    },
+    'custom': {
+        'name': 'Кастомный ответ',
+        'description': 'Отвечает на определенные ключевые слова',
+        'icon': 'fas fa-magic',
+        'color': 'purple',
+        'fields': [
+            {'name': 'keywords', 'type': 'text', 'label': 'Ключевые слова (через запятую)', 'required': True},
+            {'name': 'response', 'type': 'textarea', 'label': 'Ответ на ключевые слова', 'required': True}
+        ]
+    },
+    'echo': {
+        'name': 'Эхо',
+        'description': 'Повторяет все сообщения пользователя',
+        'icon': 'fas fa-undo',
+        'color': 'light',
+        'fields': [
+            {'name': 'prefix', 'type': 'text', 'label': 'Префикс перед сообщением', 'required': False}
+        ]
+    }
+}
+
+bot_blocks_response = precompute_json(BOT_BLOCKS)
+
 @app.route('/api/bot-blocks', methods=['GET'])
 @login_required
 def get_bot_blocks():
-    """Get available bot blocks with descriptions"""
-    blocks = {
-        'welcome': {
-            'name': 'Приветствие',
-            'description': 'Отправляет приветственное сообщение при команде /start',
-            'icon': 'fas fa-hand-wave',
-            'color': 'primary',
-            'fields': [
-                {'name': 'message', 'type': 'textarea', 'label': 'Приветственное сообщение', 'required': True}
-            ]
-        },
-        'help': {
-            'name': 'Помощь',
-            'description': 'Показывает список доступных команд',
-            'icon': 'fas fa-question-circle',
-            'color': 'info',
-            'fields': [
-                {'name': 'commands', 'type': 'textarea', 'label': 'Список команд', 'required': True}
-            ]
-        },
-        'about': {
-            'name': 'О боте',
-            'description': 'Показывает информацию о боте',
-            'icon': 'fas fa-info-circle',
-            'color': 'secondary',
-            'fields': [
-                {'name': 'description', 'type': 'textarea', 'label': 'Описание бота', 'required': True}
-            ]
-        },
-        'message': {
-            'name': 'Сообщение',
-            'description': 'Отправляет текстовое сообщение пользователю',
-            'icon': 'fas fa-comment',
-            'color': 'success',
-            'fields': [
-                {'name': 'text', 'type': 'textarea', 'label': 'Текст сообщения', 'required': True}
-            ]
-        },
-        'photo': {
-            'name': 'Фото',
-            'description': 'Отправляет изображение с подписью',
-            'icon': 'fas fa-image',
-            'color': 'success',
-            'fields': [
-                {'name': 'photo_url', 'type': 'url', 'label': 'URL изображения', 'required': True},
-                {'name': 'caption', 'type': 'textarea', 'label': 'Подпись к фото', 'required': False}
-            ]
-        },
-        'document': {
-            'name': 'Документ',
-            'description': 'Отправляет файл пользователю',
-            'icon': 'fas fa-file',
-            'color': 'info',
-            'fields': [
-                {'name': 'document_url', 'type': 'url', 'label': 'URL документа', 'required': True},
-                {'name': 'caption', 'type': 'textarea', 'label': 'Описание документа', 'required': False}
-            ]
-        },
-        'inline_keyboard': {
-            'name': 'Инлайн кнопки',
-            'description': 'Создает интерактивные кнопки под сообщением. Кнопки исчезают после нажатия.',
-            'icon': 'fas fa-keyboard',
-            'color': 'warning',
-            'fields': [
-                {'name': 'text', 'type': 'textarea', 'label': 'Текст сообщения с кнопками', 'required': True},
-                {'name': 'buttons', 'type': 'json', 'label': 'JSON структура кнопок', 'required': True}
-            ]
-        },
-        'reply_keyboard': {
-            'name': 'Клавиатура',
-            'description': 'Создает постоянную клавиатуру для пользователя. Остается видимой до скрытия.',
-            'icon': 'fas fa-keyboard',
-            'color': 'secondary',
-            'fields': [
-                {'name': 'buttons', 'type': 'json', 'label': 'JSON структура кнопок', 'required': True},
-                {'name': 'resize', 'type': 'checkbox', 'label': 'Автоматически изменять размер', 'required': False},
-                {'name': 'one_time', 'type': 'checkbox', 'label': 'Одноразовая клавиатура', 'required': False}
-            ]
-        },
-        'condition': {
-            'name': 'Условие',
-            'description': 'Выполняет действия в зависимости от условия',
-            'icon': 'fas fa-code-branch',
-            'color': 'dark',
-            'fields': [
-                {'name': 'condition', 'type': 'text', 'label': 'Условие (Python код)', 'required': True},
-                {'name': 'true_action', 'type': 'text', 'label': 'Действие если True', 'required': True},
-                {'name': 'false_action', 'type': 'text', 'label': 'Действие если False', 'required': False}
-            ]
-        },
-        'loop': {
-            'name': 'Цикл',
-            'description': 'Повторяет действия заданное количество раз',
-            'icon': 'fas fa-redo',
-            'color': 'info',
-            'fields': [
-                {'name': 'iterations', 'type': 'number', 'label': 'Количество повторений', 'required': True},
-                {'name': 'action', 'type': 'text', 'label': 'Действие для повторения', 'required': True}
-            ]
-        },
-        'custom': {
-            'name': 'Кастомный ответ',
-            'description': 'Отвечает на определенные ключевые слова',
-            'icon': 'fas fa-magic',
-            'color': 'purple',
-            'fields': [
-                {'name': 'keywords', 'type': 'text', 'label': 'Ключевые слова (через запятую)', 'required': True},
-                {'name': 'response', 'type': 'textarea', 'label': 'Ответ на ключевые слова', 'required': True}
-            ]
-        },
-        'echo': {
-            'name': 'Эхо',
-            'description': 'Повторяет все сообщения пользователя',
-            'icon': 'fas fa-undo',
-            'color': 'light',
-            'fields': [
-                {'name': 'prefix', 'type': 'text', 'label': 'Префикс перед сообщением', 'required': False}
-            ]
-        }
-    }
-    
-    return jsonify(blocks)
+    """Get available bot blocks with descriptions.
+
+    /api/bot-blocks?v=<version> (version from the X-Bot-Blocks-Version header) may be cached forever.
+    The editor page still ships its own blockTypes copy, so this is for API clients only.
+    """
+    response = send_precomputed(bot_blocks_response,
+                                immutable=request.args.get('v') == bot_blocks_response['version'])
+    response.headers['X-Bot-Blocks-Version'] = bot_blocks_response['version']
+    return response
 
 if __name__ == '__main__':
     with app.app_context():
@@ -1014,10 +2750,11 @@ if __name__ == '__main__':
                 admin_user = User(
                     email='admin',
                     name='Administrator',
-                    password_hash=generate_password_hash('password'),
+                    password_hash=password_hasher.hash('password'),
                     is_admin=True
                 )
                 db.session.add(admin_user)
+                record_user_created(admin_user)
                 db.session.commit()
                 print("Default admin user created: admin / password")
             
@@ -0,0 +1,1342 @@
+#!/usr/bin/env python3
+"""
+Telegram bot code generation for Bot Creator Platform
+Generated scripts are memoized by a canonical hash of the config and the generator fingerprint
+"""
+
+import os
+import json
+import shutil
+import string
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Bump when generated output changes in a way the source fingerprint cannot see
+GENERATOR_VERSION = '8'
+
+def _source_fingerprint(paths):
+    digest = hashlib.sha256(GENERATOR_VERSION.encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# Any edit to this module changes the fingerprint, which retires every cached script
+GENERATOR_FINGERPRINT = _source_fingerprint([os.path.abspath(__file__)])
+
+class BlockConfigError(ValueError):
+    """A block in the bot config cannot be compiled"""
+
+def compile_template(text):
+    """Split a str.format template once into (literal, field) pairs for fast rendering"""
+    return [(literal, field) for literal, field, _, _ in string.Formatter().parse(text)]
+
+def render_template(parts, values):
+    out = []
+    for literal, field in parts:
+        out.append(literal)
+        if field is not None:
+            out.append(values[field])
+    return ''.join(out)
+
+# Block registry: type -> (compiled template, function returning the template values)
+BLOCK_COMPILERS = {}
+
+def block_compiler(block_type, template):
+    parts = compile_template(template)
+
+    def register(func):
+        BLOCK_COMPILERS[block_type] = (parts, func)
+        return func
+    return register
+
+def _text(config, key, default=''):
+    """Python literal for a user-supplied string; repr() keeps quotes and newlines safe"""
+    value = config.get(key)
+    return repr(str(value) if value not in (None, '') else default)
+
+def _buttons(config):
+    buttons = config.get('buttons')
+    if isinstance(buttons, str):
+        try:
+            buttons = json.loads(buttons)
+        except ValueError:
+            raise BlockConfigError('Некорректный JSON кнопок')
+    if not isinstance(buttons, list) or not all(isinstance(row, list) for row in buttons):
+        raise BlockConfigError('Кнопки должны быть списком рядов')
+    return repr([[str(button) for button in row] for row in buttons])
+
+HEADER_TEMPLATE = compile_template('''#!/usr/bin/env python3
+"""
+{title} - Telegram Bot
+Создан с помощью Bot Creator Platform
+"""
+
+import os
+import logging
+from collections import deque
+from datetime import datetime
+{imports}
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Адрес Bot API можно переопределить для локального сервера Bot API или тестового стенда
+API_URL = os.environ.get('TELEGRAM_API_URL')
+{init}
+# Обработчики команд
+''')
+
+RUNTIME_TARGETS = ('polling', 'webhook', 'async')
+
+# Per-target imports, bot construction and entry point
+RUNTIME_IMPORTS = {
+    'polling': '''import telebot
+from telebot import apihelper, types
+''',
+    'webhook': '''import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import telebot
+from telebot import apihelper, types
+''',
+    'async': '''import asyncio
+from telebot import asyncio_helper, types
+from telebot.async_telebot import AsyncTeleBot
+'''
+}
+
+# requirements.txt shipped next to a generated script, per target
+RUNTIME_REQUIREMENTS = {
+    'polling': ['pyTelegramBotAPI>=4.14'],
+    'webhook': ['pyTelegramBotAPI>=4.14'],
+    'async': ['pyTelegramBotAPI>=4.14', 'aiohttp>=3.8']
+}
+
+RUNTIME_INIT = {
+    'polling': compile_template('''
+if API_URL:
+    apihelper.API_URL = API_URL
+
+{bot_classes}
+# Инициализация бота: обновления обрабатывает пул из {workers} потоков
+bot = {bot_class}({token}, num_threads={workers})
+'''),
+    'webhook': compile_template('''
+if API_URL:
+    apihelper.API_URL = API_URL
+
+{bot_classes}
+# Инициализация бота: обновления обрабатывает пул вебхука, а не внутренние потоки telebot
+bot = {bot_class}({token}, threaded=False)
+'''),
+    'async': compile_template('''
+if API_URL:
+    asyncio_helper.API_URL = API_URL
+
+class BoundedAsyncTeleBot(AsyncTeleBot):
+    """AsyncTeleBot, одновременно обрабатывающий не больше max_concurrent обновлений"""
+
+    def __init__(self, token, max_concurrent):
+        super().__init__(token)
+        self.update_slots = asyncio.Semaphore(max_concurrent)
+
+    async def process_new_updates(self, updates):
+        async def process_one(update):
+            async with self.update_slots:
+                await super(BoundedAsyncTeleBot, self).process_new_updates([update])
+        await asyncio.gather(*(process_one(update) for update in updates))
+{bot_classes}
+# Инициализация бота: не больше {workers} обновлений обрабатываются одновременно
+bot = {bot_class}({token}, max_concurrent={workers})
+''')
+}
+
+# Outbound queue emitted when send_queue is on; bot send_* calls only enqueue
+SEND_QUEUE_IMPORTS = '''import threading
+import time
+'''
+
+SEND_QUEUE_TEMPLATE = compile_template('''
+# Ограничения исходящих сообщений: всего в секунду и в минуту на один чат
+SEND_RATE_GLOBAL = {global_rate}
+SEND_RATE_PER_CHAT = {chat_rate}
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now):
+        """Сколько секунд ждать следующего токена, 0 - можно отправлять"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class OutboundQueue:
+    """Очередь исходящих сообщений с ограничением частоты по каждому чату и в целом.
+
+    Рабочие потоки забирают готовые сообщения пачками, не больше одного на чат, поэтому
+    порядок внутри чата сохраняется. При ответе 429 сообщение возвращается в начало
+    очереди чата, а чат ждет retry_after секунд.
+    """
+
+    def __init__(self, global_rate, chat_rate, workers=2, batch_size=10, chat_burst=3, max_attempts=5):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate / 60
+        self.chat_burst = chat_burst
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.chats = {{}}
+        self.buckets = {{}}
+        self.paused = {{}}
+        self.busy = set()
+        self.ready = deque()
+        self.cond = threading.Condition()
+        for _ in range(workers):
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, chat_id, send):
+        with self.cond:
+            pending = self.chats.get(chat_id)
+            if pending is None:
+                pending = self.chats[chat_id] = deque()
+                self.ready.append(chat_id)
+            pending.append([send, 0])
+            self.cond.notify()
+
+    def bucket(self, chat_id):
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            if len(self.buckets) > 10000:
+                # Корзины простаивающих чатов уже полные, их можно создать заново
+                self.buckets = {{key: value for key, value in self.buckets.items() if key in self.chats}}
+            bucket = self.buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def take_batch(self):
+        now = time.monotonic()
+        batch, wait = [], None
+        for _ in range(len(self.ready)):
+            if len(batch) >= self.batch_size:
+                break
+            chat_id = self.ready[0]
+            self.ready.rotate(-1)
+            if chat_id in self.busy:
+                continue
+            bucket = self.bucket(chat_id)
+            delay = max(self.paused.get(chat_id, 0) - now, bucket.delay(now), self.global_bucket.delay(now))
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            bucket.tokens -= 1
+            self.global_bucket.tokens -= 1
+            self.paused.pop(chat_id, None)
+            pending = self.chats[chat_id]
+            batch.append((chat_id, pending.popleft()))
+            self.busy.add(chat_id)
+            if not pending:
+                del self.chats[chat_id]
+                self.ready.remove(chat_id)
+        return batch, wait
+
+    def run(self):
+        while True:
+            with self.cond:
+                batch, wait = self.take_batch()
+                if not batch:
+                    self.cond.wait(wait)
+                    continue
+            for chat_id, job in batch:
+                self.deliver(chat_id, job)
+
+    def deliver(self, chat_id, job):
+        retry_after = None
+        try:
+            job[0]()
+        except Exception as e:
+            if getattr(e, 'error_code', None) == 429 and job[1] + 1 < self.max_attempts:
+                parameters = (getattr(e, 'result_json', None) or {{}}).get('parameters') or {{}}
+                retry_after = parameters.get('retry_after', 1)
+                logger.warning(f"Flood limit for chat {{chat_id}}, retrying in {{retry_after}}s")
+            else:
+                logger.error(f"Error sending message to chat {{chat_id}}: {{e}}")
+        with self.cond:
+            self.busy.discard(chat_id)
+            if retry_after is not None:
+                job[1] += 1
+                self.paused[chat_id] = time.monotonic() + retry_after
+                pending = self.chats.get(chat_id)
+                if pending is None:
+                    pending = self.chats[chat_id] = deque()
+                    self.ready.append(chat_id)
+                pending.appendleft(job)
+            self.cond.notify_all()
+
+outbound_queue = OutboundQueue(SEND_RATE_GLOBAL, SEND_RATE_PER_CHAT, workers={send_workers})
+''')
+
+PACED_BOT = {
+    'sync': compile_template('''
+class PacedTeleBot({base}):
+    """TeleBot, отправляющий сообщения через очередь исходящих"""
+
+    def send_message(self, chat_id, text, *args, **kwargs):
+        outbound_queue.submit(chat_id, lambda: {base}.send_message(self, chat_id, text, *args, **kwargs))
+
+    def send_photo(self, chat_id, photo, *args, **kwargs):
+        outbound_queue.submit(chat_id, lambda: {base}.send_photo(self, chat_id, photo, *args, **kwargs))
+
+    def send_document(self, chat_id, document, *args, **kwargs):
+        outbound_queue.submit(chat_id, lambda: {base}.send_document(self, chat_id, document, *args, **kwargs))
+'''),
+    'async': compile_template('''
+class PacedAsyncTeleBot({base}):
+    """AsyncTeleBot, отправляющий сообщения через очередь исходящих"""
+
+    def enqueue(self, chat_id, coroutine_factory):
+        # Рабочие потоки очереди выполняют отправку в цикле событий бота и ждут результата
+        loop = asyncio.get_running_loop()
+        outbound_queue.submit(chat_id, lambda: asyncio.run_coroutine_threadsafe(coroutine_factory(), loop).result())
+
+    async def send_message(self, chat_id, text, *args, **kwargs):
+        self.enqueue(chat_id, lambda: {base}.send_message(self, chat_id, text, *args, **kwargs))
+
+    async def send_photo(self, chat_id, photo, *args, **kwargs):
+        self.enqueue(chat_id, lambda: {base}.send_photo(self, chat_id, photo, *args, **kwargs))
+
+    async def send_document(self, chat_id, document, *args, **kwargs):
+        self.enqueue(chat_id, lambda: {base}.send_document(self, chat_id, document, *args, **kwargs))
+''')
+}
+
+# file_id cache emitted for bots with photo/document blocks
+# Async runner for the Python actions of condition and loop blocks, emitted on the async target only.
+# exec() would drop the coroutines AsyncTeleBot calls return, so the action becomes an async function
+# whose expression statements are awaited when they produce an awaitable.
+ACTION_RUNNER_IMPORTS = '''import ast
+import inspect
+'''
+
+ACTION_RUNNER_TEMPLATE = '''
+class AwaitActionCalls(ast.NodeTransformer):
+    """Дожидается результата каждого выражения действия, если это корутина (bot.send_message и т.п.)"""
+
+    def visit_Expr(self, node):
+        node.value = ast.Await(ast.Call(ast.Name('resolve_awaitable', ast.Load()), [node.value], []))
+        return node
+
+    def visit_FunctionDef(self, node):
+        # Вложенные функции действия остаются как есть
+        return node
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_ClassDef = visit_FunctionDef
+
+async def resolve_awaitable(value):
+    return await value if inspect.isawaitable(value) else value
+
+async def run_action(code, scope):
+    """Выполняет код действия блока как async-функцию с переменными обработчика (message, i)"""
+    module = ast.parse('async def action():\\n    pass')
+    module.body[0].body = AwaitActionCalls().visit(ast.parse(code)).body or [ast.Pass()]
+    ast.fix_missing_locations(module)
+    namespace = dict(globals(), **scope)
+    exec(compile(module, '<action>', 'exec'), namespace)
+    await namespace['action']()
+'''
+
+FILE_ID_CACHE_IMPORTS = '''import sqlite3
+import threading
+import time
+'''
+
+FILE_ID_CACHE_TEMPLATE = compile_template('''
+# Кэш file_id: Telegram не скачивает файл по URL заново, если отправить уже загруженный file_id
+FILE_ID_CACHE_PATH = os.environ.get(
+    'FILE_ID_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'file_ids.sqlite3')
+)
+FILE_ID_CACHE_SIZE = {file_id_cache_size}
+
+class FileIdCache:
+    """file_id загруженных файлов по URL в локальной SQLite-базе; вытесняются давно не использованные"""
+
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS file_ids '
+            '(url TEXT PRIMARY KEY, file_id TEXT NOT NULL, used_at REAL NOT NULL)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS idx_file_ids_used_at ON file_ids (used_at)')
+        self.entries = dict(self.db.execute('SELECT url, file_id FROM file_ids'))
+
+    def get(self, url):
+        with self.lock:
+            file_id = self.entries.get(url)
+            if file_id:
+                self.db.execute('UPDATE file_ids SET used_at = ? WHERE url = ?', (time.time(), url))
+            return file_id
+
+    def put(self, url, file_id):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO file_ids (url, file_id, used_at) VALUES (?, ?, ?)',
+                            (url, file_id, time.time()))
+            self.entries[url] = file_id
+            excess = len(self.entries) - self.max_entries
+            if excess > 0:
+                evicted = [row[0] for row in self.db.execute(
+                    'SELECT url FROM file_ids ORDER BY used_at LIMIT ?', (excess,)
+                )]
+                self.db.executemany('DELETE FROM file_ids WHERE url = ?', [(key,) for key in evicted])
+                for key in evicted:
+                    self.entries.pop(key, None)
+
+    def delete(self, url):
+        with self.lock:
+            self.db.execute('DELETE FROM file_ids WHERE url = ?', (url,))
+            self.entries.pop(url, None)
+
+file_id_cache = FileIdCache(FILE_ID_CACHE_PATH, FILE_ID_CACHE_SIZE)
+
+{def_} send_cached_media(send, media, kind):
+    """Отправить файл по URL, подставив file_id из кэша, и запомнить file_id первой загрузки"""
+    if not isinstance(media, str) or not media.startswith(('http://', 'https://')):
+        return {await_}send(media)
+    file_id = file_id_cache.get(media)
+    if file_id:
+        try:
+            return {await_}send(file_id)
+        except Exception as e:
+            if getattr(e, 'error_code', None) != 400:
+                raise
+            # file_id больше не принимается: загружаем файл по URL заново
+            logger.warning(f"Cached file_id for {{media}} rejected: {{e}}")
+            file_id_cache.delete(media)
+    result = {await_}send(media)
+    uploaded = getattr(result, kind, None)
+    if isinstance(uploaded, list):
+        # У фото несколько размеров, последний - самый большой
+        uploaded = uploaded[-1] if uploaded else None
+    if uploaded is not None and getattr(uploaded, 'file_id', None):
+        file_id_cache.put(media, uploaded.file_id)
+    return result
+
+class CachedMediaTeleBot({base}):
+    """Бот, повторно использующий file_id уже загруженных фото и документов"""
+
+    {def_} send_photo(self, chat_id, photo, *args, **kwargs):
+        return {await_}send_cached_media(lambda media: {base}.send_photo(self, chat_id, media, *args, **kwargs), photo, 'photo')
+
+    {def_} send_document(self, chat_id, document, *args, **kwargs):
+        return {await_}send_cached_media(lambda media: {base}.send_document(self, chat_id, media, *args, **kwargs), document, 'document')
+''')
+
+RUNTIME_MAIN = {
+    'polling': compile_template('''
+
+# Запуск бота
+if __name__ == '__main__':
+    try:
+        logger.info("Starting bot...")
+        bot.polling(timeout=60)
+    except KeyboardInterrupt:
+        logger.info("Bot stopped by user")
+    except Exception as e:
+        logger.error(f"Bot error: {{e}}")
+    finally:
+        logger.info("Bot stopped")
+'''),
+    'webhook': compile_template('''
+
+# Настройки вебхука
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', {webhook_port}))
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+
+# Ограниченный пул обработчиков и очередь не длиннее MAX_PENDING_UPDATES
+MAX_PENDING_UPDATES = {max_pending}
+update_pool = ThreadPoolExecutor(max_workers={workers})
+update_slots = threading.BoundedSemaphore(MAX_PENDING_UPDATES)
+
+def process_update(update):
+    try:
+        bot.process_new_updates([update])
+    except Exception as e:
+        logger.error(f"Error processing update: {{e}}")
+    finally:
+        update_slots.release()
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Принимает обновления от Telegram и передает их в пул обработчиков"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        if WEBHOOK_SECRET and self.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+            return self.respond(403)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        # Очередь заполнена: Telegram повторит доставку позже
+        if not update_slots.acquire(blocking=False):
+            return self.respond(503)
+        try:
+            update = types.Update.de_json(body.decode('utf-8'))
+        except Exception as e:
+            update_slots.release()
+            logger.error(f"Invalid update: {{e}}")
+            return self.respond(400)
+        update_pool.submit(process_update, update)
+        self.respond(200)
+
+# Запуск бота
+if __name__ == '__main__':
+    server = HTTPServer((WEBHOOK_HOST, WEBHOOK_PORT), WebhookHandler)
+    try:
+        if WEBHOOK_URL:
+            bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET or None, max_connections={workers})
+        logger.info(f"Starting webhook server on {{WEBHOOK_HOST}}:{{WEBHOOK_PORT}}...")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Bot stopped by user")
+    except Exception as e:
+        logger.error(f"Bot error: {{e}}")
+    finally:
+        server.server_close()
+        update_pool.shutdown(wait=True)
+        logger.info("Bot stopped")
+'''),
+    'async': compile_template('''
+
+# Запуск бота
+if __name__ == '__main__':
+    try:
+        logger.info("Starting bot...")
+        asyncio.run(bot.polling(timeout=60))
+    except KeyboardInterrupt:
+        logger.info("Bot stopped by user")
+    except Exception as e:
+        logger.error(f"Bot error: {{e}}")
+    finally:
+        logger.info("Bot stopped")
+''')
+}
+
+DEFAULT_RUNTIME = {
+    'target': 'polling', 'workers': 4, 'max_pending': 100, 'webhook_port': 8443,
+    'send_queue': True, 'global_rate': 25, 'chat_rate': 60, 'send_workers': 2,
+    'file_id_cache': True, 'file_id_cache_size': 1000
+}
+
+# Allowed ranges for the numeric runtime settings; rates are messages per second (global) and per minute (chat)
+RUNTIME_LIMITS = {
+    'workers': (1, 64), 'max_pending': (1, 10000), 'webhook_port': (1, 65535),
+    'global_rate': (1, 30), 'chat_rate': (1, 600), 'send_workers': (1, 16),
+    'file_id_cache_size': (10, 100000)
+}
+
+def runtime_options(data):
+    """Validated runtime settings (target and concurrency) from a request payload, defaults filled in"""
+    options = dict(DEFAULT_RUNTIME)
+    target = data.get('target') or options['target']
+    if target not in RUNTIME_TARGETS:
+        raise BlockConfigError(f'Неизвестный режим запуска: {target}')
+    options['target'] = target
+    for flag in ('send_queue', 'file_id_cache'):
+        if data.get(flag) is not None:
+            options[flag] = data[flag] not in (False, 0, '0', 'false', 'off', '')
+    for key, (low, high) in RUNTIME_LIMITS.items():
+        if data.get(key) in (None, ''):
+            continue
+        try:
+            value = int(data[key])
+        except (TypeError, ValueError):
+            raise BlockConfigError(f'Параметр {key} должен быть числом')
+        if not low <= value <= high:
+            raise BlockConfigError(f'Параметр {key} должен быть от {low} до {high}')
+        options[key] = value
+    return options
+
+@block_compiler('welcome', '''
+@bot.message_handler(commands=['start'])
+{def_} send_welcome(message):
+    """Обработчик команды /start"""
+    try:
+        welcome_message = {message}
+        {await_}bot.reply_to(message, welcome_message)
+        logger.info(f"User {{message.from_user.id}} started the bot")
+    except Exception as e:
+        logger.error(f"Error in send_welcome: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _welcome(config):
+    return {'message': _text(config, 'message', 'Добро пожаловать! Я ваш новый Telegram бот.')}
+
+@block_compiler('help', '''
+@bot.message_handler(commands=['help'])
+{def_} send_help(message):
+    """Обработчик команды /help"""
+    try:
+        help_text = {commands}
+        {await_}bot.reply_to(message, help_text)
+        logger.info(f"User {{message.from_user.id}} requested help")
+    except Exception as e:
+        logger.error(f"Error in send_help: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _help(config):
+    return {'commands': _text(config, 'commands', 'Доступные команды:\n/start - Начать работу\n/help - Помощь\n/about - О боте')}
+
+@block_compiler('about', '''
+@bot.message_handler(commands=['about'])
+{def_} send_about(message):
+    """Обработчик команды /about"""
+    try:
+        about_text = {description}
+        {await_}bot.reply_to(message, about_text)
+        logger.info(f"User {{message.from_user.id}} requested about info")
+    except Exception as e:
+        logger.error(f"Error in send_about: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _about(config):
+    if config.get('description'):
+        return {'description': _text(config, 'description')}
+    # The creation date is resolved when the bot runs so generated code stays cacheable
+    default = 'Этот бот создан с помощью Bot Creator Platform.\nВерсия: 1.0\nДата создания: '
+    return {'description': f"{default!r} + datetime.now().strftime('%d.%m.%Y')"}
+
+@block_compiler('message', '''
+@bot.message_handler(commands=['message'])
+{def_} send_message(message):
+    """Отправить текстовое сообщение"""
+    try:
+        message_text = {text}
+        {await_}bot.reply_to(message, message_text)
+        logger.info(f"User {{message.from_user.id}} requested message")
+    except Exception as e:
+        logger.error(f"Error in send_message: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _message(config):
+    return {'text': _text(config, 'text', 'Это текстовое сообщение')}
+
+@block_compiler('photo', '''
+@bot.message_handler(commands=['photo'])
+{def_} send_photo(message):
+    """Отправить фото"""
+    try:
+        photo_url = {photo_url}
+        caption = {caption}
+        {await_}bot.send_photo(message.chat.id, photo_url, caption=caption)
+        logger.info(f"User {{message.from_user.id}} requested photo")
+    except Exception as e:
+        logger.error(f"Error in send_photo: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _photo(config):
+    return {
+        'photo_url': _text(config, 'photo_url', 'https://example.com/image.jpg'),
+        'caption': _text(config, 'caption')
+    }
+
+@block_compiler('document', '''
+@bot.message_handler(commands=['document'])
+{def_} send_document(message):
+    """Отправить документ"""
+    try:
+        doc_url = {document_url}
+        caption = {caption}
+        {await_}bot.send_document(message.chat.id, doc_url, caption=caption)
+        logger.info(f"User {{message.from_user.id}} requested document")
+    except Exception as e:
+        logger.error(f"Error in send_document: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _document(config):
+    return {
+        'document_url': _text(config, 'document_url', 'https://example.com/document.pdf'),
+        'caption': _text(config, 'caption')
+    }
+
+@block_compiler('inline_keyboard', '''
+@bot.message_handler(commands=['menu'])
+{def_} show_menu(message):
+    """Показать меню с инлайн кнопками"""
+    try:
+        markup = types.InlineKeyboardMarkup()
+        buttons_data = {buttons}
+
+        for row in buttons_data:
+            markup.row(*[types.InlineKeyboardButton(text=btn, callback_data='_'.join(btn.lower().split())) for btn in row])
+
+        {await_}bot.reply_to(message, {text}, reply_markup=markup)
+        logger.info(f"User {{message.from_user.id}} requested menu")
+    except Exception as e:
+        logger.error(f"Error in show_menu: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+
+# Обработчик нажатий на инлайн кнопки
+@bot.callback_query_handler(func=lambda call: True)
+{def_} handle_callback_query(call):
+    """Обработчик нажатий на инлайн кнопки"""
+    try:
+        {await_}bot.answer_callback_query(call.id)
+        button_text = call.data.replace('_', ' ').title()
+        {await_}bot.send_message(call.message.chat.id, f"Вы выбрали: {{button_text}}")
+        logger.info(f"User {{call.from_user.id}} clicked button: {{button_text}}")
+    except Exception as e:
+        logger.error(f"Error in handle_callback_query: {{e}}")
+        {await_}bot.answer_callback_query(call.id, "Произошла ошибка")
+''')
+def _inline_keyboard(config):
+    if not config.get('text') or not config.get('buttons'):
+        return None
+    return {'text': _text(config, 'text'), 'buttons': _buttons(config)}
+
+@block_compiler('reply_keyboard', '''
+@bot.message_handler(commands=['keyboard'])
+{def_} show_keyboard(message):
+    """Показать клавиатуру"""
+    try:
+        markup = types.ReplyKeyboardMarkup(resize_keyboard={resize}, one_time_keyboard={one_time})
+        buttons_data = {buttons}
+
+        for row in buttons_data:
+            markup.row(*[types.KeyboardButton(btn) for btn in row])
+
+        {await_}bot.reply_to(message, "Выберите опцию:", reply_markup=markup)
+        logger.info(f"User {{message.from_user.id}} requested keyboard")
+    except Exception as e:
+        logger.error(f"Error in show_keyboard: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+
+@bot.message_handler(commands=['hide_keyboard'])
+{def_} hide_keyboard(message):
+    """Скрыть клавиатуру"""
+    try:
+        markup = types.ReplyKeyboardRemove()
+        {await_}bot.reply_to(message, "Клавиатура скрыта", reply_markup=markup)
+        logger.info(f"User {{message.from_user.id}} hid keyboard")
+    except Exception as e:
+        logger.error(f"Error in hide_keyboard: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _reply_keyboard(config):
+    if not config.get('buttons'):
+        return None
+    return {
+        'buttons': _buttons(config),
+        'resize': repr(bool(config.get('resize'))),
+        'one_time': repr(bool(config.get('one_time')))
+    }
+
+@block_compiler('condition', '''
+@bot.message_handler(func=lambda message: True)
+{def_} handle_condition(message):
+    """Обработчик условного блока"""
+    try:
+        if eval({condition}):
+            {exec_}({true_action}{exec_scope})
+        else:
+            {exec_}({false_action}{exec_scope})
+        logger.info(f"User {{message.from_user.id}} triggered condition block")
+    except Exception as e:
+        logger.error(f"Error in handle_condition: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _condition(config):
+    return {
+        'condition': _text(config, 'condition', 'False'),
+        'true_action': _text(config, 'true_action', 'pass'),
+        'false_action': _text(config, 'false_action', 'pass')
+    }
+
+@block_compiler('loop', '''
+@bot.message_handler(func=lambda message: True)
+{def_} handle_loop(message):
+    """Обработчик цикла"""
+    try:
+        iterations = {iterations}
+        action_code = {action}
+
+        for i in range(iterations):
+            {exec_}(action_code{exec_scope})
+            logger.info(f"User {{message.from_user.id}} completed loop iteration {{i+1}}")
+        logger.info(f"User {{message.from_user.id}} finished loop")
+    except Exception as e:
+        logger.error(f"Error in handle_loop: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _loop(config):
+    try:
+        iterations = int(config.get('iterations') or 1)
+    except (TypeError, ValueError):
+        raise BlockConfigError('Количество повторений должно быть числом')
+    return {'iterations': repr(iterations), 'action': _text(config, 'action', 'pass')}
+
+@block_compiler('custom', '''
+@bot.message_handler(func=lambda message: any(keyword.lower() in message.text.lower() for keyword in {keywords}))
+{def_} custom_response(message):
+    """Обработчик кастомных ключевых слов"""
+    try:
+        response = {response}
+        {await_}bot.reply_to(message, response)
+        logger.info(f"User {{message.from_user.id}} triggered custom response")
+    except Exception as e:
+        logger.error(f"Error in custom_response: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _custom(config):
+    if not config.get('keywords') or not config.get('response'):
+        return None
+    # Empty keywords (e.g. from a trailing comma) would match every message
+    keywords = [keyword.strip().lower() for keyword in str(config['keywords']).split(',') if keyword.strip()]
+    if not keywords:
+        return None
+    return {
+        'keywords': repr(keywords),
+        'response': _text(config, 'response'),
+        'keyword_list': keywords,
+        'response_text': str(config['response'])
+    }
+
+# All custom blocks are merged into this single handler when keyword_dispatch='matcher'
+KEYWORD_DISPATCH_TEMPLATE = compile_template('''
+# Кастомные ответы: ключевое слово -> номер ответа (меньший номер имеет приоритет)
+CUSTOM_RESPONSES = {responses}
+CUSTOM_KEYWORDS = {keywords}
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасик: один проход по тексту при любом числе ключевых слов"""
+
+    def __init__(self, keywords):
+        self.goto = [{{}}]
+        self.fail = [0]
+        self.best = [None]
+        for keyword, priority in keywords:
+            node = 0
+            for char in keyword:
+                if char not in self.goto[node]:
+                    self.goto[node][char] = len(self.goto)
+                    self.goto.append({{}})
+                    self.fail.append(0)
+                    self.best.append(None)
+                node = self.goto[node][char]
+            if self.best[node] is None or priority < self.best[node]:
+                self.best[node] = priority
+
+        # Суффиксные ссылки строятся обходом в ширину
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+
+    def match(self, text):
+        """Номер ответа с наивысшим приоритетом среди найденных ключевых слов или None"""
+        goto, fail, best = self.goto, self.fail, self.best
+        node, found = 0, None
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            priority = best[node]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found == 0:
+                    break
+        return found
+
+keyword_matcher = KeywordMatcher(CUSTOM_KEYWORDS)
+
+def match_custom_response(message):
+    message.custom_response = keyword_matcher.match(message.text.lower())
+    return message.custom_response is not None
+
+@bot.message_handler(func=match_custom_response)
+{def_} custom_response(message):
+    """Обработчик кастомных ключевых слов"""
+    try:
+        response = CUSTOM_RESPONSES[message.custom_response]
+        {await_}bot.reply_to(message, response)
+        logger.info(f"User {{message.from_user.id}} triggered custom response")
+    except Exception as e:
+        logger.error(f"Error in custom_response: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+
+@block_compiler('echo', '''
+@bot.message_handler(func=lambda message: True)
+{def_} echo_all(message):
+    """Эхо всех сообщений"""
+    try:
+        prefix = {prefix}
+        {await_}bot.reply_to(message, prefix + message.text)
+        logger.info(f"User {{message.from_user.id}} sent message: {{message.text}}")
+    except Exception as e:
+        logger.error(f"Error in echo_all: {{e}}")
+        {await_}bot.reply_to(message, "Произошла ошибка. Попробуйте позже.")
+''')
+def _echo(config):
+    return {'prefix': _text(config, 'prefix', 'Эхо: ')}
+
+def legacy_config_to_blocks(config):
+    """Translate the old flat config (welcome_message, custom_responses, ...) into a block list"""
+    blocks = []
+    if config.get('welcome_message'):
+        blocks.append({'type': 'welcome', 'config': {'message': config['welcome_message']}})
+    if config.get('help_command'):
+        blocks.append({'type': 'help', 'config': {}})
+    if config.get('about_command'):
+        blocks.append({'type': 'about', 'config': {'description': config.get('description', '')}})
+    responses = config.get('custom_responses') or []
+    if not isinstance(responses, list) or not all(isinstance(response, dict) for response in responses):
+        raise BlockConfigError('custom_responses должен быть списком объектов')
+    for response in responses:
+        blocks.append({'type': 'custom', 'config': {
+            'keywords': response.get('trigger', ''), 'response': response.get('reply', '')
+        }})
+    if config.get('echo_enabled'):
+        blocks.append({'type': 'echo', 'config': {}})
+    return blocks
+
+def validate_block(block):
+    """Check the shape the compilers rely on: an object with a string type and an object config"""
+    if not isinstance(block, dict):
+        raise BlockConfigError('Блок должен быть объектом')
+    if not isinstance(block.get('type'), str):
+        raise BlockConfigError('Тип блока должен быть строкой')
+    if block.get('config') is not None and not isinstance(block['config'], dict):
+        raise BlockConfigError(f"Настройки блока {block['type']} должны быть объектом")
+    return block
+
+def compile_block(block, runtime, keyword_dispatch='matcher'):
+    """Compile one block on its own.
+
+    Returns ('code', handler source), ('keywords', (keyword_list, response_text)) for a custom
+    block merged into the keyword matcher, or None when the block emits nothing.
+    """
+    validate_block(block)
+    compiler = BLOCK_COMPILERS.get(block['type'])
+    if compiler is None:
+        return None
+    template, build_values = compiler
+    values = build_values(block.get('config') or {})
+    if values is None:
+        return None
+    if block['type'] == 'custom' and keyword_dispatch == 'matcher':
+        return 'keywords', (values['keyword_list'], values['response_text'])
+    return 'code', render_template(template, {**values, **runtime})
+
+def block_fragment_ids(blocks):
+    """Fragment id for every block: the editor's block id, or its position when missing or repeated"""
+    ids, seen = [], set()
+    for index, block in enumerate(blocks):
+        block_id = block.get('id') if isinstance(block, dict) else None
+        fragment_id = f'block-{block_id}' if block_id is not None else f'block-#{index}'
+        if fragment_id in seen:
+            fragment_id = f'block-#{index}'
+        seen.add(fragment_id)
+        ids.append(fragment_id)
+    return ids
+
+def compile_fragments(blocks, name='My Bot', token='YOUR_BOT_TOKEN_HERE', keyword_dispatch='matcher',
+                      target='polling', workers=4, max_pending=100, webhook_port=8443,
+                      send_queue=True, global_rate=25, chat_rate=60, send_workers=2,
+                      file_id_cache=True, file_id_cache_size=1000, compile_one=None):
+    """Compile a block list into ordered (fragment_id, source) pairs; joined they form the script.
+
+    Fragments are 'header', one 'block-<id>' per block that emits a handler, 'keywords' for the
+    merged custom-keyword handler (at the position of the first custom block) and 'main'.
+    compile_one(fragment_id, block, runtime) replaces compile_block so callers can reuse results.
+    """
+    if not isinstance(blocks, list):
+        raise BlockConfigError('Конфигурация должна быть списком блоков')
+    if target not in RUNTIME_TARGETS:
+        raise BlockConfigError(f'Неизвестный режим запуска: {target}')
+    runtime = {
+        'token': repr(str(token)), 'workers': repr(int(workers)),
+        'max_pending': repr(int(max_pending)), 'webhook_port': repr(int(webhook_port)),
+        'def_': 'async def' if target == 'async' else 'def',
+        'await_': 'await ' if target == 'async' else '',
+        'exec_': 'await run_action' if target == 'async' else 'exec',
+        'exec_scope': ', locals()' if target == 'async' else ''
+    }
+    # Bot class chain: base -> file_id caching -> paced sending; each layer calls the one below
+    base = 'BoundedAsyncTeleBot' if target == 'async' else 'telebot.TeleBot'
+    imports = [RUNTIME_IMPORTS[target]]
+    bot_classes = []
+    has_media = any(isinstance(block, dict) and block.get('type') in ('photo', 'document') for block in blocks)
+    if target == 'async' and any(isinstance(block, dict) and block.get('type') in ('condition', 'loop')
+                                 for block in blocks):
+        imports.append(ACTION_RUNNER_IMPORTS)
+        bot_classes.append(ACTION_RUNNER_TEMPLATE)
+    if file_id_cache and has_media:
+        imports.append(FILE_ID_CACHE_IMPORTS)
+        bot_classes.append(render_template(FILE_ID_CACHE_TEMPLATE, {
+            **runtime, 'base': base, 'file_id_cache_size': repr(int(file_id_cache_size))
+        }))
+        base = 'CachedMediaTeleBot'
+    if send_queue:
+        imports.append(SEND_QUEUE_IMPORTS)
+        bot_classes.append(render_template(SEND_QUEUE_TEMPLATE, {
+            'global_rate': repr(int(global_rate)), 'chat_rate': repr(int(chat_rate)),
+            'send_workers': repr(int(send_workers))
+        }))
+        bot_classes.append(render_template(PACED_BOT['async' if target == 'async' else 'sync'], {'base': base}))
+        base = 'PacedAsyncTeleBot' if target == 'async' else 'PacedTeleBot'
+    runtime['bot_classes'] = ''.join(bot_classes)
+    runtime['bot_class'] = base
+    # Each import line once, in first-seen order
+    import_lines = list(dict.fromkeys(line for chunk in imports for line in chunk.splitlines()))
+    # The name lands inside the module docstring, so keep it on one line and escape quotes
+    title = ' '.join(str(name).split()).replace('\\', '\\\\').replace('"', '\\"')
+    fragments = [('header', render_template(HEADER_TEMPLATE, {
+        'title': title,
+        'imports': ''.join(line + '\n' for line in import_lines),
+        'init': render_template(RUNTIME_INIT[target], runtime)
+    }))]
+    if compile_one is None:
+        compile_one = lambda fragment_id, block, runtime: compile_block(block, runtime, keyword_dispatch)
+    responses, keywords, dispatch_slot = [], [], None
+    for fragment_id, block in zip(block_fragment_ids(blocks), blocks):
+        result = compile_one(fragment_id, block, runtime)
+        if result is None:
+            continue
+        kind, value = result
+        if kind == 'keywords':
+            # The merged handler takes the place of the first custom block to keep handler order
+            if dispatch_slot is None:
+                dispatch_slot = len(fragments)
+                fragments.append(None)
+            keyword_list, response_text = value
+            keywords.extend((keyword, len(responses)) for keyword in keyword_list)
+            responses.append(response_text)
+            continue
+        fragments.append((fragment_id, value))
+    if dispatch_slot is not None:
+        fragments[dispatch_slot] = ('keywords', render_template(KEYWORD_DISPATCH_TEMPLATE, {
+            'responses': repr(responses), 'keywords': repr(keywords), **runtime
+        }))
+    fragments.append(('main', render_template(RUNTIME_MAIN[target], runtime)))
+    return fragments
+
+def compile_blocks(blocks, name='My Bot', token='YOUR_BOT_TOKEN_HERE', **options):
+    """Compile a block list into a bot script in one pass; unknown block types are skipped.
+
+    keyword_dispatch='matcher' merges every custom block into one handler backed by an
+    Aho-Corasick automaton; 'handlers' emits one handler per block as the old generator did.
+    target picks the runtime: threaded long polling, a webhook server or AsyncTeleBot.
+    send_queue routes send_message/send_photo/send_document through a paced outbound queue.
+    file_id_cache makes photo/document sends reuse the file_id of the first upload of each URL.
+    """
+    return ''.join(text for _, text in compile_fragments(blocks, name=name, token=token, **options))
+
+def generate_bot_code(config, name=None, token=None, **options):
+    """Generate Python code for the Telegram bot from a block list or a legacy flat config.
+
+    options are passed to compile_blocks (keyword_dispatch, target, workers, max_pending, webhook_port).
+    """
+    if isinstance(config, dict):
+        name = name or config.get('name')
+        blocks = config['blocks'] if 'blocks' in config else legacy_config_to_blocks(config)
+    elif isinstance(config, list):
+        blocks = config
+    else:
+        raise BlockConfigError('Конфигурация должна быть списком блоков')
+    return compile_blocks(blocks, name=name or 'My Bot', token=token or 'YOUR_BOT_TOKEN_HERE', **options)
+
+def config_cache_key(config, options=None):
+    """Content address of a generation request: canonical JSON + generator fingerprint"""
+    canonical = json.dumps(
+        {'config': config, 'options': options or {}},
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False
+    )
+    return hashlib.sha256(f'{GENERATOR_FINGERPRINT}:{canonical}'.encode('utf-8')).hexdigest()
+
+class CodeCache:
+    """Memoize generated scripts in a bounded in-memory LRU with an optional on-disk tier.
+
+    The disk tier lives under <disk_dir>/<fingerprint prefix>/ so every gunicorn
+    worker on the host shares it, and directories left by older generator
+    versions are removed on startup.
+    """
+
+    def __init__(self, max_entries=512, disk_dir=None, disk_max_entries=10000):
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.disk_dir = os.path.join(disk_dir, GENERATOR_FINGERPRINT[:16]) if disk_dir else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._purge_stale_versions()
+
+    def get_or_generate(self, generator, config, options=None):
+        key = config_cache_key(config, options)
+
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return code
+
+        code = self._disk_get(key)
+        if code is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, code)
+            return code
+
+        with self._lock:
+            self.misses += 1
+        code = generator(config, **(options or {}))
+        self._remember(key, code)
+        self._disk_put(key, code)
+        return code
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'fingerprint': GENERATOR_FINGERPRINT[:16],
+            'size': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'disk_enabled': bool(self.disk_dir),
+            'disk_evictions': self.disk_evictions
+        }
+
+    def _remember(self, key, code):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = code
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f'{key}.py')
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                code = f.read()
+            # Touch so pruning keeps recently used entries
+            os.utime(path)
+            return code
+        except OSError:
+            return None
+
+    def _disk_put(self, key, code):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(code)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop least recently used files once the disk tier exceeds its entry limit"""
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    files.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue
+        excess = len(files) - self.disk_max_entries
+        if excess <= 0:
+            return
+        for _, path in sorted(files)[:excess]:
+            try:
+                os.remove(path)
+                self.disk_evictions += 1
+            except OSError:
+                continue
+
+    def _purge_stale_versions(self):
+        parent = os.path.dirname(self.disk_dir)
+        current = os.path.basename(self.disk_dir)
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            # Only touch directories that look like our own fingerprint prefixes
+            is_version_dir = len(name) == 16 and all(c in '0123456789abcdef' for c in name)
+            if is_version_dir and name != current and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+class PreviewCache:
+    """Revisions of the editor's live code preview.
+
+    A revision remembers the compiled result of every block, so a request naming its base
+    revision and the changed block ids recompiles only those blocks and returns only the
+    fragments whose source differs. Compiled blocks are also memoized by content, which makes
+    undo and pasted blocks free. Revisions are kept per worker; an unknown base revision
+    (evicted, or served by another worker) just produces a full response.
+    """
+
+    def __init__(self, max_revisions=256, max_blocks=4096):
+        self.max_revisions = max_revisions
+        self.max_blocks = max_blocks
+        self._revisions = OrderedDict()
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        self.full_builds = 0
+        self.incremental_builds = 0
+        self.block_hits = 0
+        self.block_misses = 0
+
+    def update(self, blocks, base_revision=None, changed=None, owner=None, **options):
+        """Compile a preview against base_revision; options are passed to compile_fragments.
+
+        Returns the new revision, the full fragment layout with start lines, the fragments that
+        differ from the base (all of them when the base is unknown) and the ids that went away.
+        """
+        if not isinstance(blocks, list):
+            raise BlockConfigError('Конфигурация должна быть списком блоков')
+        block_key = (options.get('target') == 'async', options.get('keyword_dispatch', 'matcher'))
+
+        with self._lock:
+            base = self._revisions.get(base_revision) if base_revision else None
+            if base is not None and base['owner'] != owner:
+                base = None
+            if base is not None:
+                self._revisions.move_to_end(base_revision)
+                self.incremental_builds += 1
+            else:
+                self.full_builds += 1
+
+        reusable = base['results'] if base is not None and base['block_key'] == block_key else {}
+        changed = {f'block-{block_id}' for block_id in (changed or [])}
+        results = {}
+
+        def compile_one(fragment_id, block, runtime):
+            # Positional ids move with reordering, so only editor ids are trusted across revisions
+            if fragment_id in reusable and fragment_id not in changed and not fragment_id.startswith('block-#'):
+                result = reusable[fragment_id]
+            else:
+                result = self._compile_block(block, runtime, block_key)
+            results[fragment_id] = result
+            return result
+
+        fragments = compile_fragments(blocks, compile_one=compile_one, **options)
+
+        base_texts = base['texts'] if base is not None else {}
+        layout, changed_fragments, line = [], [], 1
+        for index, (fragment_id, text) in enumerate(fragments):
+            lines = text.count('\n')
+            layout.append({'id': fragment_id, 'line': line, 'lines': lines})
+            # Reused fragments are the same str object, so this comparison is O(1) for them
+            if base_texts.get(fragment_id) != text:
+                changed_fragments.append({'id': fragment_id, 'index': index, 'line': line, 'text': text})
+            line += lines
+        texts = dict(fragments)
+
+        revision = os.urandom(16).hex()
+        with self._lock:
+            self._revisions[revision] = {
+                'owner': owner, 'block_key': block_key, 'results': results, 'texts': texts
+            }
+            while len(self._revisions) > self.max_revisions:
+                self._revisions.popitem(last=False)
+
+        return {
+            'revision': revision,
+            'base_revision': base_revision if base is not None else None,
+            'layout': layout,
+            'fragments': changed_fragments,
+            'removed': [fragment_id for fragment_id in base_texts if fragment_id not in texts]
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revisions': len(self._revisions),
+                'max_revisions': self.max_revisions,
+                'blocks': len(self._blocks),
+                'max_blocks': self.max_blocks,
+                'full_builds': self.full_builds,
+                'incremental_builds': self.incremental_builds,
+                'block_hits': self.block_hits,
+                'block_misses': self.block_misses
+            }
+
+    def _compile_block(self, block, runtime, block_key):
+        validate_block(block)
+        # Only the type and config shape the handler; id, name, icon and color are editor state
+        key = hashlib.sha256(json.dumps(
+            [block.get('type'), block.get('config') or {}, block_key],
+            sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+        ).encode('utf-8')).hexdigest()
+
+        with self._lock:
+            if key in self._blocks:
+                self._blocks.move_to_end(key)
+                self.block_hits += 1
+                return self._blocks[key]
+            self.block_misses += 1
+
+        result = compile_block(block, runtime, block_key[1])
+        with self._lock:
+            self._blocks[key] = result
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return result
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Local harness for generated bots
+Runs a generated script against a stub Bot API and replays Telegram updates into it
+
+Usage:
+    python3 bot_harness.py bot.py --target polling --text /start --text "привет"
+    python3 bot_harness.py bot.py --target webhook --updates updates.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_TOKEN = '123456:STUB-TOKEN'
+
+# Bot API methods that send something to a chat
+SEND_METHODS = ('sendMessage', 'sendPhoto', 'sendDocument')
+
+def text_update(update_id, text, chat_id=100):
+    """Update with a private text message, as Telegram delivers it"""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User'},
+        'text': text
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+    return {'update_id': update_id, 'message': message}
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _params(self):
+        parsed = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        content_type = self.headers.get('Content-Type', '')
+        if body and 'json' in content_type:
+            params.update(json.loads(body))
+        elif body and 'urlencoded' in content_type:
+            params.update(urllib.parse.parse_qsl(body.decode('utf-8')))
+        return parsed.path.rsplit('/', 1)[-1], params
+
+    def _handle(self):
+        method, params = self._params()
+        status, payload = self.server.stub.respond(method, params)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _handle
+    do_POST = _handle
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The bot process is killed mid long-poll at the end of every replay
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class StubBotAPI:
+    """Threaded stand-in for api.telegram.org; queued updates are served through getUpdates"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.calls = []
+        self.send_times = []
+        self._floods = {}
+        self.file_ids = set()
+        self._updates = []
+        self._message_id = 0
+        self._cond = threading.Condition()
+        self._server = _StubServer((host, port), _StubHandler)
+        self._server.stub = self
+        self.url = f'http://{host}:{self._server.server_address[1]}'
+        self.api_url = self.url + '/bot{0}/{1}'
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def queue_updates(self, updates):
+        with self._cond:
+            self._updates.extend(updates)
+            self._cond.notify_all()
+
+    def flood(self, chat_id, times=1, retry_after=1):
+        """Answer the next `times` sends to chat_id with 429 Too Many Requests"""
+        with self._cond:
+            self._floods[str(chat_id)] = (times, retry_after)
+
+    def sent(self):
+        """Texts (or captions) sent by the bot, in arrival order"""
+        with self._cond:
+            return [params.get('text', params.get('caption', ''))
+                    for method, params in self.calls if method in SEND_METHODS]
+
+    def wait_for_sent(self, count, timeout=10):
+        deadline = time.time() + timeout
+        with self._cond:
+            while len([c for c in self.calls if c[0] in SEND_METHODS]) < count:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def forget_file_ids(self):
+        """Make every previously issued file_id invalid, as after Telegram rotates them"""
+        with self._cond:
+            self.file_ids.clear()
+
+    def respond(self, method, params):
+        """HTTP status and JSON body for one Bot API call"""
+        media = params.get('photo') or params.get('document')
+        if media and not media.startswith(('http://', 'https://')) and media not in self.file_ids:
+            with self._cond:
+                self.calls.append(('rejected', params))
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: wrong file identifier/HTTP URL specified'}
+        if method in SEND_METHODS:
+            with self._cond:
+                times, retry_after = self._floods.get(str(params.get('chat_id')), (0, 0))
+                if times:
+                    self._floods[str(params.get('chat_id'))] = (times - 1, retry_after)
+                    self.calls.append(('flood', params))
+                    return 429, {
+                        'ok': False, 'error_code': 429,
+                        'description': f'Too Many Requests: retry after {retry_after}',
+                        'parameters': {'retry_after': retry_after}
+                    }
+        return 200, {'ok': True, 'result': self.call(method, params)}
+
+    def call(self, method, params):
+        if method == 'getUpdates':
+            return self._get_updates(params)
+
+        with self._cond:
+            self.calls.append((method, params))
+            self._cond.notify_all()
+            if method == 'getMe':
+                return {'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'}
+            if method in SEND_METHODS:
+                self.send_times.append((str(params.get('chat_id')), time.monotonic()))
+                self._message_id += 1
+                message = {
+                    'message_id': self._message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                    'text': params.get('text', '')
+                }
+                # Uploads get a file_id that later sends may pass instead of the URL
+                if method == 'sendPhoto':
+                    file_id = f'photo-{self._message_id}'
+                    message['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 90, 'height': 90}]
+                    self.file_ids.add(file_id)
+                elif method == 'sendDocument':
+                    file_id = f'document-{self._message_id}'
+                    message['document'] = {'file_id': file_id, 'file_unique_id': file_id}
+                    self.file_ids.add(file_id)
+                return message
+            return True
+
+    def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        # Short long-poll so the bot notices new updates quickly
+        deadline = time.time() + min(float(params.get('timeout') or 0), 0.5)
+        with self._cond:
+            while True:
+                pending = [u for u in self._updates if u['update_id'] >= offset]
+                remaining = deadline - time.time()
+                if pending or remaining <= 0:
+                    self._updates = pending
+                    return pending
+                self._cond.wait(remaining)
+
+def _wait_for_port(port, process, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def replay(code_path, updates, target='polling', expected=None, timeout=15, stub=None, env=None):
+    """Run a generated bot against a stub API, replay updates and collect what it sent.
+
+    expected is the number of outgoing messages to wait for (defaults to one per update).
+    Pass a started StubBotAPI to preconfigure it (e.g. flood limits); a fresh one is used otherwise.
+    env adds environment variables for the bot process.
+    Returns the StubBotAPI instance (already stopped) so callers can inspect calls.
+    """
+    stub = stub or StubBotAPI().start()
+    env = dict(os.environ, TELEGRAM_API_URL=stub.api_url, PYTHONUNBUFFERED='1', **(env or {}))
+    port = None
+    if target == 'webhook':
+        port = _free_port()
+        env.update(WEBHOOK_HOST='127.0.0.1', WEBHOOK_PORT=str(port), WEBHOOK_SECRET='harness-secret')
+
+    # Logs go to a file: a full stderr pipe would block the bot mid-replay
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen([sys.executable, code_path], env=env,
+                               stdout=subprocess.DEVNULL, stderr=log)
+    try:
+        if target == 'webhook':
+            if not _wait_for_port(port, process):
+                log.seek(0)
+                raise RuntimeError('Webhook server did not start: ' + log.read().decode()[-2000:])
+            for update in updates:
+                request = urllib.request.Request(
+                    f'http://127.0.0.1:{port}/', data=json.dumps(update).encode(),
+                    headers={'Content-Type': 'application/json',
+                             'X-Telegram-Bot-Api-Secret-Token': 'harness-secret'}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+        else:
+            stub.queue_updates(updates)
+
+        stub.wait_for_sent(len(updates) if expected is None else expected, timeout)
+    finally:
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        stub.stop()
+    return stub
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay Telegram updates into a generated bot')
+    parser.add_argument('bot', help='Path to the generated bot script')
+    parser.add_argument('--target', choices=('polling', 'webhook', 'async'), default='polling')
+    parser.add_argument('--updates', help='JSON file with a list of Telegram updates')
+    parser.add_argument('--text', action='append', default=[], help='Text message to send (repeatable)')
+    parser.add_argument('--timeout', type=float, default=15)
+    args = parser.parse_args()
+
+    updates = []
+    if args.updates:
+        with open(args.updates, encoding='utf-8') as f:
+            updates = json.load(f)
+    updates += [text_update(len(updates) + i + 1, text) for i, text in enumerate(args.text)]
+
+    started = time.time()
+    stub = replay(args.bot, updates, args.target, timeout=args.timeout)
+    sent = stub.sent()
+    print(f"📨 Replayed {len(updates)} update(s), bot sent {len(sent)} message(s) in {time.time() - started:.2f}s")
+    for text in sent:
+        print(f"  - {text}")
+
+if __name__ == '__main__':
+    main()
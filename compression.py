@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Compressed TEXT columns for Bot Creator Platform
+Values are stored as framed bytes: magic, format version, codec id, payload
+"""
+
+import zlib
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+# No JSON document or Python script starts with a NUL byte, so legacy plain-text rows never match
+MAGIC = b'\x00BCZ'
+FORMAT_VERSION = 1
+CODEC_IDS = {'none': 0, 'zlib': 1, 'zstd': 2}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+HEADER_SIZE = len(MAGIC) + 2
+
+class CompressionError(ValueError):
+    """A stored value cannot be decoded"""
+
+def available_codecs():
+    return [name for name in CODEC_IDS if name != 'zstd' or zstandard is not None]
+
+def _compress(codec, data, level):
+    if codec == 'zlib':
+        return zlib.compress(data, level)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return data
+
+def _decompress(codec, payload):
+    if codec == 'zlib':
+        return zlib.decompress(payload)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise CompressionError('Значение сжато zstd, но пакет zstandard не установлен')
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return payload
+
+def encode(text, codec='zlib', min_size=256, level=6):
+    """Frame text as bytes; values shorter than min_size, or that do not shrink, are stored as-is"""
+    if codec not in CODEC_IDS:
+        raise CompressionError(f'Неизвестный кодек: {codec}')
+    if codec == 'zstd' and zstandard is None:
+        raise CompressionError('Для кодека zstd нужен пакет zstandard')
+    data = text.encode('utf-8')
+    payload = _compress(codec, data, level) if len(data) >= min_size else data
+    if payload is data or len(payload) >= len(data):
+        codec, payload = 'none', data
+    return MAGIC + bytes([FORMAT_VERSION, CODEC_IDS[codec]]) + payload
+
+def frame_codec(value):
+    """Codec name of a framed value, or None for a legacy plain-text value"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        if value.startswith(MAGIC) and len(value) >= HEADER_SIZE:
+            return CODEC_NAMES.get(value[len(MAGIC) + 1])
+    return None
+
+def decode(value):
+    """Text of a stored value: framed bytes, legacy bytes from a converted TEXT column, or str"""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value.startswith(MAGIC):
+        return value.decode('utf-8')
+    if len(value) < HEADER_SIZE or value[len(MAGIC)] != FORMAT_VERSION:
+        raise CompressionError('Неизвестный формат сжатого значения')
+    codec = CODEC_NAMES.get(value[len(MAGIC) + 1])
+    if codec is None:
+        raise CompressionError('Неизвестный кодек сжатого значения')
+    try:
+        return _decompress(codec, value[HEADER_SIZE:]).decode('utf-8')
+    except zlib.error as e:
+        raise CompressionError(f'Поврежденное сжатое значение: {e}')
+
+class CompressedText(TypeDecorator):
+    """Text column stored compressed (MEDIUMBLOB on MariaDB); reads legacy uncompressed rows as well
+
+    Set plain on a column that is still TEXT in the database: values are then written as
+    unframed UTF-8, which a TEXT column accepts and decode() reads as a legacy row.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, codec='zlib', min_size=256, level=6):
+        super().__init__()
+        self.codec = codec
+        self.min_size = min_size
+        self.level = level
+        self.plain = False
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'mysql':
+            return dialect.type_descriptor(mysql.MEDIUMBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if self.plain:
+            return value.encode('utf-8')
+        return encode(value, self.codec, self.min_size, self.level)
+
+    def process_result_value(self, value, dialect):
+        return decode(value)
@@ -0,0 +1,34 @@
+"""
+Общая настройка тестов: приложение на SQLite в памяти вместо MariaDB
+"""
+
+from contextlib import contextmanager
+
+import pytest
+
+@contextmanager
+def sqlite_app():
+    """Подменяет движок приложения на SQLite в памяти, общую для всех потоков, и возвращает прежний"""
+    import sqlalchemy as sa
+    from app import app, db, user_cache
+
+    engine = sa.create_engine('sqlite://', poolclass=sa.pool.StaticPool,
+                              connect_args={'check_same_thread': False})
+    engines = db._app_engines[app]
+    previous = engines[None]
+    engines[None] = engine
+    user_cache.clear()
+    try:
+        with app.app_context():
+            db.create_all()
+        yield app
+    finally:
+        engines[None] = previous
+        user_cache.clear()
+        engine.dispose()
+
+@pytest.fixture(scope='module')
+def sqlite_db():
+    """Своя база SQLite на каждый тестовый модуль; подключается через pytest.mark.usefixtures('sqlite_db')"""
+    with sqlite_app() as app:
+        yield app
@@ -10,6 +10,9 @@ COLLATE utf8mb4_unicode_ci;
 USE `botcreator`;
 
 -- Drop existing tables if they exist (for clean installation)
+DROP TABLE IF EXISTS `email_outbox`;
+DROP TABLE IF EXISTS `user_bot_counts`;
+DROP TABLE IF EXISTS `stat_counters`;
 DROP TABLE IF EXISTS `bot_sessions`;
 DROP TABLE IF EXISTS `bots`;
 DROP TABLE IF EXISTS `users`;
@@ -32,7 +35,8 @@ CREATE TABLE `users` (
     INDEX `idx_google_id` (`google_id`),
     INDEX `idx_created_at` (`created_at`),
     INDEX `idx_is_admin` (`is_admin`),
-    INDEX `idx_is_active` (`is_active`)
+    INDEX `idx_is_active` (`is_active`),
+    FULLTEXT INDEX `ft_users_email_name` (`email`, `name`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Create bots table
@@ -40,8 +44,11 @@ CREATE TABLE `bots` (
     `id` INT NOT NULL AUTO_INCREMENT,
     `name` VARCHAR(120) NOT NULL,
     `token` VARCHAR(200) NULL,
-    `config` TEXT NOT NULL,
-    `python_code` TEXT NULL,
+    -- config and python_code hold compressed text (see compression.py); plain UTF-8 rows are read as-is
+    `config` MEDIUMBLOB NOT NULL,
+    `python_code` MEDIUMBLOB NULL,
+    `generator_version` VARCHAR(16) NULL,
+    `runtime` VARCHAR(255) NULL,
     `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     `is_active` BOOLEAN NOT NULL DEFAULT TRUE,
@@ -51,6 +58,7 @@ CREATE TABLE `bots` (
     INDEX `idx_user_id` (`user_id`),
     INDEX `idx_created_at` (`created_at`),
     INDEX `idx_is_active` (`is_active`),
+    FULLTEXT INDEX `ft_bots_name` (`name`),
     CONSTRAINT `fk_bots_user_id` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -58,15 +66,52 @@ CREATE TABLE `bots` (
 CREATE TABLE `bot_sessions` (
     `id` INT NOT NULL AUTO_INCREMENT,
     `user_id` INT NOT NULL,
-    `session_data` TEXT NOT NULL,
+    `session_data` MEDIUMBLOB NOT NULL,
+    `patch_log` TEXT NULL,
+    `version` INT NOT NULL DEFAULT 1,
     `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     PRIMARY KEY (`id`),
-    INDEX `idx_user_id` (`user_id`),
+    UNIQUE INDEX `uq_bot_sessions_user_id` (`user_id`),
     INDEX `idx_updated_at` (`updated_at`),
     CONSTRAINT `fk_bot_sessions_user_id` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Create email outbox table (queued transactional email, delivered by the outbox worker)
+CREATE TABLE `email_outbox` (
+    `id` INT NOT NULL AUTO_INCREMENT,
+    `recipient` VARCHAR(120) NOT NULL,
+    `subject` VARCHAR(255) NOT NULL,
+    `template` VARCHAR(120) NOT NULL,
+    `context` TEXT NOT NULL,
+    `status` VARCHAR(20) NOT NULL DEFAULT 'pending',
+    `attempts` INT NOT NULL DEFAULT 0,
+    `next_attempt_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    `claim_token` VARCHAR(64) NULL,
+    `claimed_until` DATETIME NULL,
+    `last_error` TEXT NULL,
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    `sent_at` DATETIME NULL,
+    PRIMARY KEY (`id`),
+    INDEX `idx_outbox_due` (`status`, `next_attempt_at`),
+    INDEX `idx_claim_token` (`claim_token`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Create statistics rollup tables (maintained by the application, rebuilt with `flask rebuild-stats`)
+CREATE TABLE `stat_counters` (
+    `name` VARCHAR(64) NOT NULL,
+    `value` BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE `user_bot_counts` (
+    `user_id` INT NOT NULL,
+    `bot_count` INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (`user_id`),
+    INDEX `idx_bot_count` (`bot_count`),
+    CONSTRAINT `fk_user_bot_counts_user_id` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Insert sample data (optional)
 -- Note: The password hash below is for 'password' - you should change this in production
 INSERT INTO `users` (`email`, `name`, `google_id`, `password_hash`, `created_at`, `updated_at`, `is_active`, `is_admin`) VALUES
@@ -77,6 +122,13 @@ INSERT INTO `users` (`email`, `name`, `google_id`, `password_hash`, `created_at`
 INSERT INTO `bots` (`name`, `token`, `config`, `python_code`, `created_at`, `updated_at`, `is_active`, `user_id`) VALUES
 ('Sample Bot', '1234567890:ABCdefGHIjklMNOpqrsTUVwxyz', '{"name": "Sample Bot", "description": "A sample bot for demonstration", "welcome_message": "Hello! Welcome to the sample bot!", "help_command": true, "about_command": true, "custom_responses": [], "echo_enabled": false}', 'import telebot\n\nTOKEN = "1234567890:ABCdefGHIjklMNOpqrsTUVwxyz"\nbot = telebot.TeleBot(TOKEN)\n\n@bot.message_handler(commands=["start"])\ndef send_welcome(message):\n    bot.reply_to(message, "Hello! Welcome to the sample bot!")\n\nif __name__ == "__main__":\n    bot.polling(none_stop=True)', NOW(), NOW(), TRUE, 1);
 
+-- Seed rollups for the sample data above
+INSERT INTO `stat_counters` (`name`, `value`) VALUES
+('active_users', 2), ('admins', 1), ('active_bots', 1), ('sessions', 0),
+(CONCAT('registrations:day:', DATE_FORMAT(NOW(), '%Y-%m-%d')), 2),
+(CONCAT('registrations:month:', DATE_FORMAT(NOW(), '%Y-%m')), 2);
+INSERT INTO `user_bot_counts` (`user_id`, `bot_count`) VALUES (1, 1);
+
 -- Create indexes for better performance
 CREATE INDEX `idx_users_active` ON `users` (`is_active`);
 CREATE INDEX `idx_users_admin` ON `users` (`is_admin`);
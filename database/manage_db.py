@@ -10,8 +10,11 @@ import argparse
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
-import hashlib
-import secrets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from passwords import PasswordHasher, DEFAULT_HASH_METHOD
+from compression import decode as decode_column, CompressionError
+from export_stream import export_stream, parse_columns, ExportError
 
 # Load environment variables
 load_dotenv()
@@ -27,22 +30,27 @@ class DatabaseManager:
             'charset': 'utf8mb4'
         }
         self.connection = None
+        self.password_hasher = PasswordHasher(
+            method=os.getenv('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+            max_workers=1,
+            max_pending=1
+        )
     
     def connect(self):
         """Establish database connection"""
         try:
             self.connection = mysql.connector.connect(**self.config)
-            print(f"✅ Connected to database: {self.config['database']}")
+            print(f"✅ Connected to database: {self.config['database']}", file=sys.stderr)
             return True
         except Error as e:
-            print(f"❌ Error connecting to database: {e}")
+            print(f"❌ Error connecting to database: {e}", file=sys.stderr)
             return False
     
     def disconnect(self):
         """Close database connection"""
         if self.connection and self.connection.is_connected():
             self.connection.close()
-            print("✅ Database connection closed")
+            print("✅ Database connection closed", file=sys.stderr)
     
     def execute_query(self, query, params=None):
         """Execute a query and return results"""
@@ -102,7 +110,7 @@ class DatabaseManager:
             print("❌ Operation cancelled")
             return False
         
-        tables = ['bot_sessions', 'bots', 'users']
+        tables = ['email_outbox', 'user_bot_counts', 'stat_counters', 'bot_sessions', 'bots', 'users']
         
         for table in tables:
             try:
@@ -180,12 +188,8 @@ class DatabaseManager:
         return False
     
     def _hash_password(self, password):
-        """Hash password using werkzeug-like method"""
-        # This is a simplified hash - in production use proper hashing
-        salt = secrets.token_hex(16)
-        hash_obj = hashlib.sha256()
-        hash_obj.update((password + salt).encode())
-        return f"$2b$12${salt}${hash_obj.hexdigest()}"
+        """Hash password with the same method and pool the web application uses"""
+        return self.password_hasher.hash(password)
     
     def backup_database(self, backup_file):
         """Create a backup of the database"""
@@ -248,16 +252,70 @@ class DatabaseManager:
             print(f"❌ Error restoring database: {e}")
             return False
 
+    def export_table(self, table_name, output=None, fmt='ndjson', columns=None, compress=False, batch_size=1000):
+        """Stream a whole table to a file or stdout as NDJSON or CSV"""
+        described = self.execute_query(f"DESCRIBE `{table_name}`") if table_name.isidentifier() else None
+        if not described:
+            print(f"❌ Table not found: {table_name}", file=sys.stderr)
+            return False
+        try:
+            columns = parse_columns(columns, [col['Field'] for col in described])
+        except ExportError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return False
+        
+        count = 0
+        
+        def rows():
+            nonlocal count
+            # Unbuffered cursor: rows come from the server batch_size at a time instead of all at once
+            cursor = self.connection.cursor(buffered=False)
+            try:
+                cursor.execute(f"SELECT {', '.join(f'`{column}`' for column in columns)} FROM `{table_name}`")
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    count += len(batch)
+                    for row in batch:
+                        # Compressed columns are framed blobs; export their text
+                        yield [decode_column(value) if isinstance(value, (bytes, bytearray)) else value for value in row]
+            finally:
+                cursor.close()
+        
+        print(f"📤 Exporting {table_name} ({', '.join(columns)}) to {output or 'stdout'}", file=sys.stderr)
+        try:
+            target = open(output, 'wb') if output else sys.stdout.buffer
+            try:
+                for chunk in export_stream(columns, rows(), fmt, gzip=compress):
+                    target.write(chunk)
+            finally:
+                if output:
+                    target.close()
+                else:
+                    target.flush()
+        except (Error, ExportError, CompressionError, OSError) as e:
+            print(f"❌ Error exporting table: {e}", file=sys.stderr)
+            return False
+        
+        print(f"✅ Exported {count} rows", file=sys.stderr)
+        return True
+
 def main():
     parser = argparse.ArgumentParser(description='Database Management for Bot Creator Platform')
     parser.add_argument('action', choices=[
-        'create', 'drop', 'reset', 'show', 'backup', 'restore', 'admin'
+        'create', 'drop', 'reset', 'show', 'backup', 'restore', 'admin', 'export'
     ], help='Action to perform')
-    parser.add_argument('--table', help='Table name for show action')
+    parser.add_argument('--table', help='Table name for show and export actions')
     parser.add_argument('--backup-file', default='backup.sql', help='Backup file name')
     parser.add_argument('--email', help='Admin email for create admin action')
     parser.add_argument('--name', help='Admin name for create admin action')
     parser.add_argument('--password', help='Admin password for create admin action')
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson', help='Export format')
+    parser.add_argument('--columns', help='Comma-separated columns to export (default: all)')
+    parser.add_argument('--output', help='Export file (default: stdout; gzipped if it ends with .gz)')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the export')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows fetched per batch during export')
     
     args = parser.parse_args()
     
@@ -294,8 +352,17 @@ def main():
                 print("❌ Please provide --email, --name, and --password for admin creation")
                 sys.exit(1)
             db_manager.create_admin_user(args.email, args.name, args.password)
+        
+        elif args.action == 'export':
+            if not args.table:
+                print("❌ Please provide --table for export")
+                sys.exit(1)
+            compress = args.gzip or bool(args.output and args.output.endswith('.gz'))
+            if not db_manager.export_table(args.table, args.output, args.format, args.columns, compress, args.batch_size):
+                sys.exit(1)
     
     finally:
+        db_manager.password_hasher.shutdown()
         db_manager.disconnect()
 
 if __name__ == '__main__':
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Streaming table exports for Bot Creator Platform
+Rows are encoded as NDJSON or CSV and handed out in chunks, optionally gzipped on the fly
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv')
+}
+
+class ExportError(ValueError):
+    """An export was requested with an unknown format or column"""
+
+def parse_columns(spec, allowed, default=None):
+    """Column list from a comma-separated spec, checked against allowed; empty spec gives default"""
+    if not spec:
+        return list(default or allowed)
+    columns = [column.strip() for column in spec.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in allowed]
+    if unknown:
+        raise ExportError(f"Неизвестные колонки: {', '.join(unknown)}")
+    if not columns:
+        raise ExportError('Не выбрано ни одной колонки')
+    return list(dict.fromkeys(columns))
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('utf-8', 'replace')
+    return value
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_plain, row))), ensure_ascii=False) + '\n'
+
+def csv_lines(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([int(value) if isinstance(value, bool) else _plain(value) for value in row])
+        yield buffer.getvalue()
+
+def encode_rows(columns, rows, fmt='ndjson', chunk_size=64 * 1024):
+    """Yield the export as UTF-8 chunks of about chunk_size bytes"""
+    lines = ndjson_lines(columns, rows) if fmt == 'ndjson' else csv_lines(columns, rows)
+    pending, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks without holding more than one chunk in memory"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(columns, rows, fmt='ndjson', gzip=False, chunk_size=64 * 1024):
+    """Encoded export of rows (sequences in column order) as an iterator of bytes"""
+    if fmt not in FORMATS:
+        raise ExportError(f'Неизвестный формат: {fmt}')
+    chunks = encode_rows(columns, rows, fmt, chunk_size)
+    return gzip_chunks(chunks) if gzip else chunks
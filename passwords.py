@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Password hashing for Bot Creator Platform
+KDF work runs on a bounded process pool so login bursts cannot pin request workers
+"""
+
+import os
+import hmac
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool is saturated or did not answer in time"""
+
+def is_legacy_hash(pwhash):
+    """Hashes written by the old manage_db.py: $2b$12$<hex salt>$<sha256 hex>"""
+    parts = pwhash.split('$')
+    return len(parts) == 5 and parts[0] == '' and parts[1] == '2b' and len(parts[3]) == 32 and len(parts[4]) == 64
+
+def verify_password_hash(pwhash, password):
+    """Check password against a werkzeug or legacy manage_db.py hash"""
+    if not pwhash:
+        return False
+
+    if is_legacy_hash(pwhash):
+        salt, digest = pwhash.split('$')[3:]
+        candidate = hashlib.sha256((password + salt).encode()).hexdigest()
+        return hmac.compare_digest(candidate, digest)
+
+    try:
+        return check_password_hash(pwhash, password)
+    except ValueError:
+        # Unknown hash format (e.g. a bcrypt hash inserted by hand)
+        return False
+
+def hash_method(pwhash):
+    """Method prefix stored in a werkzeug hash, e.g. 'pbkdf2:sha256:600000'"""
+    if not pwhash or pwhash.startswith('$') or '$' not in pwhash:
+        return None
+    return pwhash.split('$', 1)[0]
+
+def expand_method(method):
+    """Method string werkzeug stores for a configured method: 'scrypt' -> 'scrypt:32768:8:1'"""
+    name, *args = method.split(':')
+    if name == 'scrypt' and len(args) in (0, 3):
+        return 'scrypt:' + ':'.join(args or ['32768', '8', '1'])
+    if name == 'pbkdf2' and len(args) <= 2:
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f'Unsupported password hash method: {method}')
+
+def _hash_task(password, method):
+    return generate_password_hash(password, method=method)
+
+def _verify_task(pwhash, password):
+    return verify_password_hash(pwhash, password)
+
+class PasswordHasher:
+    """Hash and verify passwords on a bounded process pool.
+
+    At most max_pending jobs may be queued or running; beyond that calls fail
+    fast with HashingPoolBusy instead of piling up behind the KDF.
+    max_workers=0 runs everything inline, which is what one-shot scripts want.
+    """
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, max_workers=2, max_pending=16, timeout=10):
+        self.method = method
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._executor_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._target_method = expand_method(method)
+        self.rejected = 0
+
+    def hash(self, password):
+        return self._run(_hash_task, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(_verify_task, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when pwhash was not produced with the configured method and cost; never hashes"""
+        return hash_method(pwhash) != self._target_method
+
+    def stats(self):
+        return {
+            'method': self.method,
+            'workers': self.max_workers,
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self):
+        # Pools do not survive fork, so each gunicorn worker builds its own lazily
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, task, *args):
+        if self.max_workers <= 0:
+            return task(*args)
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingPoolBusy('Password hashing queue is full')
+            self._pending += 1
+            try:
+                future = self._get_executor().submit(task, *args)
+            except Exception:
+                self._pending -= 1
+                raise
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingPoolBusy('Password hashing timed out')
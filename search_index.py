@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+In-process inverted index for admin search on databases without FULLTEXT (SQLite)
+Matches every query term as a word prefix and ranks like MariaDB boolean-mode FULLTEXT: rarer words score higher
+"""
+
+import bisect
+import heapq
+import math
+import re
+import threading
+
+TOKEN_RE = re.compile(r'\w+')
+
+def tokenize(text):
+    """Lowercased words of text; 'spam.king@mail.ru' gives ['spam', 'king', 'mail', 'ru']"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+def query_terms(query, min_length=2):
+    """Distinct search terms of a query; shorter terms would expand to most of the vocabulary and are dropped"""
+    return [term for term in dict.fromkeys(tokenize(query)) if len(term) >= min_length]
+
+def boolean_query(terms):
+    """MariaDB boolean-mode expression requiring every term as a prefix: '+spam* +mail*'"""
+    return ' '.join(f'+{term}*' for term in terms)
+
+class InvertedIndex:
+    """Word -> document ids, with a sorted vocabulary for prefix lookups. Thread-safe."""
+
+    def __init__(self):
+        self._postings = {}
+        self._docs = {}
+        self._vocabulary = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id, *fields):
+        """Index or re-index a document from its text fields"""
+        self.add_many([(doc_id, fields)])
+
+    def add_many(self, docs):
+        """Index (doc_id, fields) pairs; large loads sort the vocabulary once instead of per new word"""
+        new_tokens = []
+        with self._lock:
+            for doc_id, fields in docs:
+                tokens = tuple(dict.fromkeys(token for field in fields for token in tokenize(field)))
+                old = self._docs.get(doc_id)
+                if old == tokens:
+                    continue
+                if old is not None:
+                    self._unlink(doc_id, old)
+                self._docs[doc_id] = tokens
+                for token in tokens:
+                    posting = self._postings.get(token)
+                    if posting is None:
+                        posting = self._postings[token] = set()
+                        new_tokens.append(token)
+                    posting.add(doc_id)
+            if len(new_tokens) > 64:
+                self._vocabulary = sorted(self._postings)
+            else:
+                for token in new_tokens:
+                    bisect.insort(self._vocabulary, token)
+
+    def remove(self, doc_id):
+        with self._lock:
+            tokens = self._docs.pop(doc_id, None)
+            if tokens is not None:
+                self._unlink(doc_id, tokens)
+
+    def _unlink(self, doc_id, tokens):
+        for token in tokens:
+            posting = self._postings[token]
+            posting.discard(doc_id)
+            if not posting:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _expand(self, term):
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + '\U0010ffff', start)
+        return self._vocabulary[start:end]
+
+    def search(self, terms, limit=20, after=None):
+        """Documents containing a word starting with every term, as ([(score, doc_id)], has_more).
+
+        Results are ordered by score, then newest id first; after is the last (score, doc_id)
+        of the previous page. A term scores the idf of the best word it matches, scaled down
+        when the word is only a prefix match.
+        """
+        if not terms:
+            return [], False
+        with self._lock:
+            total = len(self._docs)
+            if len(terms) == 1:
+                return self._search_one(terms[0], total, limit, after)
+            scores = None
+            for term in terms:
+                matched = self._term_scores(term, total)
+                if scores is None:
+                    scores = matched
+                else:
+                    scores = {doc_id: scores[doc_id] + matched[doc_id] for doc_id in scores.keys() & matched.keys()}
+                if not scores:
+                    return [], False
+
+        ranked = zip(scores.values(), scores.keys())
+        if after is not None:
+            after = tuple(after)
+            ranked = (item for item in ranked if item < after)
+        page = heapq.nlargest(limit + 1, ranked)
+        return page[:limit], len(page) > limit
+
+    def _weights(self, term, tokens, total):
+        """(word, weight) for the words a term expands to"""
+        postings, log, length = self._postings, math.log, len(term)
+        return [(token, log(1 + total / len(postings[token])) * (1.0 if token == term else length / len(token)))
+                for token in tokens]
+
+    def _term_scores(self, term, total):
+        # Ascending weight order lets better words overwrite worse ones, so each document keeps its best
+        matched = {}
+        for token, weight in sorted(self._weights(term, self._expand(term), total), key=lambda item: item[1]):
+            matched.update(dict.fromkeys(self._postings[token], weight))
+        return matched
+
+    def _search_one(self, term, total, limit, after):
+        # A document's score is the weight of its best word, so walking words by descending weight
+        # yields results in order and can stop as soon as the page is full
+        groups = {}
+        for token, weight in self._weights(term, self._expand(term), total):
+            groups.setdefault(weight, []).append(self._postings[token])
+        seen, page = set(), []
+        for score in sorted(groups, reverse=True):
+            doc_ids = set().union(*groups[score]) - seen
+            seen |= doc_ids
+            if after is not None and score >= after[0]:
+                if score > after[0]:
+                    continue
+                doc_ids = {doc_id for doc_id in doc_ids if doc_id < after[1]}
+            page.extend((score, doc_id) for doc_id in heapq.nlargest(limit + 1 - len(page), doc_ids))
+            if len(page) > limit:
+                break
+        return page[:limit], len(page) > limit
+
+def benchmark(rows, queries, seed=1):
+    """Build an index of synthetic users and time prefix queries against it"""
+    import random
+    import time
+    rng = random.Random(seed)
+    syllables = ['ka', 'ri', 'mo', 'sha', 'ven', 'lo', 'dim', 'tor', 'na', 'spa', 'bel', 'ix', 'ro', 'gu']
+    domains = ['mail.ru', 'gmail.com', 'yandex.ru', 'proton.me', 'example.org']
+    word = lambda: ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+    index = InvertedIndex()
+    started = time.perf_counter()
+    index.add_many(
+        (doc_id, (f'{word()}{rng.randint(1, 999)}@{rng.choice(domains)}', f'{word().title()} {word().title()}'))
+        for doc_id in range(1, rows + 1)
+    )
+    build_seconds = time.perf_counter() - started
+
+    timings = []
+    for _ in range(queries):
+        query = word()[:rng.randint(2, 6)] + (f' {rng.choice(domains)[:3]}' if rng.random() < 0.3 else '')
+        started = time.perf_counter()
+        index.search(query_terms(query), limit=20)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    percentile = lambda p: timings[min(int(len(timings) * p), len(timings) - 1)]
+    return {
+        'rows': rows,
+        'vocabulary': len(index._vocabulary),
+        'build_seconds': round(build_seconds, 1),
+        'p50_ms': round(percentile(0.5), 2),
+        'p95_ms': round(percentile(0.95), 2),
+        'max_ms': round(timings[-1], 2)
+    }
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the in-process search index')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    print(benchmark(args.rows, args.queries))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Write-behind buffer for editor session autosaves
+Keeps the latest session of each user and flushes coalesced writes to the database
+"""
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class MemoryStore:
+    """Per-process buffer; a user's autosaves must reach one worker (single worker or sticky sessions)"""
+
+    def __init__(self):
+        # user_id -> [data, version, dirty_since or None]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0], entry[1]
+
+    def cache(self, user_id, data, version):
+        """Remember a clean copy read from the database, unless a newer one is buffered"""
+        with self._lock:
+            self._entries.setdefault(user_id, [data, version, None])
+
+    def put(self, user_id, data, version, expected):
+        """Compare-and-set: store a dirty entry if the buffered version is still `expected`"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if (entry[1] if entry else 0) != expected:
+                return False
+            dirty_since = entry[2] if entry and entry[2] is not None else time.time()
+            self._entries[user_id] = [data, version, dirty_since]
+            self._entries.move_to_end(user_id)
+            return True
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def dirty(self, limit):
+        """Oldest dirty entries first, as (user_id, data, version)"""
+        with self._lock:
+            entries = [(entry[2], user_id, entry[0], entry[1])
+                       for user_id, entry in self._entries.items() if entry[2] is not None]
+        return [(user_id, data, version) for _, user_id, data, version in sorted(entries)[:limit]]
+
+    def mark_clean(self, written):
+        with self._lock:
+            for user_id, version in written:
+                entry = self._entries.get(user_id)
+                if entry and entry[1] == version:
+                    entry[2] = None
+
+    def release(self, user_ids):
+        """Nothing to release: only this process flushes its entries, under the buffer's flush lock"""
+
+    def summary(self):
+        """(entries, dirty entries, oldest dirty_since or None)"""
+        with self._lock:
+            dirty = [entry[2] for entry in self._entries.values() if entry[2] is not None]
+            return len(self._entries), len(dirty), min(dirty) if dirty else None
+
+    def trim(self, max_entries):
+        """Evict least recently used clean entries; dirty ones stay until flushed"""
+        with self._lock:
+            excess = len(self._entries) - max_entries
+            for user_id in [user_id for user_id, entry in self._entries.items() if entry[2] is None][:max(excess, 0)]:
+                del self._entries[user_id]
+
+class SQLiteStore:
+    """Buffer in a local SQLite file shared by all workers on the host; survives worker restarts
+
+    Workers flush the same file, so dirty() claims the rows it returns for claim_seconds and a
+    concurrent flush skips them. A claim ends at mark_clean() or release(), or expires if the
+    flushing worker dies.
+    """
+
+    def __init__(self, path, claim_seconds=60):
+        self.path = path
+        self.claim_seconds = claim_seconds
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS session_buffer ('
+            'user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, version INTEGER NOT NULL, '
+            'dirty_since REAL, used_at REAL NOT NULL, claimed_until REAL)'
+        )
+        # Buffer files written before flush claims lack the column
+        if 'claimed_until' not in [row[1] for row in conn.execute('PRAGMA table_info(session_buffer)')]:
+            conn.execute('ALTER TABLE session_buffer ADD COLUMN claimed_until REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_session_buffer_dirty ON session_buffer (dirty_since)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # WAL + NORMAL: a commit survives a crashed process, not a power loss
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        row = self._connect().execute(
+            'SELECT data, version FROM session_buffer WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def cache(self, user_id, data, version):
+        self._connect().execute(
+            'INSERT OR IGNORE INTO session_buffer (user_id, data, version, dirty_since, used_at) '
+            'VALUES (?, ?, ?, NULL, ?)', (user_id, data, version, time.time())
+        )
+
+    def put(self, user_id, data, version, expected):
+        now = time.time()
+        conn = self._connect()
+        if expected == 0:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO session_buffer (user_id, data, version, dirty_since, used_at) '
+                'VALUES (?, ?, ?, ?, ?)', (user_id, data, version, now, now)
+            )
+        else:
+            cursor = conn.execute(
+                'UPDATE session_buffer SET data = ?, version = ?, dirty_since = COALESCE(dirty_since, ?), '
+                'used_at = ? WHERE user_id = ? AND version = ?', (data, version, now, now, user_id, expected)
+            )
+        return cursor.rowcount == 1
+
+    def discard(self, user_id):
+        self._connect().execute('DELETE FROM session_buffer WHERE user_id = ?', (user_id,))
+
+    def dirty(self, limit):
+        """Claim up to limit unclaimed dirty entries, oldest first"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = [tuple(row) for row in conn.execute(
+                'SELECT user_id, data, version FROM session_buffer WHERE dirty_since IS NOT NULL '
+                'AND (claimed_until IS NULL OR claimed_until < ?) ORDER BY dirty_since LIMIT ?', (now, limit)
+            )]
+            conn.executemany('UPDATE session_buffer SET claimed_until = ? WHERE user_id = ?',
+                             [(now + self.claim_seconds, user_id) for user_id, _, _ in rows])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return rows
+
+    def mark_clean(self, written):
+        # An entry saved again during the flush keeps its newer version dirty, but loses the claim
+        self._connect().executemany(
+            'UPDATE session_buffer SET dirty_since = CASE WHEN version = ? THEN NULL ELSE dirty_since END, '
+            'claimed_until = NULL WHERE user_id = ?', [(version, user_id) for user_id, version in written]
+        )
+
+    def release(self, user_ids):
+        self._connect().executemany(
+            'UPDATE session_buffer SET claimed_until = NULL WHERE user_id = ?', [(user_id,) for user_id in user_ids]
+        )
+
+    def summary(self):
+        return tuple(self._connect().execute(
+            'SELECT COUNT(*), COUNT(dirty_since), MIN(dirty_since) FROM session_buffer'
+        ).fetchone())
+
+    def trim(self, max_entries):
+        self._connect().execute(
+            'DELETE FROM session_buffer WHERE user_id IN (SELECT user_id FROM session_buffer '
+            'WHERE dirty_since IS NULL ORDER BY used_at LIMIT MAX(0, (SELECT COUNT(*) FROM session_buffer) - ?))',
+            (max_entries,)
+        )
+
+class SessionBuffer:
+    """Latest session per user in a store, written to the database in batches.
+
+    writer(entries) persists a list of (user_id, data, version) in one transaction. A flush
+    runs every `interval` seconds, as soon as `threshold` sessions are dirty, and at interpreter
+    exit. Entries the writer fails on stay dirty and are retried on the next flush.
+
+    The store is shared by the workers of one host at most, and flushes do not compare against
+    the version in the database: with several hosts, give every user a sticky host or use
+    SESSION_WRITE_MODE=through.
+    """
+
+    def __init__(self, store, writer, interval=2.0, threshold=200, max_entries=10000):
+        self.store = store
+        self.writer = writer
+        self.interval = interval
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._started_lock = threading.Lock()
+        self.saves = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.flush_errors = 0
+        self.last_flush_at = None
+        self.last_flush_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def load(self, user_id, loader):
+        """(document, version) of the buffered session; loader() reads (data, version) or None from the database"""
+        self.start()
+        entry = self.store.get(user_id)
+        if entry is None:
+            entry = loader()
+            if entry is None:
+                return None
+            self.store.cache(user_id, *entry)
+            self.store.trim(self.max_entries)
+            entry = self.store.get(user_id) or entry
+        return json.loads(entry[0]), entry[1]
+
+    def save(self, user_id, doc, version, expected):
+        """Buffer doc as `version` if the buffered session is still at `expected` (0 for none)"""
+        self.start()
+        if not self.store.put(user_id, json.dumps(doc), version, expected):
+            return False
+        self.saves += 1
+        if self.store.summary()[1] >= self.threshold:
+            self._wake.set()
+        return True
+
+    def discard(self, user_id):
+        self.store.discard(user_id)
+
+    def flush(self):
+        """Write every dirty session now; returns the number written"""
+        written_total = 0
+        with self._flush_lock:
+            started = time.time()
+            oldest = self.store.summary()[2]
+            if oldest is not None:
+                self.max_lag_seconds = max(self.max_lag_seconds, started - oldest)
+            while True:
+                batch = self.store.dirty(self.threshold)
+                if not batch:
+                    break
+                try:
+                    self.writer(batch)
+                except Exception:
+                    self.store.release([user_id for user_id, _, _ in batch])
+                    self.flush_errors += 1
+                    logger.exception('Session flush failed, %d session(s) stay buffered', len(batch))
+                    break
+                self.store.mark_clean([(user_id, version) for user_id, _, version in batch])
+                written_total += len(batch)
+            self.store.trim(self.max_entries)
+            self.flushes += 1
+            self.flushed += written_total
+            self.last_flush_at = time.time()
+            self.last_flush_seconds = self.last_flush_at - started
+        return written_total
+
+    def start(self):
+        """Start the background flusher once per process"""
+        if self._thread is not None:
+            return
+        with self._started_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='session-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flusher and write what is left"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            self.flush()
+
+    def stats(self):
+        entries, dirty, oldest = self.store.summary()
+        return {
+            'backend': type(self.store).__name__,
+            'entries': entries,
+            'dirty': dirty,
+            'flush_lag_seconds': round(time.time() - oldest, 3) if oldest is not None else 0.0,
+            'max_flush_lag_seconds': round(self.max_lag_seconds, 3),
+            'saves': self.saves,
+            'flushes': self.flushes,
+            'flushed': self.flushed,
+            'coalesced': max(self.saves - self.flushed, 0),
+            'flush_errors': self.flush_errors,
+            'last_flush_at': self.last_flush_at,
+            'last_flush_seconds': round(self.last_flush_seconds, 4)
+        }
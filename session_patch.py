@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+JSON Patch (RFC 6902) for editor session autosaves
+Patches are validated up front and applied atomically to a copy of the document
+"""
+
+import copy
+
+OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+class PatchError(ValueError):
+    """A patch is malformed or does not apply to the document"""
+
+def parse_pointer(pointer):
+    """Split a JSON Pointer ('/botBlocks/0/config') into unescaped reference tokens"""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise PatchError(f'Некорректный путь: {pointer!r}')
+    if not pointer:
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def validate_patch(ops):
+    """Check the shape of a patch without a document, so it can be stored before it is applied"""
+    if not isinstance(ops, list):
+        raise PatchError('Патч должен быть списком операций')
+    for op in ops:
+        if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+            raise PatchError(f'Неизвестная операция: {op!r}')
+        parse_pointer(op.get('path'))
+        if op['op'] in ('add', 'replace', 'test') and 'value' not in op:
+            raise PatchError(f"Операции {op['op']} нужно поле value")
+        if op['op'] in ('move', 'copy'):
+            parse_pointer(op.get('from'))
+    return ops
+
+def _index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise PatchError(f'Некорректный индекс массива: {token!r}')
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f'Индекс вне массива: {index}')
+    return index
+
+def _resolve(doc, tokens):
+    for token in tokens:
+        if isinstance(doc, list):
+            doc = doc[_index(doc, token)]
+        elif isinstance(doc, dict) and token in doc:
+            doc = doc[token]
+        else:
+            raise PatchError(f"Путь не найден: /{'/'.join(tokens)}")
+    return doc
+
+def _get(doc, pointer):
+    return _resolve(doc, parse_pointer(pointer))
+
+def _add(doc, pointer, value):
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, list):
+        parent.insert(_index(parent, tokens[-1], allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise PatchError(f'Нельзя добавить значение по пути {pointer}')
+    return doc
+
+def _remove(doc, pointer):
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise PatchError('Нельзя удалить корень документа')
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, list):
+        return doc, parent.pop(_index(parent, tokens[-1]))
+    if isinstance(parent, dict) and tokens[-1] in parent:
+        return doc, parent.pop(tokens[-1])
+    raise PatchError(f'Путь не найден: {pointer}')
+
+def apply_patch(doc, ops):
+    """Apply a patch and return the new document; doc itself is left untouched"""
+    doc = copy.deepcopy(doc)
+    for op in validate_patch(ops):
+        name, path = op['op'], op['path']
+        if name == 'add':
+            doc = _add(doc, path, copy.deepcopy(op['value']))
+        elif name == 'remove':
+            doc, _ = _remove(doc, path)
+        elif name == 'replace':
+            doc, _ = _remove(doc, path) if parse_pointer(path) else (None, None)
+            doc = _add(doc, path, copy.deepcopy(op['value']))
+        elif name == 'move':
+            if path != op['from'] and path.startswith(op['from'] + '/'):
+                raise PatchError('Нельзя переместить значение внутрь самого себя')
+            doc, value = _remove(doc, op['from'])
+            doc = _add(doc, path, value)
+        elif name == 'copy':
+            doc = _add(doc, path, copy.deepcopy(_get(doc, op['from'])))
+        elif name == 'test':
+            if _get(doc, path) != op['value']:
+                raise PatchError(f'Проверка не прошла: {path}')
+    return doc
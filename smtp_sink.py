@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for development and tests
+Accepts every message and keeps it in memory instead of delivering it
+
+Usage:
+    python3 smtp_sink.py --port 1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=False python3 app.py
+"""
+
+import argparse
+import socketserver
+import threading
+from email import message_from_bytes
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply('220 smtp-sink ready')
+        sender, recipients = None, []
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif verb == 'AUTH':
+                # Any credentials are accepted
+                mechanism = command.split(' ')[1].upper() if ' ' in command else ''
+                if mechanism == 'LOGIN':
+                    if len(command.split(' ')) < 3:
+                        self.reply('334 VXNlcm5hbWU6')
+                        self.rfile.readline()
+                    self.reply('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                elif mechanism == 'PLAIN' and len(command.split(' ')) < 3:
+                    self.reply('334 ')
+                    self.rfile.readline()
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip()
+                address = recipient.strip('<>')
+                if address in sink.hang_up:
+                    # Simulate a dropped connection
+                    return
+                if address in sink.reject:
+                    self.reply('550 Mailbox unavailable')
+                    continue
+                recipients.append(recipient)
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b'.\r\n', b'.\n'):
+                        break
+                    # Undo SMTP dot-stuffing
+                    data.append(chunk[1:] if chunk.startswith(b'..') else chunk)
+                with sink.lock:
+                    sink.messages.append({
+                        'sender': sender,
+                        'recipients': recipients,
+                        'message': message_from_bytes(b''.join(data))
+                    })
+                self.reply('250 OK: queued')
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SMTPSink:
+    """Threaded SMTP server collecting messages; port=0 picks a free port.
+
+    Recipients in reject get a 550, recipients in hang_up make the server drop the connection.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, reject=(), hang_up=()):
+        self.messages = []
+        self.reject = set(reject)
+        self.hang_up = set(hang_up)
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = _ThreadingSMTPServer((host, port), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SMTP sink for Bot Creator Platform')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port)
+    print(f"📭 SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📬 Received {len(sink.messages)} message(s)")
+        for item in sink.messages:
+            print(f"  - {item['recipients']}: {item['message']['Subject']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+// Typeahead search over a whole admin table (/api/admin/search)
+//
+// setupAdminSearch({inputId, type, render}) wires the input to a results dropdown
+// (#searchResults by default); render(item) returns the details line under item.name.
+// The returned object exposes search(query, limit) and hide() for the page's own filters.
+function setupAdminSearch({inputId, type, render, resultsId = 'searchResults'}) {
+    const input = document.getElementById(inputId);
+    const box = document.getElementById(resultsId);
+    let timer = null;
+    let cursor = null;
+
+    function search(query, limit, append = false) {
+        clearTimeout(timer);
+        const params = new URLSearchParams({type: type, q: query, limit: limit});
+        if (append && cursor) {
+            params.set('cursor', cursor);
+        }
+        fetch(`/api/admin/search?${params}`)
+            .then(response => response.json())
+            .then(data => show(query, data, append))
+            .catch(error => console.error('Search error:', error));
+    }
+
+    function show(query, data, append) {
+        if (!append) {
+            box.innerHTML = '';
+        }
+        box.querySelectorAll('.search-more, .search-empty').forEach(element => element.remove());
+
+        (data.items || []).forEach(item => {
+            const link = document.createElement('a');
+            link.className = 'list-group-item list-group-item-action' + (item.is_active ? '' : ' text-muted');
+            link.href = item.url;
+            const title = document.createElement('div');
+            title.className = 'fw-semibold';
+            title.textContent = item.name;
+            const details = document.createElement('small');
+            details.className = 'text-muted';
+            details.textContent = render(item);
+            link.append(title, details);
+            box.appendChild(link);
+        });
+
+        cursor = data.next_cursor;
+        if (cursor) {
+            const more = document.createElement('button');
+            more.type = 'button';
+            more.className = 'list-group-item list-group-item-action text-primary search-more';
+            more.textContent = 'Показать еще';
+            more.addEventListener('mousedown', e => {
+                e.preventDefault();
+                search(query, 20, true);
+            });
+            box.appendChild(more);
+        }
+        if (!box.children.length) {
+            const empty = document.createElement('div');
+            empty.className = 'list-group-item text-muted search-empty';
+            empty.textContent = data.error || 'Ничего не найдено';
+            box.appendChild(empty);
+        }
+        box.classList.remove('d-none');
+    }
+
+    function hide() {
+        box.classList.add('d-none');
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = this.value.trim();
+        if (query.length < 2) {
+            hide();
+            return;
+        }
+        timer = setTimeout(() => search(query, 8), 250);
+    });
+    input.addEventListener('keyup', function(e) {
+        if (e.key === 'Escape') {
+            hide();
+        }
+    });
+    input.addEventListener('blur', hide);
+
+    return {search: search, hide: hide};
+}
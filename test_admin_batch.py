@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Тест пакетных операций админ-панели (/api/admin/batch/users и /api/admin/batch/bots) на SQLite
+"""
+
+import json
+
+import pytest
+import sqlalchemy as sa
+
+from app import app, db, User, Bot, StatCounter, UserBotCount, rebuild_stat_rollups, user_cache
+from conftest import sqlite_app
+
+pytestmark = pytest.mark.usefixtures('sqlite_db')
+
+def seed(users=4, bots_per_user=3):
+    """Админ и пользователи с ботами; возвращает (admin_id, [user_id], {user_id: [bot_id]})"""
+    with app.app_context():
+        for model in (Bot, User, StatCounter, UserBotCount):
+            db.session.query(model).delete()
+        admin = User(name='Админ', email='admin@example.com', password_hash='x', is_admin=True)
+        people = [User(name=f'Спамер {i}', email=f'spam{i}@example.com', password_hash='x') for i in range(users)]
+        db.session.add_all([admin] + people)
+        db.session.flush()
+        bots = {user.id: [Bot(name=f'Бот {user.id}-{j}', token='t', config=json.dumps({'blocks': []}), user_id=user.id)
+                          for j in range(bots_per_user)] for user in people}
+        db.session.add_all([bot for user_bots in bots.values() for bot in user_bots])
+        db.session.commit()
+        rebuild_stat_rollups()
+        # SQLite reuses ids of deleted rows, so cached identities from a previous seed must go
+        user_cache.clear()
+        return admin.id, [user.id for user in people], {user_id: [bot.id for bot in user_bots]
+                                                           for user_id, user_bots in bots.items()}
+
+def client(user_id):
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return test_client
+
+def rollups():
+    """Счетчики и число ботов по пользователям без нулевых строк"""
+    counters = {name: value for name, value in db.session.query(StatCounter.name, StatCounter.value) if value}
+    bot_counts = {user_id: count for user_id, count in db.session.query(UserBotCount.user_id, UserBotCount.bot_count) if count}
+    return counters, bot_counts
+
+def statuses(response):
+    return {item['id']: item['status'] for item in response.get_json()['results']}
+
+def test_ids_and_self_protection():
+    admin_id, user_ids, _ = seed()
+    admin = client(admin_id)
+
+    response = admin.post('/api/admin/batch/users', json={
+        'action': 'deactivate', 'ids': [admin_id, user_ids[0], user_ids[0], 999999]
+    })
+    data = response.get_json()
+    assert response.status_code == 200 and data['success']
+    assert statuses(response) == {admin_id: 'forbidden', user_ids[0]: 'updated', 999999: 'not_found'}
+    assert data['results'][0]['error'] == 'Нельзя деактивировать свой аккаунт администратора'
+    assert data['summary'] == {'updated': 1, 'unchanged': 0, 'forbidden': 1, 'not_found': 1}
+
+    response = admin.post('/api/admin/batch/users', json={'action': 'activate', 'ids': user_ids[:2]})
+    assert statuses(response) == {user_ids[0]: 'updated', user_ids[1]: 'unchanged'}
+    response = admin.post('/api/admin/batch/users', json={'action': 'revoke_admin', 'ids': [admin_id]})
+    assert statuses(response) == {admin_id: 'forbidden'}
+    # Снять права с себя нельзя, а выдать их уже имеющему - не ошибка
+    response = admin.post('/api/admin/batch/users', json={'action': 'grant_admin', 'ids': [admin_id, user_ids[1]]})
+    assert statuses(response) == {admin_id: 'unchanged', user_ids[1]: 'updated'}
+
+    with app.app_context():
+        assert db.session.get(User, admin_id).is_active and db.session.get(User, admin_id).is_admin
+        assert db.session.get(User, user_ids[1]).is_admin
+
+    # Обычный пользователь до пакетных операций не допускается
+    response = client(user_ids[0]).post('/api/admin/batch/bots', json={'action': 'delete', 'ids': [1]})
+    assert response.status_code == 302
+    print("✅ Результат по каждому id, свой аккаунт защищен от изменений")
+
+def test_rollups_match_rebuild():
+    admin_id, user_ids, bots = seed()
+    admin = client(admin_id)
+    app.config['ADMIN_BATCH_CHUNK_SIZE'], chunk_size = 2, app.config['ADMIN_BATCH_CHUNK_SIZE']
+    try:
+        requests = [
+            ('bots', {'action': 'deactivate', 'filter': {'user_id': user_ids[:2]}}),
+            ('bots', {'action': 'activate', 'ids': bots[user_ids[0]][:1] + bots[user_ids[2]]}),
+            ('bots', {'action': 'delete', 'filter': {'name_contains': f'Бот {user_ids[3]}-'}}),
+            ('users', {'action': 'grant_admin', 'filter': {'email_contains': 'spam'}}),
+            ('users', {'action': 'deactivate', 'ids': user_ids[1:3]}),
+            ('users', {'action': 'revoke_admin', 'filter': {'is_active': True}})
+        ]
+        for target, body in requests:
+            response = admin.post(f'/api/admin/batch/{target}', json=body)
+            assert response.status_code == 200 and response.get_json()['success'], response.get_json()
+    finally:
+        app.config['ADMIN_BATCH_CHUNK_SIZE'] = chunk_size
+
+    with app.app_context():
+        counters, bot_counts = rollups()
+        assert counters['active_bots'] == 1 + 3 == sum(bot_counts.values())
+        assert counters['active_users'] == 3 and counters['admins'] == 1
+        rebuild_stat_rollups()
+        assert rollups() == (counters, bot_counts)
+    print("✅ Счетчики после пакетов совпадают с rebuild_stat_rollups()")
+
+def test_filter_validation():
+    admin_id, user_ids, _ = seed(users=1)
+    admin = client(admin_id)
+    for target, body in (
+        ('users', {'action': 'explode', 'ids': [1]}),
+        ('bots', {'action': 'grant_admin', 'ids': [1]}),
+        ('users', {'action': 'delete'}),
+        ('users', {'action': 'delete', 'ids': [1], 'filter': {'is_active': True}}),
+        ('users', {'action': 'delete', 'ids': []}),
+        ('users', {'action': 'delete', 'ids': ['1']}),
+        ('users', {'action': 'delete', 'ids': [True]}),
+        ('users', {'action': 'delete', 'filter': {}}),
+        ('users', {'action': 'delete', 'filter': [1]}),
+        ('users', {'action': 'delete', 'filter': {'password_hash': 'x'}}),
+        ('users', {'action': 'delete', 'filter': {'is_active': 'yes'}}),
+        ('users', {'action': 'delete', 'filter': {'email_contains': ''}}),
+        ('users', {'action': 'delete', 'filter': {'created_after': 'вчера'}}),
+        ('users', {'action': 'delete', 'filter': {'user_id': 1}}),
+        ('bots', {'action': 'delete', 'filter': {'is_admin': True}}),
+        ('bots', {'action': 'delete', 'filter': {'user_id': ['1']}}),
+        ('bots', {'action': 'delete', 'filter': {'user_id': 1}, 'after': '5'})
+    ):
+        response = admin.post(f'/api/admin/batch/{target}', json=body)
+        assert response.status_code == 400 and response.get_json()['error'], body
+
+    app.config['ADMIN_BATCH_MAX_ROWS'], max_rows = 2, app.config['ADMIN_BATCH_MAX_ROWS']
+    try:
+        response = admin.post('/api/admin/batch/users', json={'action': 'delete', 'ids': [1, 2, 3]})
+        assert response.status_code == 400
+    finally:
+        app.config['ADMIN_BATCH_MAX_ROWS'] = max_rows
+
+    with app.app_context():
+        assert User.query.filter_by(is_active=False).count() == 0
+    print("✅ Некорректные действия, ids и фильтры отклоняются до изменений")
+
+def test_next_after_resume():
+    admin_id, user_ids, bots = seed(users=2, bots_per_user=4)
+    admin = client(admin_id)
+    all_bots = sorted(bot_id for user_bots in bots.values() for bot_id in user_bots)
+    app.config['ADMIN_BATCH_CHUNK_SIZE'], chunk_size = 2, app.config['ADMIN_BATCH_CHUNK_SIZE']
+    app.config['ADMIN_BATCH_MAX_ROWS'], max_rows = 3, app.config['ADMIN_BATCH_MAX_ROWS']
+    try:
+        seen, after, calls = [], 0, 0
+        while True:
+            # Фильтр по активности: уже обработанные строки из выборки выпадают, но курсор идет по id
+            response = admin.post('/api/admin/batch/bots', json={
+                'action': 'deactivate', 'filter': {'is_active': True, 'name_contains': 'Бот'}, 'after': after
+            })
+            data = response.get_json()
+            seen.extend(item['id'] for item in data['results'])
+            calls += 1
+            if data['next_after'] is None:
+                break
+            assert data['next_after'] == seen[-1] and len(data['results']) == 3
+            after = data['next_after']
+    finally:
+        app.config['ADMIN_BATCH_CHUNK_SIZE'] = chunk_size
+        app.config['ADMIN_BATCH_MAX_ROWS'] = max_rows
+
+    assert seen == all_bots and calls == 3
+    with app.app_context():
+        assert Bot.query.filter_by(is_active=True).count() == 0
+    response = admin.post('/api/admin/batch/bots', json={'action': 'activate', 'filter': {'is_active': True}})
+    assert response.get_json()['results'] == [] and response.get_json()['next_after'] is None
+    print("✅ next_after продолжает пакет по фильтру без пропусков и повторов")
+
+def test_partial_failure():
+    admin_id, user_ids, bots = seed(users=3, bots_per_user=2)
+    admin = client(admin_id)
+    broken = bots[user_ids[1]][0]
+    with app.app_context():
+        db.session.execute(sa.text(
+            f"CREATE TRIGGER batch_fail BEFORE UPDATE ON bots WHEN NEW.id = {broken} "
+            "BEGIN SELECT RAISE(ABORT, 'bot is locked'); END"
+        ))
+        db.session.commit()
+    app.config['ADMIN_BATCH_CHUNK_SIZE'], chunk_size = 2, app.config['ADMIN_BATCH_CHUNK_SIZE']
+    try:
+        response = admin.post('/api/admin/batch/bots', json={'action': 'deactivate', 'filter': {'is_active': True}})
+    finally:
+        app.config['ADMIN_BATCH_CHUNK_SIZE'] = chunk_size
+        with app.app_context():
+            db.session.execute(sa.text('DROP TRIGGER batch_fail'))
+            db.session.commit()
+
+    data = response.get_json()
+    assert response.status_code == 500 and not data['success']
+    assert 'bot is locked' in data['error']
+    # Первый пакет зафиксирован и попал в отчет, сбойный откатился целиком
+    assert statuses(response) == {bot_id: 'updated' for bot_id in bots[user_ids[0]]}
+    assert data['next_after'] == bots[user_ids[0]][-1]
+    with app.app_context():
+        inactive = sorted(bot.id for bot in Bot.query.filter_by(is_active=False))
+        assert inactive == bots[user_ids[0]]
+        counters, bot_counts = rollups()
+        rebuild_stat_rollups()
+        assert rollups() == (counters, bot_counts)
+    print("✅ При сбое отчет содержит примененные пакеты, счетчики не расходятся")
+
+if __name__ == '__main__':
+    print("📦 Тестирование пакетных операций админ-панели")
+    print("=" * 50)
+    with sqlite_app():
+        test_ids_and_self_protection()
+        test_rollups_match_rebuild()
+        test_filter_validation()
+        test_next_after_resume()
+        test_partial_failure()
+    print("\n🎯 Тестирование завершено!")
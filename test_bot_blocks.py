@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Тест каталога блоков /api/bot-blocks: выбор кодировки, 304 по ETag и кэширование по ?v= на SQLite
+"""
+
+import gzip
+import json
+
+import pytest
+
+from app import app, db, User, BOT_BLOCKS, bot_blocks_response, precompute_json, send_precomputed, user_cache
+from conftest import sqlite_app
+
+pytestmark = pytest.mark.usefixtures('sqlite_db')
+
+def client():
+    with app.app_context():
+        db.session.query(User).delete()
+        user = User(name='Иван', email='ivan@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    user_cache.clear()
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return test_client
+
+def test_encodings():
+    user = client()
+    etags = bot_blocks_response['etags']
+
+    response = user.get('/api/bot-blocks', headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200 and 'Content-Encoding' not in response.headers
+    assert response.get_json() == BOT_BLOCKS
+    assert response.headers['ETag'] == f'"{etags["identity"]}"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    response = user.get('/api/bot-blocks', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data())) == BOT_BLOCKS
+    assert response.headers['ETag'] == f'"{etags["gzip"]}"'
+    # Каждая кодировка - отдельное представление со своим ETag
+    assert len(set(etags.values())) == len(etags)
+
+    # brotli необязателен: br выбирается раньше gzip, если вариант собран
+    precomputed = precompute_json({'a': 1})
+    precomputed['variants']['br'] = b'br-body'
+    precomputed['etags']['br'] = precomputed['etags']['identity'] + '-br'
+    for accept, encoding in (('gzip, br', 'br'), ('gzip;q=1.0, br;q=0', 'gzip'), ('', 'identity')):
+        with app.test_request_context(headers={'Accept-Encoding': accept}):
+            response = send_precomputed(precomputed)
+            assert response.headers.get('Content-Encoding', 'identity') == encoding, accept
+            assert response.headers['ETag'] == f'"{precomputed["etags"][encoding]}"'
+    print("✅ Кодировка выбирается по Accept-Encoding, у каждой свой ETag")
+
+def test_not_modified():
+    user = client()
+    etags = bot_blocks_response['etags']
+    response = user.get('/api/bot-blocks', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etags["gzip"]}"'})
+    assert response.status_code == 304 and response.get_data() == b''
+    assert response.headers['ETag'] == f'"{etags["gzip"]}"'
+
+    # ETag другой кодировки тоже подходит: содержимое то же, ответ - ETag запрошенной кодировки
+    response = user.get('/api/bot-blocks', headers={'Accept-Encoding': 'identity', 'If-None-Match': f'"{etags["gzip"]}"'})
+    assert response.status_code == 304 and response.headers['ETag'] == f'"{etags["identity"]}"'
+    response = user.get('/api/bot-blocks', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etags["identity"]}"'})
+    assert response.status_code == 304 and response.headers['ETag'] == f'"{etags["gzip"]}"'
+
+    response = user.get('/api/bot-blocks', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+    print("✅ 304 по ETag любой кодировки того же содержимого")
+
+def test_versioned_caching():
+    user = client()
+    version = bot_blocks_response['version']
+    response = user.get('/api/bot-blocks')
+    assert response.headers['X-Bot-Blocks-Version'] == version
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    # Адрес с текущей версией можно кэшировать навсегда, со старой - только с перепроверкой
+    response = user.get(f'/api/bot-blocks?v={version}')
+    assert response.headers['Cache-Control'] == 'private, max-age=31536000, immutable'
+    response = user.get(f'/api/bot-blocks?v={version}', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304 and 'immutable' in response.headers['Cache-Control']
+    assert user.get('/api/bot-blocks?v=0000').headers['Cache-Control'] == 'private, no-cache'
+
+    # Без входа каталог не отдается
+    assert app.test_client().get('/api/bot-blocks').status_code == 302
+    print("✅ ?v= с текущей версией кэшируется как immutable")
+
+if __name__ == '__main__':
+    print("🧱 Тестирование каталога блоков")
+    print("=" * 50)
+    with sqlite_app():
+        test_encodings()
+        test_not_modified()
+        test_versioned_caching()
+    print("\n🎯 Тестирование завершено!")
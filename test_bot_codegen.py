@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Тест генерации кода бота и кэша сгенерированных скриптов (bot_codegen.py)
+"""
+
+import ast
+import os
+import sys
+import tempfile
+import time
+import types
+from bot_codegen import generate_bot_code, CodeCache, PreviewCache, config_cache_key, BLOCK_COMPILERS, BlockConfigError
+
+CONFIG = {
+    'name': 'Test Bot',
+    'description': 'Бот для теста',
+    'welcome_message': 'Привет!',
+    'help_command': True,
+    'about_command': True,
+    'custom_responses': [{'trigger': 'цена', 'reply': '100 ₽'}],
+    'echo_enabled': True
+}
+
+def test_generate_bot_code():
+    code = generate_bot_code(CONFIG)
+    compile(code, 'bot.py', 'exec')
+    assert 'Test Bot' in code and 'цена' in code
+    print("✅ Код бота генерируется и компилируется")
+
+def test_all_block_types():
+    # Каждый тип блока из /api/bot-blocks, включая спецсимволы в пользовательском тексте
+    blocks = [{'type': block_type, 'config': {}} for block_type in BLOCK_COMPILERS]
+    blocks += [
+        {'type': 'inline_keyboard', 'config': {'text': 'Меню """ \\ {x}', 'buttons': '[["Да", "Нет"]]'}},
+        {'type': 'reply_keyboard', 'config': {'buttons': [['A']], 'resize': True}},
+        {'type': 'custom', 'config': {'keywords': 'цена, стоимость', 'response': "it's {ok}"}}
+    ]
+    code = generate_bot_code(blocks, name='Бот "1"', token="123:abc'")
+    ast.parse(code)
+    assert "('цена', 0), ('стоимость', 0)" in code and 'resize_keyboard=True' in code
+    assert len(BLOCK_COMPILERS) == 12
+    print("✅ Все 12 типов блоков компилируются в корректный Python")
+
+    try:
+        generate_bot_code([{'type': 'inline_keyboard', 'config': {'text': 'x', 'buttons': '[oops'}}])
+        assert False, 'BlockConfigError expected'
+    except BlockConfigError:
+        pass
+    print("✅ Некорректный JSON кнопок отклоняется")
+
+class FakeBot:
+    """Минимальная замена telebot.TeleBot: обработчики проверяются по порядку, как в telebot"""
+
+    def __init__(self, token, **kwargs):
+        self.handlers = []
+        self.replies = []
+
+    def message_handler(self, commands=None, func=None, **kwargs):
+        def register(handler):
+            self.handlers.append((commands, func, handler))
+            return handler
+        return register
+
+    def callback_query_handler(self, func=None, **kwargs):
+        return lambda handler: handler
+
+    def reply_to(self, message, text, **kwargs):
+        self.replies.append(text)
+
+    def process(self, text):
+        message = types.SimpleNamespace(text=text, from_user=types.SimpleNamespace(id=1))
+        for commands, func, handler in self.handlers:
+            if commands is None and func(message):
+                handler(message)
+                return
+
+def _load_bot(code):
+    fake_telebot = types.ModuleType('telebot')
+    fake_telebot.TeleBot = FakeBot
+    fake_telebot.types = types.ModuleType('telebot.types')
+    fake_telebot.apihelper = types.ModuleType('telebot.apihelper')
+    modules = {'telebot': fake_telebot, 'telebot.types': fake_telebot.types, 'telebot.apihelper': fake_telebot.apihelper}
+    saved = {name: sys.modules.get(name) for name in modules}
+    sys.modules.update(modules)
+    try:
+        namespace = {'__name__': 'generated_bot'}
+        exec(compile(code, 'bot.py', 'exec'), namespace)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    namespace['logger'].disabled = True
+    return namespace['bot']
+
+def test_keyword_dispatch_priority():
+    blocks = [
+        {'type': 'custom', 'config': {'keywords': 'at', 'response': 'first'}},
+        {'type': 'custom', 'config': {'keywords': 'cat, Собака', 'response': 'second'}},
+        {'type': 'echo', 'config': {}}
+    ]
+    for dispatch in ('matcher', 'handlers'):
+        bot = _load_bot(generate_bot_code(blocks, keyword_dispatch=dispatch))
+        for text in ('a CAT', 'моя собака', 'hello'):
+            bot.process(text)
+        assert bot.replies == ['first', 'second', 'Эхо: hello'], (dispatch, bot.replies)
+    print("✅ Диспетчер ключевых слов сохраняет порядок блоков")
+
+def test_keyword_dispatch_benchmark():
+    blocks = [
+        {'type': 'custom', 'config': {'keywords': f'ключ-{i:03d}, фраза номер {i:03d}', 'response': f'ответ {i}'}}
+        for i in range(500)
+    ]
+    messages = ['Обычное сообщение без ключевых слов, немного длиннее среднего'] * 150
+    messages += ['Здесь есть ключ-499 в конце списка'] * 50
+
+    timings = {}
+    replies = {}
+    for dispatch in ('handlers', 'matcher'):
+        bot = _load_bot(generate_bot_code(blocks, keyword_dispatch=dispatch))
+        started = time.perf_counter()
+        for text in messages:
+            bot.process(text)
+        timings[dispatch] = time.perf_counter() - started
+        replies[dispatch] = bot.replies
+
+    assert replies['matcher'] == replies['handlers'] == ['ответ 499'] * 50
+    assert timings['matcher'] < timings['handlers']
+    print(f"✅ 500 триггеров, {len(messages)} сообщений: "
+          f"отдельные обработчики {timings['handlers'] * 1000:.1f} мс, "
+          f"один автомат {timings['matcher'] * 1000:.1f} мс")
+
+def test_cache_key_is_canonical():
+    reordered = dict(reversed(list(CONFIG.items())))
+    assert config_cache_key(CONFIG) == config_cache_key(reordered)
+    assert config_cache_key(CONFIG) != config_cache_key({**CONFIG, 'name': 'Other'})
+    print("✅ Ключ кэша не зависит от порядка полей")
+
+def test_code_cache():
+    calls = []
+
+    def generator(config):
+        calls.append(config)
+        return generate_bot_code(config)
+
+    disk_dir = tempfile.mkdtemp()
+    stale_dir = os.path.join(disk_dir, '0' * 16)
+    os.makedirs(stale_dir)
+
+    cache = CodeCache(max_entries=2, disk_dir=disk_dir)
+    assert not os.path.exists(stale_dir)
+    first = cache.get_or_generate(generator, CONFIG)
+    assert cache.get_or_generate(generator, dict(CONFIG)) == first
+    assert len(calls) == 1
+    print("✅ Повторная генерация берется из памяти")
+
+    # Другой воркер читает тот же дисковый кэш
+    other_worker = CodeCache(max_entries=2, disk_dir=disk_dir)
+    assert other_worker.get_or_generate(generator, CONFIG) == first
+    assert len(calls) == 1 and other_worker.stats()['disk_hits'] == 1
+    print("✅ Дисковый кэш общий для воркеров, устаревшие версии удаляются")
+
+def test_incremental_preview():
+    blocks = [
+        {'id': i, 'type': 'message', 'config': {'text': f'Ответ {i}'}}
+        for i in range(300)
+    ]
+    blocks.insert(10, {'id': 'k', 'type': 'custom', 'config': {'keywords': 'цена', 'response': '100 ₽'}})
+    cache = PreviewCache()
+
+    def assemble(layout, fragments):
+        return ''.join(fragments[item['id']] for item in layout)
+
+    started = time.perf_counter()
+    full = cache.update(blocks, owner=1, name='Бот')
+    full_time = time.perf_counter() - started
+    fragments = {item['id']: item['text'] for item in full['fragments']}
+    assert full['base_revision'] is None
+    assert assemble(full['layout'], fragments) == generate_bot_code(blocks, name='Бот')
+
+    # Правка одного блока возвращает только его фрагмент и его позицию
+    blocks[200]['config']['text'] = 'Новый ответ'
+    started = time.perf_counter()
+    delta = cache.update(blocks, base_revision=full['revision'], changed=[199], owner=1, name='Бот')
+    delta_time = time.perf_counter() - started
+    assert [item['id'] for item in delta['fragments']] == ['block-199']
+    fragments.update({item['id']: item['text'] for item in delta['fragments']})
+    code = assemble(delta['layout'], fragments)
+    assert code == generate_bot_code(blocks, name='Бот')
+    fragment = delta['fragments'][0]
+    lines = delta['layout'][fragment['index']]['lines']
+    assert code.split('\n')[fragment['line'] - 1:fragment['line'] - 1 + lines] == fragment['text'].split('\n')[:lines]
+
+    # Удаление блока и правка ключевых слов
+    del blocks[50]
+    blocks[10]['config']['keywords'] = 'цена, стоимость'
+    delta = cache.update(blocks, base_revision=delta['revision'], changed=['k'], owner=1, name='Бот')
+    assert delta['removed'] == ['block-49']
+    assert [item['id'] for item in delta['fragments']] == ['keywords']
+    fragments.update({item['id']: item['text'] for item in delta['fragments']})
+    assert assemble(delta['layout'], fragments) == generate_bot_code(blocks, name='Бот')
+    print(f"✅ Инкрементальный предпросмотр: полная сборка {full_time * 1000:.1f} мс, "
+          f"правка одного блока {delta_time * 1000:.1f} мс")
+
+    # Чужая или неизвестная ревизия дает полный ответ
+    other = cache.update(blocks, base_revision=delta['revision'], owner=2, name='Бот')
+    assert other['base_revision'] is None and len(other['fragments']) == len(other['layout'])
+    assert cache.update(blocks, base_revision='missing', owner=1)['base_revision'] is None
+    print("✅ Неизвестная ревизия приводит к полной сборке")
+
+def test_malformed_blocks():
+    """Некорректная структура блоков дает BlockConfigError (400), а не падение сервера"""
+    for config in (
+        {'blocks': None},
+        {'blocks': 'welcome'},
+        [{'type': 'welcome', 'config': 'x'}],
+        [{'type': 'message', 'config': [['text']]}],
+        [{'type': ['welcome'], 'config': {}}],
+        [{'config': {}}],
+        ['welcome'],
+        {'custom_responses': [1]},
+        None
+    ):
+        try:
+            generate_bot_code(config)
+            assert False, f'BlockConfigError expected for {config!r}'
+        except BlockConfigError:
+            pass
+        if isinstance(config, list):
+            try:
+                PreviewCache().update(config, owner=1)
+                assert False, f'BlockConfigError expected in preview for {config!r}'
+            except BlockConfigError:
+                pass
+    # Пустые настройки по-прежнему допустимы
+    assert 'def send_welcome' in generate_bot_code([{'type': 'welcome', 'config': None}])
+    print("✅ Некорректные блоки отклоняются с понятной ошибкой")
+
+if __name__ == '__main__':
+    print("🧩 Тестирование генерации кода бота")
+    print("=" * 50)
+    test_generate_bot_code()
+    test_all_block_types()
+    test_keyword_dispatch_priority()
+    test_keyword_dispatch_benchmark()
+    test_cache_key_is_canonical()
+    test_code_cache()
+    test_incremental_preview()
+    test_malformed_blocks()
+    print("\n🎯 Тестирование завершено!")
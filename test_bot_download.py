@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Тест скачивания ботов (/api/download-bot и /api/download-bots): валидаторы кэша и состав ZIP на SQLite
+"""
+
+import io
+import json
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app, db, User, Bot, user_cache
+from conftest import sqlite_app
+
+pytestmark = pytest.mark.usefixtures('sqlite_db')
+
+CONFIG = {'blocks': [{'id': 0, 'type': 'welcome', 'config': {'text': 'Привет!'}}]}
+
+def seed():
+    """Пользователь с двумя активными ботами и одним выключенным; возвращает (user_id, [bot_id])"""
+    with app.app_context():
+        for model in (Bot, User):
+            db.session.query(model).delete()
+        user = User(name='Иван', email='ivan@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        bots = [Bot(name=name, token='t', config=json.dumps(CONFIG), user_id=user.id, is_active=active)
+                for name, active in (('Support Bot', True), ('Бот', True), ('Old', False))]
+        db.session.add_all(bots)
+        db.session.commit()
+        # SQLite reuses ids of deleted rows, so cached identities from a previous seed must go
+        user_cache.clear()
+        return user.id, [bot.id for bot in bots]
+
+def client(user_id):
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return test_client
+
+def get(test_client, url, etag=None):
+    response = test_client.get(url, headers={'If-None-Match': etag} if etag else {})
+    # Streamed ZIPs are read here, inside the request context, not when the response is collected
+    response.get_data()
+    return response
+
+def touch(bot_id):
+    """Меняет бота, как сохранение в редакторе: новый config и updated_at"""
+    with app.app_context():
+        bot = db.session.get(Bot, bot_id)
+        bot.config = json.dumps({'blocks': []})
+        bot.updated_at = datetime.utcnow() + timedelta(seconds=2)
+        db.session.commit()
+
+def members(response):
+    return zipfile.ZipFile(io.BytesIO(response.get_data())).namelist()
+
+def test_conditional_download():
+    user_id, bot_ids = seed()
+    user = client(user_id)
+    for query in ('', '?format=zip'):
+        url = f'/api/download-bot/{bot_ids[0]}{query}'
+        response = get(user, url)
+        etag = response.headers['ETag']
+        assert response.status_code == 200 and etag and response.last_modified
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        assert response.headers['X-Generator-Version']
+
+        # Повторный запрос с ETag получает 304 без тела
+        response = get(user, url, etag)
+        assert response.status_code == 304 and response.get_data() == b''
+        assert response.headers['ETag'] == etag
+
+        response = get(user, url, '"other"')
+        assert response.status_code == 200
+
+        # После изменения бота старый ETag больше не подходит
+        touch(bot_ids[0])
+        response = get(user, url, etag)
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert get(user, url, response.headers['ETag']).status_code == 304
+
+    # JSON и ZIP одного бота - разные представления с разными ETag
+    json_etag = get(user, f'/api/download-bot/{bot_ids[0]}').headers['ETag']
+    assert get(user, f'/api/download-bot/{bot_ids[0]}?format=zip', json_etag).status_code == 200
+
+    assert get(user, '/api/download-bot/999999').status_code == 404
+    print("✅ 304 по If-None-Match, новый ETag после изменения бота")
+
+def test_zip_members():
+    user_id, bot_ids = seed()
+    user = client(user_id)
+    response = get(user, f'/api/download-bot/{bot_ids[0]}?format=zip')
+    assert response.mimetype == 'application/zip'
+    assert f'filename="bot-{bot_ids[0]}-Support_Bot.zip"' in response.headers['Content-Disposition']
+    prefix = f'bot-{bot_ids[0]}-Support_Bot/'
+    assert members(response) == [prefix + 'bot.py', prefix + 'requirements.txt', prefix + 'config.json']
+    bundle = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    assert json.loads(bundle.read(prefix + 'config.json')) == CONFIG
+    compile(bundle.read(prefix + 'bot.py'), 'bot.py', 'exec')
+
+    # В общем архиве по каталогу на каждый активный бот; имя без латиницы сводится к id
+    response = get(user, '/api/download-bots')
+    assert response.status_code == 200 and 'filename="bots.zip"' in response.headers['Content-Disposition']
+    assert members(response) == [f'{directory}/{name}'
+                                 for directory in (f'bot-{bot_ids[0]}-Support_Bot', f'bot-{bot_ids[1]}')
+                                 for name in ('bot.py', 'requirements.txt', 'config.json')]
+    print("✅ Имена файлов в ZIP одного бота и общего архива")
+
+def test_bulk_validators():
+    user_id, bot_ids = seed()
+    user = client(user_id)
+    etag = get(user, '/api/download-bots').headers['ETag']
+    assert get(user, '/api/download-bots', etag).status_code == 304
+
+    # Изменение любого бота меняет ETag архива, выключенный бот в архив не входит
+    touch(bot_ids[1])
+    response = get(user, '/api/download-bots', etag)
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    with app.app_context():
+        db.session.get(Bot, bot_ids[0]).is_active = False
+        db.session.get(Bot, bot_ids[1]).is_active = False
+        db.session.commit()
+    assert get(user, '/api/download-bots').status_code == 404
+    print("✅ ETag общего архива зависит от состава и изменений ботов")
+
+if __name__ == '__main__':
+    print("📥 Тестирование скачивания ботов")
+    print("=" * 50)
+    with sqlite_app():
+        test_conditional_download()
+        test_zip_members()
+        test_bulk_validators()
+    print("\n🎯 Тестирование завершено!")
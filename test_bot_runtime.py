@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Тест сгенерированных ботов во всех режимах запуска на заглушке Bot API (bot_harness.py)
+"""
+
+import importlib.util
+import os
+import tempfile
+from bot_codegen import generate_bot_code, RUNTIME_TARGETS, DEFAULT_RUNTIME, runtime_options, BlockConfigError
+from bot_harness import StubBotAPI, replay, text_update, STUB_TOKEN
+
+BLOCKS = [
+    {'type': 'welcome', 'config': {'message': 'Привет!'}},
+    {'type': 'custom', 'config': {'keywords': 'цена, стоимость', 'response': '100 ₽'}},
+    {'type': 'echo', 'config': {}}
+]
+
+def test_runtime_options():
+    assert runtime_options({}) == DEFAULT_RUNTIME
+    assert runtime_options({'target': 'webhook', 'workers': '8'})['workers'] == 8
+    assert runtime_options({'send_queue': 'false'})['send_queue'] is False
+    for bad in ({'target': 'cron'}, {'workers': 0}, {'max_pending': 'много'}, {'global_rate': 100}):
+        try:
+            runtime_options(bad)
+            assert False, f'BlockConfigError expected for {bad}'
+        except BlockConfigError:
+            pass
+    print("✅ Параметры запуска проверяются")
+
+def _bot_api_available():
+    if importlib.util.find_spec('telebot') is None or importlib.util.find_spec('aiohttp') is None:
+        print("⚠️ pyTelegramBotAPI и aiohttp не установлены, прогон ботов пропущен")
+        return False
+    return True
+
+def _write_bot(blocks, target, **options):
+    path = os.path.join(tempfile.mkdtemp(), f'bot_{target}.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(generate_bot_code(blocks, token=STUB_TOKEN, target=target, **options))
+    return path
+
+def test_replay_all_targets():
+    if not _bot_api_available():
+        return
+
+    texts = ['/start', 'Какая цена?', 'hello'] * 10
+    updates = [text_update(i + 1, text, chat_id=100 + i % 3) for i, text in enumerate(texts)]
+    expected = sorted(['Привет!', '100 ₽', 'Эхо: hello'] * 10)
+
+    for target in RUNTIME_TARGETS:
+        path = _write_bot(BLOCKS, target, workers=4, chat_rate=600)
+        stub = replay(path, updates, target)
+        assert sorted(stub.sent()) == expected, (target, stub.sent())
+        print(f"✅ Режим {target}: {len(updates)} обновлений обработано")
+
+def test_send_queue_pacing():
+    if not _bot_api_available():
+        return
+
+    # Цикл отправляет 6 сообщений подряд в один чат; первая отправка получает 429
+    blocks = [{'type': 'loop', 'config': {'iterations': 6, 'action': "bot.send_message(message.chat.id, 'тик')"}}]
+    stub = StubBotAPI().start()
+    stub.flood(100, times=1, retry_after=1)
+    stub = replay(_write_bot(blocks, 'polling', chat_rate=120), [text_update(1, 'go')], expected=6, stub=stub)
+
+    assert stub.sent() == ['тик'] * 6
+    assert [method for method, _ in stub.calls].count('flood') == 1
+    times = [at for _, at in stub.send_times]
+    # После паузы retry_after: 3 сообщения подряд, остальные 3 с шагом 0.5 с (120 в минуту)
+    assert times[-1] - times[0] >= 1.4
+    print(f"✅ Очередь исходящих соблюдает retry_after и лимит чата ({times[-1] - times[0]:.2f} с на 6 сообщений)")
+
+    # Async-режим: 429 в одном чате не задерживает остальные и не порождает лишних сообщений
+    stub = StubBotAPI().start()
+    stub.flood(101, times=2, retry_after=1)
+    updates = [text_update(i + 1, '/start', chat_id=100 + i) for i in range(3)]
+    stub = replay(_write_bot(BLOCKS, 'async'), updates, 'async', stub=stub)
+    assert stub.sent() == ['Привет!'] * 3
+    assert [params['chat_id'] for method, params in stub.calls if method == 'sendMessage'][-1] == '101'
+    print("✅ Async-бот повторяет отправку после 429 без сообщений об ошибке")
+
+def test_action_blocks_all_targets():
+    if not _bot_api_available():
+        return
+
+    loop = [{'type': 'loop', 'config': {
+        'iterations': 2, 'action': "text = f'тик {i}'\nbot.send_message(message.chat.id, text)"
+    }}]
+    condition = [{'type': 'condition', 'config': {
+        'condition': "message.text == 'да'",
+        'true_action': "bot.reply_to(message, 'верно')",
+        'false_action': "bot.reply_to(message, 'неверно')"
+    }}]
+    for target in RUNTIME_TARGETS:
+        # В async-режиме действия блоков тоже дожидаются отправки, а не теряют корутины
+        stub = replay(_write_bot(loop, target), [text_update(1, 'go')], target, expected=2)
+        assert stub.sent() == ['тик 0', 'тик 1'], (target, stub.sent())
+        stub = replay(_write_bot(condition, target), [text_update(1, 'да'), text_update(2, 'нет')], target)
+        assert sorted(stub.sent()) == ['верно', 'неверно'], (target, stub.sent())
+        print(f"✅ Режим {target}: действия условий и циклов отправляют сообщения")
+
+def test_file_id_reuse():
+    if not _bot_api_available():
+        return
+
+    blocks = [
+        {'type': 'photo', 'config': {'photo_url': 'https://example.com/cat.jpg', 'caption': 'Кот'}},
+        {'type': 'document', 'config': {'document_url': 'https://example.com/price.pdf'}}
+    ]
+    env = {'FILE_ID_CACHE_PATH': os.path.join(tempfile.mkdtemp(), 'file_ids.sqlite3')}
+    path = _write_bot(blocks, 'polling')
+
+    def media_sent(stub):
+        return [params.get('photo') or params.get('document')
+                for method, params in stub.calls if method in ('sendPhoto', 'sendDocument')]
+
+    updates = [text_update(i + 1, text) for i, text in enumerate(['/photo', '/document'] * 3)]
+    stub = replay(path, updates, env=env)
+    sent = media_sent(stub)
+    assert sorted(sent[:2]) == ['https://example.com/cat.jpg', 'https://example.com/price.pdf']
+    assert all(not media.startswith('https://') for media in sent[2:]), sent
+    print("✅ Повторные отправки используют file_id вместо URL")
+
+    # После перезапуска file_id берутся из локальной базы; устаревший file_id загружается заново
+    stub = StubBotAPI().start()
+    stub.file_ids.update(media for media in sent if not media.startswith('https://'))
+    stub = replay(path, [text_update(1, '/photo')], stub=stub, env=env)
+    assert not media_sent(stub)[0].startswith('https://')
+
+    stub = replay(path, [text_update(1, '/photo'), text_update(2, '/photo')], env=env)
+    assert [method for method, _ in stub.calls].count('rejected') == 1
+    assert media_sent(stub)[0] == 'https://example.com/cat.jpg'
+    print("✅ Кэш file_id переживает перезапуск, недействительные file_id заменяются")
+
+if __name__ == '__main__':
+    print("🤖 Тестирование режимов запуска ботов")
+    print("=" * 50)
+    test_runtime_options()
+    test_replay_all_targets()
+    test_send_queue_pacing()
+    test_action_blocks_all_targets()
+    test_file_id_reuse()
+    print("\n🎯 Тестирование завершено!")
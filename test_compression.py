@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Тест сжатых текстовых колонок (compression.py)
+"""
+
+import json
+from compression import encode, decode, frame_codec, available_codecs, CompressionError, CompressedText, MAGIC
+
+CONFIG = json.dumps([
+    {'id': i, 'type': 'message', 'config': {'text': f'Ответ номер {i}'}} for i in range(200)
+], ensure_ascii=False)
+
+def test_roundtrip():
+    for codec in available_codecs():
+        stored = encode(CONFIG, codec)
+        assert decode(stored) == CONFIG
+        assert frame_codec(stored) == codec
+    ratio = len(CONFIG.encode('utf-8')) / len(encode(CONFIG, 'zlib'))
+    assert ratio > 5
+    print(f"✅ Значения сжимаются и восстанавливаются (zlib: {ratio:.1f}x)")
+
+def test_legacy_and_small_values():
+    # Старые строки: str из TEXT-колонки и байты после ALTER TEXT -> BLOB
+    assert decode(CONFIG) == CONFIG
+    assert decode(CONFIG.encode('utf-8')) == CONFIG
+    assert frame_codec(CONFIG.encode('utf-8')) is None
+    # Короткие значения хранятся без сжатия, но с заголовком
+    stored = encode('{}')
+    assert stored.startswith(MAGIC) and frame_codec(stored) == 'none' and decode(stored) == '{}'
+    column = CompressedText()
+    assert column.process_bind_param(None, None) is None and column.process_result_value(None, None) is None
+    print("✅ Несжатые строки читаются прозрачно")
+
+def test_corrupt_value():
+    stored = encode(CONFIG)
+    for value in (stored[:-10], stored[:4] + b'\x09' + stored[5:], stored[:5] + b'\x07' + stored[6:]):
+        try:
+            decode(value)
+            assert False, 'CompressionError expected'
+        except CompressionError:
+            pass
+    print("✅ Поврежденные значения отклоняются")
+
+def test_plain_column():
+    # Колонка, которая в базе еще TEXT: пишется текст без заголовка и нулевых байтов
+    column = CompressedText()
+    column.plain = True
+    stored = column.process_bind_param(CONFIG, None)
+    assert stored == CONFIG.encode('utf-8') and b'\x00' not in stored
+    assert column.process_result_value(stored, None) == CONFIG
+
+    from app import COMPRESSED_COLUMNS, check_compressed_columns
+
+    class Cursor:
+        def execute(self, sql):
+            pass
+        def fetchall(self):
+            return [('bots', 'config', 'mediumblob'), ('bots', 'python_code', 'text'),
+                    ('bot_sessions', 'session_data', 'longtext')]
+        def close(self):
+            pass
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+    try:
+        check_compressed_columns(Connection(), None)
+        assert [model.__table__.c[name].type.plain for model, name, _ in COMPRESSED_COLUMNS] == [False, True, True]
+    finally:
+        for model, name, _ in COMPRESSED_COLUMNS:
+            model.__table__.c[name].type.plain = False
+    print("✅ В колонки, еще не переведенные в BLOB, пишется обычный текст")
+
+if __name__ == '__main__':
+    print("🗜️ Тестирование сжатия колонок")
+    print("=" * 50)
+    test_roundtrip()
+    test_legacy_and_small_values()
+    test_corrupt_value()
+    test_plain_column()
+    print("\n🎯 Тестирование завершено!")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Тест очереди писем (email outbox) на локальном SMTP-приемнике (smtp_sink.py)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app, db, EmailOutbox, enqueue_email, process_email_outbox
+from conftest import sqlite_app
+from smtp_sink import SMTPSink
+
+pytestmark = pytest.mark.usefixtures('sqlite_db')
+
+def use_sink(sink):
+    state = app.extensions['mail']
+    state.server, state.port = sink.host, sink.port
+    state.use_tls = state.use_ssl = state.suppress = False
+    state.username = state.password = None
+
+def enqueue(*recipients, template='emails/reset_password.html'):
+    with app.app_context():
+        EmailOutbox.query.delete()
+        messages = [enqueue_email(recipient, 'Восстановление пароля', template,
+                                  user={'name': 'Иван'}, reset_url='http://localhost/reset/abc')
+                    for recipient in recipients]
+        db.session.commit()
+        return [message.id for message in messages]
+
+def outbox(ids):
+    with app.app_context():
+        messages = {message.id: message for message in EmailOutbox.query.filter(EmailOutbox.id.in_(ids))}
+        db.session.expunge_all()
+        return [messages[message_id] for message_id in ids]
+
+def test_single_connection_delivery():
+    ids = enqueue('a@example.com', 'b@example.com', 'c@example.com')
+    with SMTPSink() as sink:
+        use_sink(sink)
+        with app.app_context():
+            assert process_email_outbox(batch_size=2) == (3, 0)
+            assert process_email_outbox() == (0, 0)
+
+    # Две пачки ушли через одно SMTP-соединение
+    assert sink.connections == 1
+    assert [item['recipients'] for item in sink.messages] == [['<a@example.com>'], ['<b@example.com>'], ['<c@example.com>']]
+    html = next(part for part in sink.messages[0]['message'].walk() if part.get_content_type() == 'text/html')
+    assert 'reset/abc' in html.get_payload(decode=True).decode('utf-8')
+    for message in outbox(ids):
+        assert message.status == 'sent' and message.sent_at and message.attempts == 0
+        assert message.claim_token is None and message.claimed_until is None
+    print("✅ Очередь отправляется одним соединением, письма помечаются sent")
+
+def test_retry_backoff():
+    base = app.config['EMAIL_OUTBOX_RETRY_BASE']
+    max_attempts = app.config['EMAIL_OUTBOX_MAX_ATTEMPTS']
+    app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'] = 3
+    ids = enqueue('ok@example.com', 'bad@example.com')
+    try:
+        with SMTPSink(reject={'bad@example.com'}) as sink:
+            use_sink(sink)
+            for attempt in (1, 2):
+                started = datetime.utcnow()
+                with app.app_context():
+                    assert process_email_outbox() == (2 - attempt, 1)
+                    # До следующей попытки письмо не берется повторно
+                    assert process_email_outbox() == (0, 0)
+                ok, bad = outbox(ids)
+                assert ok.status == 'sent'
+                assert bad.status == 'pending' and bad.attempts == attempt and '550' in bad.last_error
+                # Экспоненциальная задержка с разбросом ±20%
+                delay = (bad.next_attempt_at - started).total_seconds()
+                assert base * 2 ** (attempt - 1) * 0.8 - 1 <= delay <= base * 2 ** (attempt - 1) * 1.2 + 1
+                with app.app_context():
+                    EmailOutbox.query.filter_by(id=bad.id).update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+                    db.session.commit()
+
+            with app.app_context():
+                assert process_email_outbox() == (0, 1)
+        assert outbox(ids)[1].status == 'failed' and outbox(ids)[1].attempts == 3
+        assert sink.messages and all(item['recipients'] == ['<ok@example.com>'] for item in sink.messages)
+    finally:
+        app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'] = max_attempts
+    print("✅ Отклоненное письмо откладывается с растущей задержкой и помечается failed")
+
+def test_connection_lost():
+    ids = enqueue('first@example.com', 'broken@example.com', 'drop@example.com', 'last@example.com')
+    with app.app_context():
+        EmailOutbox.query.filter_by(id=ids[1]).update({'template': 'emails/missing.html'})
+        db.session.commit()
+
+    with SMTPSink(hang_up={'drop@example.com'}) as sink:
+        use_sink(sink)
+        with app.app_context():
+            assert process_email_outbox() == (1, 3)
+    first, broken, drop, last = outbox(ids)
+    assert first.status == 'sent'
+    # Письмо, уже отложенное в этой пачке, не получает вторую попытку за обрыв соединения
+    assert broken.attempts == 1 and 'missing.html' in broken.last_error
+    for message in (drop, last):
+        assert message.status == 'pending' and message.attempts == 1 and message.claim_token is None
+        assert message.next_attempt_at > datetime.utcnow()
+
+    # Сервер недоступен: вся пачка возвращается в очередь
+    ids = enqueue('x@example.com', 'y@example.com')
+    with app.app_context():
+        assert process_email_outbox() == (0, 2)
+    assert [message.attempts for message in outbox(ids)] == [1, 1]
+    print("✅ Обрыв соединения откладывает только неотправленные письма")
+
+if __name__ == '__main__':
+    print("📮 Тестирование очереди писем")
+    print("=" * 50)
+    with sqlite_app():
+        test_single_connection_delivery()
+        test_retry_backoff()
+        test_connection_lost()
+    print("\n🎯 Тестирование завершено!")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Тест HTTP-клиента Google OAuth на локальном сервере-заглушке
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+import app as app_module
+
+def _make_key(key_id):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'stub-google')])
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(datetime.utcnow() - timedelta(days=1))
+            .not_valid_after(datetime.utcnow() + timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+class StubGoogle:
+    """Заглушка эндпоинтов Google: /certs, /token, /userinfo, /slow"""
+
+    def __init__(self):
+        self.certs = {}
+        self.cert_requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == '/certs':
+                    stub.cert_requests += 1
+                    self._json(stub.certs, {'Cache-Control': 'public, max-age=600'})
+                elif self.path == '/userinfo':
+                    self._json({'id': '42', 'email': 'stub@example.com', 'name': 'Stub'})
+                elif self.path == '/slow':
+                    time.sleep(2)
+                    self._json({})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._json({'access_token': 'stub-token'})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+def _id_token(signer, **overrides):
+    now = int(time.time())
+    payload = {
+        'iss': 'https://accounts.google.com', 'aud': app_module.GOOGLE_CLIENT_ID,
+        'sub': '42', 'email': 'stub@example.com', 'name': 'Stub',
+        'iat': now, 'exp': now + 300
+    }
+    payload.update(overrides)
+    return google_jwt.encode(signer, payload).decode()
+
+def test_google_oauth_client():
+    stub = StubGoogle()
+    signer, cert = _make_key('k1')
+    stub.certs = {'k1': cert}
+    app_module.GOOGLE_CERTS_URL = stub.url + '/certs'
+    app_module._google_certs.update(certs=None, expires_at=0)
+
+    # Проверка id_token и кэширование сертификатов
+    user_info = app_module.verify_google_id_token(_id_token(signer))
+    assert user_info == {'id': '42', 'email': 'stub@example.com', 'name': 'Stub'}
+    app_module.verify_google_id_token(_id_token(signer))
+    assert stub.cert_requests == 1
+    print("✅ id_token проверяется локально, сертификаты кэшируются")
+
+    # Чужая аудитория отклоняется
+    try:
+        app_module.verify_google_id_token(_id_token(signer, aud='someone-else'))
+        assert False, 'audience mismatch expected'
+    except ValueError:
+        pass
+    print("✅ Токен для другого клиента отклоняется")
+
+    # Ротация ключей: неизвестный kid перечитывает сертификаты
+    new_signer, new_cert = _make_key('k2')
+    stub.certs = {'k2': new_cert}
+    assert app_module.verify_google_id_token(_id_token(new_signer))['id'] == '42'
+    assert stub.cert_requests == 2
+    print("✅ Ротация ключей Google обрабатывается")
+
+    # Пул соединений и таймауты
+    info = app_module.google_request('GET', stub.url + '/userinfo')
+    assert info['email'] == 'stub@example.com'
+    token = app_module.google_request('POST', stub.url + '/token', data={'code': 'x'})
+    assert token['access_token'] == 'stub-token'
+    started = time.time()
+    try:
+        app_module.google_request('GET', stub.url + '/slow', timeout=(1, 0.5))
+        assert False, 'timeout expected'
+    except requests.exceptions.RequestException:
+        pass
+    assert time.time() - started < 1.5
+    print("✅ Запросы идут через общий пул с ограниченным таймаутом")
+
+    stub.server.shutdown()
+
+if __name__ == '__main__':
+    print("🔑 Тестирование Google OAuth клиента")
+    print("=" * 50)
+    test_google_oauth_client()
+    print("\n🎯 Тестирование завершено!")
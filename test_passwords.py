@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Тест хеширования паролей (passwords.py)
+"""
+
+import hashlib
+from werkzeug.security import generate_password_hash
+from passwords import PasswordHasher, HashingPoolBusy, verify_password_hash, hash_method, expand_method
+
+def test_hash_and_verify():
+    """Хеш, созданный в пуле, проверяется и не требует перехеширования"""
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', max_workers=1)
+    try:
+        pwhash = hasher.hash('secret123')
+        assert hash_method(pwhash) == 'pbkdf2:sha256:1000'
+        assert hasher.verify(pwhash, 'secret123')
+        assert not hasher.verify(pwhash, 'wrong')
+        assert not hasher.needs_rehash(pwhash)
+        print("✅ Хеширование и проверка в пуле работают")
+    finally:
+        hasher.shutdown()
+
+def test_rehash_on_cost_change():
+    """Смена стоимости хеша требует перехеширования старых паролей"""
+    old = PasswordHasher(method='pbkdf2:sha256:1000', max_workers=0)
+    new = PasswordHasher(method='pbkdf2:sha256:2000', max_workers=0)
+    pwhash = old.hash('secret123')
+    assert new.verify(pwhash, 'secret123')
+    assert new.needs_rehash(pwhash)
+    print("✅ Устаревшие хеши определяются для перехеширования")
+
+def test_legacy_manage_db_hash():
+    """Старые SHA-256 хеши из manage_db.py проверяются и подлежат замене"""
+    salt = 'ab' * 16
+    legacy = f"$2b$12${salt}${hashlib.sha256(('secret123' + salt).encode()).hexdigest()}"
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', max_workers=0)
+    assert verify_password_hash(legacy, 'secret123')
+    assert not verify_password_hash(legacy, 'wrong')
+    assert hasher.needs_rehash(legacy)
+    assert not verify_password_hash(None, 'secret123')
+    print("✅ Старые хеши manage_db.py поддерживаются")
+
+def test_saturated_pool_rejects():
+    """Переполненная очередь отклоняет запрос сразу"""
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', max_workers=1, max_pending=0)
+    try:
+        hasher.hash('secret123')
+        assert False, 'HashingPoolBusy expected'
+    except HashingPoolBusy:
+        pass
+    finally:
+        hasher.shutdown()
+    assert hasher.stats()['rejected'] == 1
+    print("✅ Переполненный пул быстро отклоняет запросы")
+
+def test_rehash_check_without_pool():
+    """Проверка на перехеширование не запускает KDF и работает при занятом пуле"""
+    for method in ('pbkdf2', 'pbkdf2:sha512', 'pbkdf2:sha256:1000', 'scrypt', 'scrypt:1024:8:1'):
+        assert expand_method(method) == hash_method(generate_password_hash('x', method=method))
+    hasher = PasswordHasher(method='scrypt', max_workers=1, max_pending=0)
+    try:
+        assert not hasher.needs_rehash(generate_password_hash('secret123', method='scrypt'))
+        assert hasher.needs_rehash(generate_password_hash('secret123', method='pbkdf2:sha256:1000'))
+        assert hasher.stats()['rejected'] == 0
+    finally:
+        hasher.shutdown()
+    print("✅ Целевой метод хеша вычисляется без хеширования")
+
+if __name__ == '__main__':
+    print("🔐 Тестирование хеширования паролей")
+    print("=" * 50)
+    test_hash_and_verify()
+    test_rehash_on_cost_change()
+    test_legacy_manage_db_hash()
+    test_saturated_pool_rejects()
+    test_rehash_check_without_pool()
+    print("\n🎯 Тестирование завершено!")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Тест поискового индекса админ-панели (search_index.py)
+"""
+
+from search_index import InvertedIndex, tokenize, query_terms, boolean_query
+
+def build_index():
+    index = InvertedIndex()
+    index.add_many([
+        (1, ('spam.king@mail.ru', 'Спам Король')),
+        (2, ('spammer@gmail.com', 'Иван')),
+        (3, ('ivan@mail.ru', 'Иван Спамов')),
+        (4, ('maria@yandex.ru', 'Мария'))
+    ])
+    for doc_id in range(5, 45):
+        index.add(doc_id, f'user{doc_id}@mail.ru', 'Пользователь')
+    return index
+
+def test_tokenize_and_query():
+    assert tokenize('Spam.King@mail.ru') == ['spam', 'king', 'mail', 'ru']
+    assert query_terms('Иван  и  ИВАН spa', min_length=2) == ['иван', 'spa']
+    assert boolean_query(['spa', 'mail']) == '+spa* +mail*'
+    print("✅ Текст и запрос разбиваются на слова одинаково")
+
+def test_prefix_search():
+    index = build_index()
+    ids = lambda terms: [doc_id for _, doc_id in index.search(terms, limit=50)[0]]
+    assert sorted(ids(['spam'])) == [1, 2]
+    assert sorted(ids(['спам'])) == [1, 3]
+    assert ids(['иван', 'mail']) == [3]
+    assert ids(['ivan', 'yandex']) == []
+    # Точное совпадение слова весит больше, чем совпадение по префиксу
+    assert ids(['spam'])[0] == 1
+
+    index.add(4, 'maria@yandex.ru', 'Мария Спамова')
+    index.remove(1)
+    assert sorted(ids(['спам'])) == [3, 4]
+    assert ids(['king']) == []
+    print("✅ Поиск по префиксам слов учитывает изменения и удаления")
+
+def test_keyset_pages():
+    index = build_index()
+    for terms in (['user'], ['mail', 'user']):
+        expected, _ = index.search(terms, limit=100)
+        pages, after = [], None
+        while True:
+            page, has_more = index.search(terms, limit=7, after=after)
+            pages.extend(page)
+            if not has_more:
+                break
+            after = page[-1]
+        assert pages == expected and len(expected) == 40
+        assert expected == sorted(expected, reverse=True)
+    print("✅ Страницы по курсору (score, id) идут без пропусков и повторов")
+
+if __name__ == '__main__':
+    print("🔎 Тестирование поискового индекса")
+    print("=" * 50)
+    test_tokenize_and_query()
+    test_prefix_search()
+    test_keyset_pages()
+    print("\n🎯 Тестирование завершено!")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Тест автосохранения сессии редактора через /api/save-bot-session и /api/get-bot-session на SQLite
+"""
+
+from contextlib import contextmanager
+
+import pytest
+
+import app as app_module
+from app import app, db, User, BotSession, StatCounter, write_buffered_sessions
+from conftest import sqlite_app
+from session_buffer import SessionBuffer, MemoryStore
+
+pytestmark = pytest.mark.usefixtures('sqlite_db')
+
+MODES = ('through', 'behind')
+
+@contextmanager
+def write_mode(mode):
+    """SESSION_WRITE_MODE на время теста; в режиме behind - свой буфер в памяти вместо общего файла"""
+    saved = app.config['SESSION_WRITE_MODE'], app_module.session_buffer
+    app.config['SESSION_WRITE_MODE'] = mode
+    buffer = app_module.session_buffer = SessionBuffer(MemoryStore(), write_buffered_sessions, interval=3600)
+    try:
+        yield buffer
+    finally:
+        app.config['SESSION_WRITE_MODE'], app_module.session_buffer = saved
+
+def new_client():
+    with app.app_context():
+        db.session.query(BotSession).delete()
+        db.session.query(StatCounter).delete()
+        db.session.query(User).delete()
+        user = User(name='Иван', email='ivan@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    app_module.user_cache.clear()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
+
+def save(client, body):
+    response = client.post('/api/save-bot-session', json=body)
+    return response.status_code, response.get_json()
+
+def load(client):
+    response = client.get('/api/get-bot-session')
+    return response.get_json(), int(response.headers['X-Session-Version'])
+
+def stored_row():
+    with app.app_context():
+        row = db.session.execute(db.select(BotSession.session_data, BotSession.patch_log, BotSession.version)).first()
+        return row and (row.session_data, row.patch_log, row.version)
+
+def test_patch_and_conflict():
+    for mode in MODES:
+        with write_mode(mode) as buffer:
+            client = new_client()
+            assert load(client) == ({}, 0)
+            assert save(client, {'botBlocks': [], 'blockCounter': 0}) == (200, {'success': True, 'version': 1})
+            status, data = save(client, {'version': 1, 'patch': [
+                {'op': 'add', 'path': '/botBlocks/-', 'value': {'id': 0, 'type': 'welcome'}},
+                {'op': 'replace', 'path': '/blockCounter', 'value': 1}
+            ]})
+            assert (status, data['version']) == (200, 2)
+            assert load(client) == ({'botBlocks': [{'id': 0, 'type': 'welcome'}], 'blockCounter': 1}, 2)
+
+            # Вторая вкладка со старой версией получает 409 и текущую версию
+            status, data = save(client, {'version': 1, 'patch': [{'op': 'replace', 'path': '/blockCounter', 'value': 5}]})
+            assert (status, data['version']) == (409, 2)
+            assert load(client)[0]['blockCounter'] == 1
+
+            buffer.flush()
+            assert stored_row()[2] == 2
+        print(f"✅ Режим {mode}: патч применяется, устаревшая версия получает 409")
+
+def test_patch_that_does_not_apply():
+    for mode in MODES:
+        with write_mode(mode) as buffer:
+            client = new_client()
+            save(client, {'botBlocks': [], 'blockCounter': 0})
+            for patch in (
+                [{'op': 'remove', 'path': '/nope'}],
+                [{'op': 'replace', 'path': '/blockCounter', 'value': 2}, {'op': 'test', 'path': '/blockCounter', 'value': 3}],
+                [{'op': 'rename', 'path': '/blockCounter'}],
+                {'op': 'add'}
+            ):
+                status, data = save(client, {'version': 1, 'patch': patch})
+                assert status == 400 and data['error'], (mode, patch)
+            # Отклоненный патч не сдвигает версию и не меняет документ
+            assert load(client) == ({'botBlocks': [], 'blockCounter': 0}, 1)
+            buffer.flush()
+            assert stored_row()[1:] == (None, 1)
+        print(f"✅ Режим {mode}: неприменимый патч отклоняется с 400")
+
+def test_compaction():
+    compact_every, inline_limit = app.config['SESSION_COMPACT_EVERY'], app.config['SESSION_PATCH_INLINE_LIMIT']
+    app.config['SESSION_COMPACT_EVERY'], app.config['SESSION_PATCH_INLINE_LIMIT'] = 4, 200
+    try:
+        with write_mode('through'):
+            client = new_client()
+            save(client, {'blockCounter': 0})
+            for version in (1, 2):
+                save(client, {'version': version, 'patch': [{'op': 'replace', 'path': '/blockCounter', 'value': version}]})
+            # Между сжатиями в базу дописываются только патчи
+            session_data, patch_log, version = stored_row()
+            assert version == 3 and len(patch_log.splitlines()) == 2 and '"blockCounter": 0' in session_data
+
+            # Версия 4 кратна SESSION_COMPACT_EVERY: журнал сворачивается в снимок
+            assert save(client, {'version': 3, 'patch': [{'op': 'add', 'path': '/name', 'value': 'Бот'}]})[0] == 200
+            session_data, patch_log, version = stored_row()
+            assert version == 4 and patch_log is None and '"blockCounter": 2' in session_data
+
+            # Большой патч тоже сразу попадает в снимок
+            text = 'Привет! ' * 50
+            assert save(client, {'version': 4, 'patch': [{'op': 'add', 'path': '/text', 'value': text}]})[0] == 200
+            assert stored_row()[1:] == (None, 5)
+            assert load(client) == ({'blockCounter': 2, 'name': 'Бот', 'text': text}, 5)
+
+            # Неприменимый патч на границе сжатия тоже получает 400
+            save(client, {'version': 5, 'patch': [{'op': 'replace', 'path': '/blockCounter', 'value': 6}]})
+            save(client, {'version': 6, 'patch': [{'op': 'replace', 'path': '/blockCounter', 'value': 7}]})
+            assert save(client, {'version': 7, 'patch': [{'op': 'remove', 'path': '/nope'}]})[0] == 400
+            assert load(client) == ({'blockCounter': 7, 'name': 'Бот', 'text': text}, 7)
+    finally:
+        app.config['SESSION_COMPACT_EVERY'], app.config['SESSION_PATCH_INLINE_LIMIT'] = compact_every, inline_limit
+    print("✅ Журнал патчей сворачивается в снимок по счетчику и по размеру патча")
+
+def test_log_byte_budget():
+    log_limit = app.config['SESSION_PATCH_LOG_LIMIT']
+    app.config['SESSION_PATCH_LOG_LIMIT'] = 1000
+    try:
+        with write_mode('through'):
+            client = new_client()
+            save(client, {'text': ''})
+            # Кириллица занимает два байта на букву: журнал ограничен в байтах, а не в символах
+            for version in range(1, 12):
+                text = f'Правка {version} ' + 'я' * 60
+                assert save(client, {'version': version, 'patch': [{'op': 'replace', 'path': '/text', 'value': text}]})[0] == 200
+                patch_log = stored_row()[1]
+                assert len((patch_log or '').encode('utf-8')) <= 1000
+            assert patch_log is None or len(patch_log.splitlines()) < 11
+            assert load(client) == ({'text': text}, 12)
+    finally:
+        app.config['SESSION_PATCH_LOG_LIMIT'] = log_limit
+    print("✅ Журнал патчей не выходит за SESSION_PATCH_LOG_LIMIT байт")
+
+def test_flush_counts_new_sessions_once():
+    client = new_client()
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id)).scalar()
+    # Один и тот же пакет, записанный дважды (например, двумя воркерами), создает одну сессию
+    write_buffered_sessions([(user_id, '{"a": 1}', 1)])
+    write_buffered_sessions([(user_id, '{"a": 1}', 1)])
+    write_buffered_sessions([(user_id, '{"a": 2}', 2), (999999, '{}', 1)])
+    with app.app_context():
+        assert db.session.get(StatCounter, 'sessions').value == 1
+    assert stored_row()[2] == 2
+    with write_mode('behind'):
+        assert load(client) == ({'a': 2}, 2)
+    print("✅ Новые сессии считаются по результату вставки, а не по предварительному чтению")
+
+if __name__ == '__main__':
+    print("💾 Тестирование автосохранения сессии")
+    print("=" * 50)
+    with sqlite_app():
+        test_patch_and_conflict()
+        test_patch_that_does_not_apply()
+        test_compaction()
+        test_log_byte_budget()
+        test_flush_counts_new_sessions_once()
+    print("\n🎯 Тестирование завершено!")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Тест буфера отложенной записи сессий редактора (session_buffer.py)
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from session_buffer import SessionBuffer, MemoryStore, SQLiteStore
+
+# Ошибки записи ожидаемы в тесте
+logging.getLogger('session_buffer').setLevel(logging.CRITICAL)
+
+class RecordingWriter:
+    """Запоминает пакеты, которые буфер записал бы в MariaDB"""
+
+    def __init__(self):
+        self.batches = []
+        self.rows = {}
+        self.fail = False
+
+    def __call__(self, entries):
+        if self.fail:
+            raise RuntimeError('database is down')
+        self.batches.append(entries)
+        for user_id, data, version in entries:
+            self.rows[user_id] = (data, version)
+
+def _check_store(store):
+    writer = RecordingWriter()
+    buffer = SessionBuffer(store, writer, interval=60, threshold=50, max_entries=10)
+
+    # Сто автосохранений одного пользователя превращаются в одну запись
+    assert buffer.load(1, lambda: None) is None
+    for version in range(1, 101):
+        assert buffer.save(1, {'blockCounter': version}, version, expected=version - 1)
+    assert buffer.load(1, lambda: None) == ({'blockCounter': 100}, 100)
+    assert buffer.stats()['dirty'] == 1 and buffer.stats()['flush_lag_seconds'] >= 0
+    assert buffer.flush() == 1
+    assert writer.rows[1][1] == 100 and len(writer.batches) == 1
+    assert buffer.stats()['coalesced'] == 99
+
+    # Устаревшая версия не перезаписывает буфер
+    assert not buffer.save(1, {'blockCounter': 0}, 100, expected=99)
+
+    # Сессия из базы кэшируется как чистая и не записывается повторно
+    assert buffer.load(2, lambda: ('{"a": 1}', 7)) == ({'a': 1}, 7)
+    assert buffer.flush() == 0
+
+    # При ошибке базы сессии остаются в буфере до следующего сброса
+    writer.fail = True
+    buffer.save(2, {'a': 2}, 8, expected=7)
+    assert buffer.flush() == 0 and buffer.stats()['flush_errors'] == 1
+    writer.fail = False
+    assert buffer.flush() == 1 and writer.rows[2][1] == 8
+
+    # Вытесняются только чистые записи
+    for user_id in range(10, 30):
+        buffer.save(user_id, {}, 1, expected=0)
+    buffer.store.trim(buffer.max_entries)
+    assert buffer.stats()['entries'] == 20
+    buffer.flush()
+    assert buffer.stats()['entries'] <= 10
+    return buffer
+
+def test_memory_store():
+    _check_store(MemoryStore())
+    print("✅ Буфер в памяти объединяет автосохранения")
+
+def test_sqlite_store():
+    path = os.path.join(tempfile.mkdtemp(), 'sessions.sqlite3')
+    _check_store(SQLiteStore(path))
+
+    # Несброшенная сессия переживает перезапуск воркера
+    store = SQLiteStore(path)
+    store.put(42, '{"x": 1}', 1, 0)
+    writer = RecordingWriter()
+    restarted = SessionBuffer(SQLiteStore(path), writer, interval=60)
+    assert restarted.flush() == 1 and writer.rows[42] == ('{"x": 1}', 1)
+    print("✅ Буфер в SQLite общий для воркеров и переживает перезапуск")
+
+def test_background_flush():
+    writer = RecordingWriter()
+    buffer = SessionBuffer(MemoryStore(), writer, interval=0.1, threshold=3)
+    for user_id in range(3):
+        buffer.save(user_id, {}, 1, expected=0)
+    deadline = time.time() + 2
+    while len(writer.rows) < 3 and time.time() < deadline:
+        time.sleep(0.02)
+    assert len(writer.rows) == 3
+    buffer.save(5, {}, 1, expected=0)
+    buffer.stop()
+    assert 5 in writer.rows
+    print("✅ Сброс по таймеру, по порогу и при остановке")
+
+def test_flush_claims():
+    path = os.path.join(tempfile.mkdtemp(), 'sessions.sqlite3')
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    for user_id in range(5):
+        first.put(user_id, '{}', 1, 0)
+
+    # Записи, взятые одним воркером, другой не видит до mark_clean или release
+    claimed = first.dirty(3)
+    assert [user_id for user_id, _, _ in claimed] == [0, 1, 2]
+    assert [user_id for user_id, _, _ in second.dirty(10)] == [3, 4]
+    assert second.dirty(10) == []
+    # Сессия, сохраненная во время сброса, остается грязной и снова доступна
+    second.put(1, '{"a": 1}', 2, 1)
+    first.mark_clean([(user_id, version) for user_id, _, version in claimed])
+    second.release([3, 4])
+    assert second.dirty(10) == [(1, '{"a": 1}', 2), (3, '{}', 1), (4, '{}', 1)]
+
+    # Взятие воркера, упавшего посреди сброса, истекает
+    second.release([1, 3, 4])
+    assert [user_id for user_id, _, _ in SQLiteStore(path, claim_seconds=0).dirty(10)] == [1, 3, 4]
+    time.sleep(0.01)
+    assert [user_id for user_id, _, _ in second.dirty(10)] == [1, 3, 4]
+    second.release([1, 3, 4])
+
+    # Одновременные сбросы из разных воркеров записывают каждую сессию один раз
+    for user_id in range(100, 300):
+        first.put(user_id, '{}', 1, 0)
+    writers = [RecordingWriter() for _ in range(4)]
+    buffers = [SessionBuffer(SQLiteStore(path), writer, interval=60, threshold=20) for writer in writers]
+    threads = [threading.Thread(target=buffer.flush) for buffer in buffers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    written = [user_id for writer in writers for batch in writer.batches for user_id, _, _ in batch]
+    assert sorted(written) == [1, 3, 4] + list(range(100, 300))
+    print("✅ Воркеры не сбрасывают одни и те же сессии одновременно")
+
+if __name__ == '__main__':
+    print("💾 Тестирование буфера сессий")
+    print("=" * 50)
+    test_memory_store()
+    test_sqlite_store()
+    test_background_flush()
+    test_flush_claims()
+    print("\n🎯 Тестирование завершено!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Тест применения JSON Patch к сессии редактора (session_patch.py)
+"""
+
+from session_patch import apply_patch, validate_patch, PatchError
+
+SESSION = {
+    'botBlocks': [
+        {'id': 0, 'type': 'welcome', 'config': {}},
+        {'id': 1, 'type': 'echo', 'config': {}}
+    ],
+    'blockCounter': 2,
+    'formData': {'botName': 'Бот', 'a/b': 1}
+}
+
+def test_apply_patch():
+    doc = apply_patch(SESSION, [
+        {'op': 'replace', 'path': '/botBlocks/0/config', 'value': {'message': 'Привет'}},
+        {'op': 'add', 'path': '/botBlocks/-', 'value': {'id': 2, 'type': 'help', 'config': {}}},
+        {'op': 'replace', 'path': '/blockCounter', 'value': 3},
+        {'op': 'move', 'from': '/botBlocks/1', 'path': '/botBlocks/0'},
+        {'op': 'remove', 'path': '/formData/a~1b'},
+        {'op': 'copy', 'from': '/formData/botName', 'path': '/formData/title'},
+        {'op': 'test', 'path': '/blockCounter', 'value': 3}
+    ])
+    assert [block['id'] for block in doc['botBlocks']] == [1, 0, 2]
+    assert doc['botBlocks'][1]['config'] == {'message': 'Привет'}
+    assert doc['formData'] == {'botName': 'Бот', 'title': 'Бот'}
+    # Исходный документ не меняется
+    assert SESSION['botBlocks'][0]['config'] == {} and len(SESSION['botBlocks']) == 2
+    print("✅ Операции JSON Patch применяются по RFC 6902")
+
+def test_invalid_patch():
+    for ops in (
+        {'op': 'add'},
+        [{'op': 'rename', 'path': '/a'}],
+        [{'op': 'add', 'path': 'botBlocks'}],
+        [{'op': 'replace', 'path': '/blockCounter'}]
+    ):
+        try:
+            validate_patch(ops)
+            assert False, f'PatchError expected for {ops}'
+        except PatchError:
+            pass
+
+    for ops in (
+        [{'op': 'remove', 'path': '/botBlocks/5'}],
+        [{'op': 'replace', 'path': '/missing', 'value': 1}],
+        [{'op': 'add', 'path': '/botBlocks/01', 'value': 1}],
+        [{'op': 'replace', 'path': '/blockCounter', 'value': 9}, {'op': 'test', 'path': '/blockCounter', 'value': 2}]
+    ):
+        try:
+            apply_patch(SESSION, ops)
+            assert False, f'PatchError expected for {ops}'
+        except PatchError:
+            pass
+    assert SESSION['blockCounter'] == 2
+    print("✅ Некорректные патчи отклоняются целиком")
+
+if __name__ == '__main__':
+    print("🩹 Тестирование JSON Patch")
+    print("=" * 50)
+    test_apply_patch()
+    test_invalid_patch()
+    print("\n🎯 Тестирование завершено!")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Тест ограничения частоты запросов (throttle.py)
+"""
+
+import os
+import tempfile
+from throttle import Throttle, MemoryBackend, SQLiteBackend, RateLimit, parse_rate
+
+RULES = {'login': {'ip': RateLimit(3, 60), 'email': RateLimit(2, 60)}}
+
+def _check_backend(backend):
+    throttle = Throttle(backend, RULES)
+    now = 6000.0  # начало окна
+
+    assert throttle.check('login', {'ip': '1.1.1.1', 'email': 'a@b'}, now) == 0
+    assert throttle.check('login', {'ip': '1.1.1.1', 'email': 'a@b'}, now + 1) == 0
+    # Лимит по email исчерпан
+    assert throttle.check('login', {'ip': '1.1.1.1', 'email': 'a@b'}, now + 2) > 0
+    # Другой email с того же IP проходит, затем упирается в лимит IP
+    assert throttle.check('login', {'ip': '1.1.1.1', 'email': 'c@d'}, now + 3) == 0
+    assert throttle.check('login', {'ip': '1.1.1.1', 'email': 'e@f'}, now + 4) > 0
+    # Скользящее окно: в конце следующего окна старые попытки почти не учитываются
+    assert throttle.check('login', {'ip': '1.1.1.1', 'email': 'a@b'}, now + 119) == 0
+    # Неизвестная область не ограничивается
+    assert throttle.check('other', {'ip': '1.1.1.1'}, now) == 0
+    assert throttle.stats()['rejected'] == 2
+
+def test_parse_rate():
+    assert parse_rate('10/60') == RateLimit(10, 60)
+    print("✅ Формат лимитов разбирается")
+
+def test_memory_backend():
+    _check_backend(MemoryBackend())
+    print("✅ In-memory бэкенд работает")
+
+def test_sqlite_backend():
+    path = os.path.join(tempfile.mkdtemp(), 'throttle.sqlite3')
+    _check_backend(SQLiteBackend(path))
+    # Второй экземпляр (другой воркер) видит те же счетчики
+    shared = Throttle(SQLiteBackend(path), RULES)
+    assert shared.check('login', {'ip': '1.1.1.1', 'email': 'a@b'}, 6119.5) > 0
+    print("✅ SQLite бэкенд работает и общий для воркеров")
+
+if __name__ == '__main__':
+    print("🚦 Тестирование ограничения частоты запросов")
+    print("=" * 50)
+    test_parse_rate()
+    test_memory_backend()
+    test_sqlite_backend()
+    print("\n🎯 Тестирование завершено!")
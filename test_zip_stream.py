@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Тест потоковой сборки ZIP-архивов (zip_stream.py)
+"""
+
+import io
+import os
+import zipfile
+from datetime import datetime
+from zip_stream import stream_zip
+
+def test_stream_zip():
+    big = os.urandom(300 * 1024)
+    files = [
+        ('bot/bot.py', 'print("привет")\n' * 1000, datetime(2024, 5, 1, 12, 30)),
+        ('bot/config.json', b'{"blocks": []}', None),
+        ('bot/big.bin', (big[i:i + 50000] for i in range(0, len(big), 50000)), None)
+    ]
+    chunks = list(stream_zip(files, chunk_size=16 * 1024))
+    # Архив отдается частями, а не одним куском
+    assert len(chunks) > 3 and max(map(len, chunks)) < 200 * 1024
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.read('bot/bot.py').decode('utf-8') == 'print("привет")\n' * 1000
+        assert archive.read('bot/config.json') == b'{"blocks": []}'
+        assert archive.read('bot/big.bin') == big
+        assert archive.getinfo('bot/bot.py').date_time == (2024, 5, 1, 12, 30, 0)
+    print(f"✅ ZIP собирается потоково: {len(chunks)} частей, крупнейшая {max(map(len, chunks)) // 1024} КБ")
+
+if __name__ == '__main__':
+    print("📦 Тестирование потокового ZIP")
+    print("=" * 50)
+    test_stream_zip()
+    print("\n🎯 Тестирование завершено!")
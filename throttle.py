@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Request throttling for Bot Creator Platform
+Sliding-window counters keyed by client IP and by email address
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+RateLimit = namedtuple('RateLimit', ['limit', 'window'])
+
+def parse_rate(value):
+    """Parse '10/60' (10 requests per 60 seconds) into a RateLimit"""
+    limit, window = value.split('/', 1)
+    return RateLimit(int(limit), int(window))
+
+def _evaluate(rate, now, current, previous):
+    """Sliding-window estimate for one key.
+
+    The previous fixed window is weighted by how much of it still overlaps the
+    sliding window. Returns 0 if one more hit is allowed, otherwise the number
+    of seconds to wait before retrying.
+    """
+    offset = now % rate.window
+    weight = 1 - offset / rate.window
+    if previous * weight + current + 1 <= rate.limit:
+        return 0
+    if current + 1 > rate.limit:
+        return max(1, math.ceil(rate.window - offset))
+    # Wait until enough of the previous window has slid out
+    needed = 1 - (rate.limit - 1 - current) / previous
+    return max(1, math.ceil(needed * rate.window - offset))
+
+class MemoryBackend:
+    """Per-process counters; limits hold per gunicorn worker only"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, checks, now):
+        with self._lock:
+            states = []
+            for key, rate in checks:
+                bucket = int(now // rate.window)
+                state = self._counters.get(key)
+                if state is None or state[0] < bucket - 1:
+                    current, previous = 0, 0
+                elif state[0] == bucket - 1:
+                    current, previous = 0, state[1]
+                else:
+                    current, previous = state[1], state[2]
+
+                retry_after = _evaluate(rate, now, current, previous)
+                if retry_after:
+                    return retry_after
+                states.append((key, (bucket, current + 1, previous)))
+
+            for key, state in states:
+                self._counters[key] = state
+                self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return 0
+
+class SQLiteBackend:
+    """Counters in a local SQLite file shared by all workers on the host"""
+
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS throttle ('
+                'key TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL, PRIMARY KEY (key, bucket))'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def hit(self, checks, now):
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front so check-and-increment is atomic across processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            increments = []
+            for key, rate in checks:
+                bucket = int(now // rate.window)
+                counts = dict(conn.execute(
+                    'SELECT bucket, count FROM throttle WHERE key = ? AND bucket IN (?, ?)',
+                    (key, bucket, bucket - 1)
+                ).fetchall())
+                retry_after = _evaluate(rate, now, counts.get(bucket, 0), counts.get(bucket - 1, 0))
+                if retry_after:
+                    conn.execute('ROLLBACK')
+                    return retry_after
+                increments.append((key, bucket, (bucket + 2) * rate.window))
+
+            conn.executemany(
+                'INSERT INTO throttle (key, bucket, count, expires_at) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (key, bucket) DO UPDATE SET count = count + 1',
+                increments
+            )
+            self._hits += 1
+            if self._hits % self.CLEANUP_EVERY == 0:
+                conn.execute('DELETE FROM throttle WHERE expires_at < ?', (now,))
+            conn.execute('COMMIT')
+            return 0
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+class Throttle:
+    """Apply named rule sets, e.g. {'login': {'ip': RateLimit(30, 300), 'email': RateLimit(10, 300)}}"""
+
+    def __init__(self, backend, rules):
+        self.backend = backend
+        self.rules = rules
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, scope, identities, now=None):
+        """Count one attempt; return 0 if allowed, else seconds until the client may retry.
+
+        A rejected attempt is not counted, so blocked clients do not extend their own ban.
+        """
+        checks = [
+            (f'{scope}:{kind}:{value}', rate)
+            for kind, rate in self.rules.get(scope, {}).items()
+            for value in [identities.get(kind)] if value
+        ]
+        if not checks:
+            return 0
+
+        retry_after = self.backend.hit(checks, time.time() if now is None else now)
+        if retry_after:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'allowed': self.allowed,
+            'rejected': self.rejected
+        }
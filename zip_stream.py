@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Streaming ZIP archives for bot exports
+Archives are written to an unseekable sink and handed out chunk by chunk, never held in memory whole
+"""
+
+import time
+import zipfile
+
+class _ChunkSink:
+    """Write-only file object for ZipFile; collects output until the caller drains it"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+        self.pending = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        self.pending += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        return data
+
+def stream_zip(files, compression=zipfile.ZIP_DEFLATED, chunk_size=64 * 1024):
+    """Yield a ZIP archive of files, given as (name, data, modified) with data as str, bytes or
+    an iterable of those; modified is a datetime or None.
+    """
+    sink = _ChunkSink()
+    # ZipFile sees no seek() and writes data descriptors after each member instead of patching headers
+    with zipfile.ZipFile(sink, 'w', compression=compression) as archive:
+        for name, data, modified in files:
+            info = zipfile.ZipInfo(name, date_time=(modified.timetuple() if modified else time.localtime())[:6])
+            info.compress_type = compression
+            with archive.open(info, 'w') as member:
+                for chunk in ([data] if isinstance(data, (str, bytes)) else data):
+                    member.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    if sink.pending >= chunk_size:
+                        yield sink.drain()
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data